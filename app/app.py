@@ -1,8 +1,10 @@
 import streamlit as st
 import sys
+import os
+import time
+import hashlib
+import json
 from pathlib import Path
-from PIL import Image
-import io
 # import os
 # import base64
 # import pypandoc
@@ -12,15 +14,136 @@ import io
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from src.preprocessing.document_utils import (
-    extract_text_from_file,
-    rotate_image_to_portrait,
-    display_pdf,
+    extraction_settings,
     convert_docx_to_pdf,
-    generate_diff_html,
-    count_pages,
-    segment_text_by_topics,
-    detect_section_headings_by_layout
 )
+from src.preprocessing.previews import page_thumbnail, visible_pages, PAGES_PER_VIEW
+from src.comparison.diff_view import DiffScript, WordDiffScript
+from src.jobs import JobManager, FINISHED_STATES, STAGES, DONE, CANCELLED
+from src.tracing import configure_logging
+
+configure_logging()
+
+# Nombre de comparaisons gardées en mémoire par le serveur Streamlit
+MAX_CACHED_COMPARISONS = 16
+
+STAGE_LABELS = {
+    "extraction_1": "Extraction du document 1",
+    "extraction_2": "Extraction du document 2",
+    "comparison": "Comparaison des textes",
+    "sections": "Comparaison des sections",
+}
+
+
+def upload_digest(upload):
+    """Empreinte SHA-256 du contenu d'un fichier envoyé, calculée une fois par envoi"""
+    digests = st.session_state.setdefault("upload_digests", {})
+    if upload.file_id not in digests:
+        digests[upload.file_id] = hashlib.sha256(upload.getbuffer()).hexdigest()
+    return digests[upload.file_id]
+
+
+def settings_digest(file_type):
+    """Empreinte des paramètres d'extraction (OCR, rendu, versions des outils)"""
+    settings = json.dumps(extraction_settings(file_type), sort_keys=True, default=str)
+    return hashlib.sha256(settings.encode("utf-8")).hexdigest()[:16]
+
+
+@st.cache_resource
+def get_job_manager():
+    """Gestionnaire de travaux partagé par toutes les sessions (résultats conservés par identifiant)"""
+    return JobManager(backend=os.environ.get("COMPARATEUR_JOB_BACKEND", "process"))
+
+
+def wait_for_job(job_id):
+    """Affiche l'avancement d'un travail jusqu'à sa fin ; retourne son état final.
+
+    L'exécution a lieu dans les processus du gestionnaire : une interaction de
+    l'utilisateur relance le script sans interrompre le travail, qui est
+    retrouvé par son identifiant.
+    """
+    manager = get_job_manager()
+    status = manager.status(job_id)
+    if status["status"] in FINISHED_STATES:
+        return status
+
+    if st.button("Annuler la comparaison"):
+        manager.cancel(job_id)
+    progress = st.progress(0.0, text="Comparaison en file d'attente...")
+    while status["status"] not in FINISHED_STATES:
+        if status["stage_index"] is not None:
+            fraction = status["done"] / status["total"] if status["total"] else 0.0
+            label = STAGE_LABELS[status["stage"]]
+            if status["total"]:
+                label += f" (page {status['done']}/{status['total']})"
+            progress.progress((status["stage_index"] + fraction) / len(STAGES), text=label)
+        time.sleep(0.5)
+        status = manager.status(job_id)
+    progress.empty()
+    return status
+
+
+def comparison_job(doc1_path, doc2_path, key):
+    """Identifiant du travail de comparaison de la session.
+
+    Le travail est soumis une fois par demande de comparaison puis retrouvé à
+    chaque relance du script par l'identifiant gardé dans `st.session_state`.
+    """
+    manager = get_job_manager()
+    job_id = st.session_state.get("compare_job_id")
+    if job_id is not None:
+        try:
+            manager.status(job_id)
+            return job_id
+        except KeyError:
+            # Travail oublié par le gestionnaire (trop ancien) : le soumettre à nouveau
+            pass
+    job_id = manager.submit(doc1_path, doc2_path, key=key)
+    st.session_state["compare_job_id"] = job_id
+    return job_id
+
+
+def clear_comparison_request():
+    """Oublie la demande de comparaison : rien n'est relancé avant un nouveau clic"""
+    st.session_state.pop("compare_request", None)
+    st.session_state.pop("compare_job_id", None)
+
+
+@st.cache_resource(max_entries=MAX_CACHED_COMPARISONS)
+def get_diff_script(digest1, digest2, settings1, settings2, level, _text1, _text2, _word_script=None):
+    """Script d'édition d'une paire de documents, partagé entre les pages du diff.
+
+    `level` vaut "words" (diff mot à mot, réutilisant le script de l'analyse) ou "lines".
+    """
+    if level == "words":
+        return WordDiffScript(_text1, _text2, script=_word_script)
+    return DiffScript(_text1, _text2)
+
+
+def show_preview(doc_path, file_type, page_count, digest, text, index):
+    """Aperçu d'un document : miniatures des seules pages visibles, rendues à la demande"""
+    if file_type == '.docx':
+        st.text_area("Aperçu du document Word", text, height=600, key=f"docx_preview_{index}")
+        return
+    if file_type not in ['.jpg', '.jpeg', '.png', '.pdf']:
+        st.warning(f"Format non pris en charge : {file_type}")
+        return
+
+    first_page = 1
+    if page_count > PAGES_PER_VIEW:
+        first_page = st.number_input(
+            f"Aperçu à partir de la page (sur {page_count})",
+            min_value=1, max_value=page_count, value=1, step=PAGES_PER_VIEW, key=f"preview_page_{index}"
+        )
+    for page_num in visible_pages(page_count, int(first_page)):
+        try:
+            thumbnail = page_thumbnail(str(doc_path), page_num, digest=digest)
+        except Exception as e:
+            st.warning(f"Aperçu de la page {page_num} indisponible: {str(e)}")
+            continue
+        caption = f"Page {page_num}" if file_type == '.pdf' else None
+        st.image(thumbnail, caption=caption, use_container_width=True)
+
 
 st.set_page_config(
     page_title="Comparateur de Documents",
@@ -47,73 +170,63 @@ with st.sidebar:
     # Bouton pour lancer la comparaison
     compare_button = st.button("Comparer les Documents")
 
+# La demande porte sur les envois présents lors du clic : elle est gardée pour les
+# interactions suivantes (pagination du diff), et oubliée si un document change
+uploads = (doc1.file_id if doc1 else None, doc2.file_id if doc2 else None)
+if compare_button:
+    clear_comparison_request()
+    st.session_state["compare_request"] = uploads
+elif st.session_state.get("compare_request") != uploads:
+    clear_comparison_request()
+
+comparison_requested = st.session_state.get("compare_request") == uploads
+
 # Champ principal pour les résultats
-if doc1 and doc2 and compare_button:
+if doc1 and doc2 and comparison_requested:
     # Créer un répertoire temporaire si ce n'est pas déjà fait
     temp_dir = Path("temp")
     temp_dir.mkdir(exist_ok=True)
     
-    # Enregistrer les fichiers temporairement
-    doc1_path = temp_dir / doc1.name
-    doc2_path = temp_dir / doc2.name
+    # Enregistrer les fichiers temporairement (un nom par envoi : un travail en cours
+    # peut encore lire le fichier lors d'une relance du script)
+    doc1_path = temp_dir / f"{doc1.file_id}_{doc1.name}"
+    doc2_path = temp_dir / f"{doc2.file_id}_{doc2.name}"
     
-    with open(doc1_path, "wb") as f:
-        f.write(doc1.getbuffer())
-    with open(doc2_path, "wb") as f:
-        f.write(doc2.getbuffer())
+    for upload, upload_path in [(doc1, doc1_path), (doc2, doc2_path)]:
+        if not upload_path.exists():
+            with open(upload_path, "wb") as f:
+                f.write(upload.getbuffer())
     
+    job_finished = False
     try:
         # Extraire o texto dos documentos
         file_type1 = Path(doc1.name).suffix.lower()
         file_type2 = Path(doc2.name).suffix.lower()
         
-        print(f"Traitement du document 1: {doc1_path} (type: {file_type1})")
-        text1 = extract_text_from_file(str(doc1_path), file_type1)
-        print(f"Texte extrait du document 1 (longueur: {len(text1)}): {text1[:100]}...")
+        # Résultat calculé une seule fois par paire de fichiers et jeu de paramètres,
+        # en arrière-plan : un travail déjà soumis pour la même paire est réutilisé
+        key1 = (upload_digest(doc1), file_type1, settings_digest(file_type1))
+        key2 = (upload_digest(doc2), file_type2, settings_digest(file_type2))
+        job_id = comparison_job(str(doc1_path), str(doc2_path), (key1, key2))
+        status = wait_for_job(job_id)
+        job_finished = True
         
-        print(f"Traitement du document 2: {doc2_path} (type: {file_type2})")
-        text2 = extract_text_from_file(str(doc2_path), file_type2)
-        print(f"Texte extrait du document 2 (longueur: {len(text2)}): {text2[:100]}...")
+        if status["status"] == CANCELLED:
+            clear_comparison_request()
+            st.info("Comparaison annulée.")
+            st.stop()
+        if status["status"] != DONE:
+            # Un échec n'est pas resoumis à chaque relance : il faut cliquer de nouveau
+            clear_comparison_request()
+            raise RuntimeError(status["error"])
+        result = get_job_manager().result(job_id)
         
-        if not text1:
-            raise ValueError(f"Le document 1 n'a pas pu être lu (type: {file_type1})")
-        if not text2:
-            raise ValueError(f"Le document 2 n'a pas pu être lu (type: {file_type2})")
-        
-        # Contar páginas
-        pages1 = count_pages(str(doc1_path), file_type1)
-        pages2 = count_pages(str(doc2_path), file_type2)
-        
-        # Segmentar textos em tópicos
-        # topics1 = segment_text_by_topics(text1)
-        # topics2 = segment_text_by_topics(text2)
-        if file_type1 == ".pdf":
-            topics1 = {f"{i+1}.": sec["text"] for i, sec in enumerate(detect_section_headings_by_layout(str(doc1_path)))}
-        else:
-            topics1 = segment_text_by_topics(text1)
-
-        if file_type2 == ".pdf":
-            topics2 = {f"{i+1}.": sec["text"] for i, sec in enumerate(detect_section_headings_by_layout(str(doc2_path)))}
-        else:
-            topics2 = segment_text_by_topics(text2)
-
-        
-        # Calcular métricas de comparação
-        from Levenshtein import distance
-        lev_distance = distance(text1, text2)
-        max_len = max(len(text1), len(text2))
-        similarity = 1 - (lev_distance / max_len) if max_len > 0 else 0
-        
-        result = {
-            'distance': lev_distance,
-            'similarity': similarity,
-            'text1_length': len(text1),
-            'text2_length': len(text2),
-            'pages1': pages1,
-            'pages2': pages2,
-            'topics1': topics1,
-            'topics2': topics2
-        }
+        text1 = result['text1']
+        text2 = result['text2']
+        pages1 = result['pages1']
+        pages2 = result['pages2']
+        topics1 = result['topics1']
+        topics2 = result['topics2']
         
         # Afficher les résultats
         st.header("Résultats de la Comparaison")
@@ -124,30 +237,12 @@ if doc1 and doc2 and compare_button:
         with col1:
             st.subheader("Document 1")
             st.metric("Nombre de pages", pages1)
-            if file_type1 in ['.jpg', '.jpeg', '.png']:
-                img1 = Image.open(io.BytesIO(doc1.getvalue()))
-                img1 = rotate_image_to_portrait(img1)
-                st.image(img1, use_container_width=True)
-            elif file_type1 == '.pdf':
-                display_pdf(str(doc1_path))
-            elif file_type1 == '.docx':
-                st.text_area("Aperçu du document Word", text1, height=600, key="docx_preview_1")
-            else:
-                st.warning(f"Format non pris en charge : {file_type1}")
+            show_preview(doc1_path, file_type1, pages1, key1[0], text1, 1)
 
         with col2:
             st.subheader("Document 2")
             st.metric("Nombre de pages", pages2)
-            if file_type2 in ['.jpg', '.jpeg', '.png']:
-                img2 = Image.open(io.BytesIO(doc2.getvalue()))
-                img2 = rotate_image_to_portrait(img2)
-                st.image(img2, use_container_width=True)
-            elif file_type2 == '.pdf':
-                display_pdf(str(doc2_path))
-            elif file_type2 == '.docx':
-                st.text_area("Aperçu du document Word", text2, height=600, key="docx_preview_2")
-            else:
-                st.warning(f"Format non pris en charge : {file_type2}")
+            show_preview(doc2_path, file_type2, pages2, key2[0], text2, 2)
 
         # Métricas de comparação em um container separado
         with st.container():
@@ -155,8 +250,15 @@ if doc1 and doc2 and compare_button:
             col_metrics1, col_metrics2 = st.columns(2)
             
             with col_metrics1:
-                st.metric("Similarité", f"{result['similarity']:.2%}")
-                st.metric("Distance de Levenshtein", result['distance'])
+                st.metric("Similarité estimée", f"{result['estimated_similarity']:.2%}")
+                # Documents sans rapport : valeurs estimées, sans calcul exact
+                at_most = at_least = "" if result.get('exact', True) else "≈ "
+                st.metric("Similarité", f"{at_most}{result['similarity']:.2%}")
+                st.metric("Distance de Levenshtein", f"{at_least}{result['distance']}")
+                st.metric("Similarité au mot", f"{at_most}{result['word_similarity']:.2%}")
+                st.metric("Mots modifiés", f"{at_least}{result['word_distance']}")
+                if not result.get('exact', True):
+                    st.caption("Documents très différents : valeurs estimées, calcul exact non effectué.")
             
             with col_metrics2:
                 st.metric("Taille du Document 1", f"{result['text1_length']} caracteres")
@@ -165,43 +267,55 @@ if doc1 and doc2 and compare_button:
             # Comparação por tópicos
             st.subheader("Comparaison par section")
             
-            # Encontrar tópicos comuns
-            common_topics = set(topics1.keys()) & set(topics2.keys())
+            section_results = result['sections']
             
-            if common_topics:
-                def sort_key(topic):
-                    # Extraire les entiers de '1.', '2.1.', '10.2'
-                    return [int(part) for part in topic.strip('.').split('.') if part.isdigit()]
-
-                for topic in sorted(common_topics, key=sort_key):
-                    with st.expander(f"Section {topic}"):
+            if section_results:
+                for section in section_results:
+                    topic = section["topic"]
+                    label = f"Section {topic}" + (" (identique)" if section["identical"] else "")
+                    with st.expander(label):
                         col_t1, col_t2 = st.columns(2)
                         with col_t1:
                             st.text_area("Document 1", topics1[topic], height=200, key=f"topic1_{topic}")
                         with col_t2:
                             st.text_area("Document 2", topics2[topic], height=200, key=f"topic2_{topic}")
                         
-                        # Calcular similaridade para este tópico
-                        topic_lev = distance(topics1[topic], topics2[topic])
-                        topic_max_len = max(len(topics1[topic]), len(topics2[topic]))
-                        topic_similarity = 1 - (topic_lev / topic_max_len) if topic_max_len > 0 else 0
-                        st.metric(f"Similarité de Section {topic}", f"{topic_similarity:.2%}")
+                        st.metric(f"Similarité de Section {topic}", f"{section['similarity']:.2%}")
             else:
                 st.warning("Pas de section commune entre les documents.")
             
             with st.expander("🧠 Différences détaillées"):
-                diff_html = generate_diff_html(text1, text2)
-                st.markdown(diff_html, unsafe_allow_html=True)
+                if result['verdict'] == "unrelated":
+                    st.info("Les documents semblent sans rapport : le détail des différences n'est pas généré.")
+                else:
+                    granularity = st.radio("Granularité", ["Mots", "Lignes"], horizontal=True, key="diff_level")
+                    level = "words" if granularity == "Mots" else "lines"
+                    # Script d'édition calculé une fois, rendu page par page (seulement les blocs modifiés)
+                    diff_script = get_diff_script(key1[0], key2[0], key1[2], key2[2], level, text1, text2,
+                                                  result.get('word_script'))
+                    if not diff_script.hunks:
+                        st.info(f"Aucune différence {'mot à mot' if level == 'words' else 'ligne à ligne'} entre les documents.")
+                    else:
+                        diff_pages = diff_script.page_count()
+                        diff_page = 1
+                        if diff_pages > 1:
+                            diff_page = st.number_input(
+                                f"Page de différences (sur {diff_pages})",
+                                min_value=1, max_value=diff_pages, value=1, key=f"diff_page_{level}"
+                            )
+                        st.caption(f"{len(diff_script.hunks)} blocs de différences")
+                        st.markdown(diff_script.render_page(int(diff_page)), unsafe_allow_html=True)
         
     except Exception as e:
         st.error(f"Erreur lors de la comparaison: {str(e)}")
     
     finally:
-        # Nettoyer les fichiers temporaires
-        if doc1_path.exists():
-            doc1_path.unlink()
-        if doc2_path.exists():
-            doc2_path.unlink()
+        # Nettoyer les fichiers temporaires, sauf si le travail les utilise encore
+        if job_finished:
+            if doc1_path.exists():
+                doc1_path.unlink()
+            if doc2_path.exists():
+                doc2_path.unlink()
 
 
 
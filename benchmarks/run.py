@@ -0,0 +1,356 @@
+"""Benchmarks par étape du comparateur.
+
+Chaque étape (extraction PyPDF2, docx_to_text, pdf_to_images, preprocess_image,
+OCR, détection des titres par mise en page, Levenshtein, generate_diff_html)
+est chronométrée séparément sur des documents synthétiques de N pages (voir
+`benchmarks/synthetic.py`) et sur le corpus `docs/examples`.
+
+    python benchmarks/run.py                         # mesure et courbes de mise à l'échelle
+    python benchmarks/run.py --check                 # échoue (code 1) en cas de régression
+    python benchmarks/run.py --update-baseline       # enregistre la référence
+
+Les étapes dont l'outil est absent (Poppler, Tesseract) sont ignorées. La
+référence (`benchmarks/baseline.json`) dépend de la machine : la régénérer
+sur la machine de référence avant de s'en servir comme seuil.
+"""
+import argparse
+import contextlib
+import json
+import math
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from synthetic import generate_corpus
+
+EXAMPLES_DIR = ROOT / "docs" / "examples"
+DEFAULT_BASELINE = ROOT / "benchmarks" / "baseline.json"
+DEFAULT_SIZES = [1, 5, 20]
+# Une mesure est en régression si elle dépasse la référence de ce facteur
+# et d'au moins MIN_DELTA secondes (les étapes très courtes sont trop bruitées)
+DEFAULT_TOLERANCE = 1.5
+MIN_DELTA = 0.010
+
+
+class StageSkipped(Exception):
+    """L'étape ne peut pas être mesurée ici (outil externe absent)"""
+
+
+def _timed(function, repeat):
+    """Médiane des durées de `repeat` exécutions après une exécution de chauffe, sorties console masquées"""
+    durations = []
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        result = function()
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = function()
+            durations.append(time.perf_counter() - start)
+    return statistics.median(durations), result
+
+
+def _require_poppler():
+    from src.preprocessing.pdf_to_image import pdf_page_count
+
+    try:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            pdf_page_count(str(EXAMPLES_DIR / "pdf" / "exemple1.pdf"))
+    except Exception:
+        raise StageSkipped("Poppler indisponible")
+
+
+def _require_tesseract():
+    import numpy as np
+    from src.preprocessing.scan_text_extract import get_ocr_engine_pool
+
+    try:
+        with get_ocr_engine_pool().acquire() as engine:
+            engine.recognize(np.full((64, 256), 255, dtype=np.uint8))
+    except Exception:
+        raise StageSkipped("Tesseract indisponible")
+
+
+def stage_pypdf_text(corpus, repeat):
+    from src.preprocessing.text_extract import pdf_to_text
+
+    return _timed(lambda: pdf_to_text(corpus["pdf1"]), repeat)[0]
+
+
+def stage_docx_to_text(corpus, repeat):
+    from src.preprocessing.text_extract import docx_to_text
+
+    return _timed(lambda: docx_to_text(corpus["docx1"]), repeat)[0]
+
+
+def stage_pdf_to_images(corpus, repeat):
+    from src.preprocessing.pdf_to_image import pdf_to_images
+
+    _require_poppler()
+    with tempfile.TemporaryDirectory() as output_dir:
+        seconds, paths = _timed(lambda: pdf_to_images(corpus["pdf1"], output_dir), repeat)
+    if not paths:
+        raise StageSkipped("Conversion PDF en images impossible")
+    return seconds
+
+
+def stage_preprocess_image(corpus, repeat):
+    from src.preprocessing.scan_text_extract import load_image, preprocess_image
+
+    images = [load_image(path) for path in corpus["scans1"]]
+    if not images:
+        raise StageSkipped("Pas de scan")
+    return _timed(lambda: [preprocess_image(image) for image in images], repeat)[0]
+
+
+def stage_ocr(corpus, repeat):
+    from src.preprocessing.scan_text_extract import get_ocr_engine_pool, load_image, preprocess_image
+
+    _require_tesseract()
+    if not corpus["scans1"]:
+        raise StageSkipped("Pas de scan")
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        images = [preprocess_image(load_image(path)) for path in corpus["scans1"]]
+
+    def recognize_all():
+        with get_ocr_engine_pool().acquire() as engine:
+            return [engine.recognize(image) for image in images]
+
+    return _timed(recognize_all, repeat)[0]
+
+
+def stage_layout_headings(corpus, repeat):
+    from src.preprocessing.layout_sections import clear_page_cache, detect_section_headings_fast
+    from src.preprocessing.parsed_document import ParsedDocument
+
+    def detect():
+        # Mesure à froid : lecture du PDF comprise, sans les titres mémorisés
+        clear_page_cache()
+        with ParsedDocument(corpus["pdf1"]) as document:
+            return detect_section_headings_fast(document)
+
+    return _timed(detect, repeat)[0]
+
+
+def stage_levenshtein(corpus, repeat):
+    from Levenshtein import distance
+
+    return _timed(lambda: distance(corpus["text1"], corpus["text2"]), repeat)[0]
+
+
+def stage_token_diff(corpus, repeat):
+    from src.comparison.token_diff import TokenEditScript
+
+    return _timed(lambda: TokenEditScript(corpus["text1"], corpus["text2"]), repeat)[0]
+
+
+def stage_compare_texts(corpus, repeat):
+    from src.comparison.similarity import compare_texts
+
+    return _timed(lambda: compare_texts(corpus["text1"], corpus["text2"]), repeat)[0]
+
+
+def stage_word_diff_html(corpus, repeat):
+    from src.comparison.diff_view import WordDiffScript
+
+    return _timed(lambda: WordDiffScript(corpus["text1"], corpus["text2"]).render_page(1), repeat)[0]
+
+
+def stage_diff_html(corpus, repeat):
+    from src.preprocessing.document_utils import generate_diff_html
+
+    return _timed(lambda: generate_diff_html(corpus["text1"], corpus["text2"]), repeat)[0]
+
+
+STAGES = {
+    "pypdf_text": stage_pypdf_text,
+    "docx_to_text": stage_docx_to_text,
+    "pdf_to_images": stage_pdf_to_images,
+    "preprocess_image": stage_preprocess_image,
+    "ocr": stage_ocr,
+    "layout_headings": stage_layout_headings,
+    "levenshtein": stage_levenshtein,
+    "token_diff": stage_token_diff,
+    "compare_texts": stage_compare_texts,
+    "diff_html": stage_diff_html,
+    "word_diff_html": stage_word_diff_html,
+}
+
+
+def examples_corpus():
+    """Paire de référence de docs/examples, au même format que `generate_corpus`"""
+    from src.preprocessing.text_extract import docx_to_text, pdf_to_text
+
+    pdf1, pdf2 = EXAMPLES_DIR / "pdf" / "exemple1.pdf", EXAMPLES_DIR / "pdf" / "exemple1_diff.pdf"
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        text1, text2 = pdf_to_text(str(pdf1)), pdf_to_text(str(pdf2))
+    return {
+        "pages": "examples",
+        "text1": text1,
+        "text2": text2,
+        "pdf1": str(pdf1),
+        "pdf2": str(pdf2),
+        "docx1": str(EXAMPLES_DIR / "doc" / "exemple1.docx"),
+        "docx2": str(EXAMPLES_DIR / "doc" / "exemple1_diff.docx"),
+        "scans1": [str(EXAMPLES_DIR / "img" / "exemple1_scanned.jpg")],
+    }
+
+
+def run_benchmarks(sizes, stages, repeat=3, edit_rate=0.02, log=print):
+    """Mesure chaque étape pour chaque taille ; retourne {étape: {taille: secondes}}"""
+    results = {stage: {} for stage in stages}
+    skipped = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        corpora = [examples_corpus()]
+        for size in sizes:
+            log(f"Génération du corpus synthétique de {size} pages...")
+            corpora.append(generate_corpus(Path(work_dir) / f"n{size}", size, edit_rate,
+                                           scans="preprocess_image" in stages or "ocr" in stages))
+        for corpus in corpora:
+            for stage in stages:
+                if stage in skipped:
+                    continue
+                try:
+                    seconds = STAGES[stage](corpus, repeat)
+                except StageSkipped as e:
+                    skipped[stage] = str(e)
+                    log(f"  {stage}: ignorée ({e})")
+                    continue
+                results[stage][str(corpus["pages"])] = seconds
+                log(f"  {stage} [{corpus['pages']}]: {seconds * 1000:.1f} ms")
+    return {stage: timings for stage, timings in results.items() if timings}, skipped
+
+
+def scaling_exponent(timings):
+    """Pente log-log du temps en fonction du nombre de pages (1 = linéaire)"""
+    points = [(math.log(int(size)), math.log(seconds)) for size, seconds in timings.items()
+              if size.isdigit() and seconds > 0]
+    if len(points) < 2:
+        return None
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    variance = sum((x - mean_x) ** 2 for x, _ in points)
+    if not variance:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / variance
+
+
+def format_table(results):
+    """Tableau des durées (ms) par étape et par taille, avec l'exposant de mise à l'échelle"""
+    sizes = sorted({size for timings in results.values() for size in timings},
+                   key=lambda size: (not size.isdigit(), int(size) if size.isdigit() else 0))
+    header = ["étape"] + [f"{size} p." if size.isdigit() else size for size in sizes] + ["exposant"]
+    rows = [header]
+    for stage, timings in results.items():
+        exponent = scaling_exponent(timings)
+        rows.append([stage] + [f"{timings[size] * 1000:.1f}" if size in timings else "-" for size in sizes]
+                    + [f"{exponent:.2f}" if exponent is not None else "-"])
+    widths = [max(len(row[column]) for row in rows) for column in range(len(header))]
+    return "\n".join("  ".join(cell.rjust(width) for cell, width in zip(row, widths)) for row in rows)
+
+
+def write_csv(results, path):
+    import csv
+
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["stage", "size", "seconds"])
+        for stage, timings in results.items():
+            for size, seconds in timings.items():
+                writer.writerow([stage, size, f"{seconds:.6f}"])
+
+
+def plot_scaling(results, path):
+    """Courbes log-log par étape (ignoré si matplotlib n'est pas installé)"""
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        return False
+    fig, ax = plt.subplots(figsize=(8, 5))
+    for stage, timings in results.items():
+        points = sorted((int(size), seconds) for size, seconds in timings.items() if size.isdigit())
+        if points:
+            ax.plot(*zip(*points), marker="o", label=stage)
+    ax.set_xscale("log")
+    ax.set_yscale("log")
+    ax.set_xlabel("pages")
+    ax.set_ylabel("secondes")
+    ax.legend()
+    fig.savefig(path, dpi=100, bbox_inches="tight")
+    plt.close(fig)
+    return True
+
+
+def find_regressions(results, baseline, tolerance=DEFAULT_TOLERANCE, min_delta=MIN_DELTA):
+    """Mesures plus lentes que la référence au-delà de la tolérance"""
+    regressions = []
+    for stage, timings in results.items():
+        for size, seconds in timings.items():
+            reference = baseline.get(stage, {}).get(size)
+            if reference is None:
+                continue
+            if seconds > reference * tolerance and seconds - reference > min_delta:
+                regressions.append((stage, size, reference, seconds))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks par étape du comparateur")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="Nombres de pages des documents synthétiques")
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES))
+    parser.add_argument("--repeat", type=int, default=3, help="Exécutions par mesure (médiane)")
+    parser.add_argument("--edit-rate", type=float, default=0.02)
+    parser.add_argument("--output", default=None, help="Dossier des résultats (JSON, CSV, courbes)")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+    parser.add_argument("--check", action="store_true", help="Échoue en cas de régression")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args(argv)
+
+    results, skipped = run_benchmarks(args.sizes, args.stages, args.repeat, args.edit_rate)
+    print()
+    print(format_table(results))
+
+    if args.output:
+        output = Path(args.output)
+        output.mkdir(parents=True, exist_ok=True)
+        report = {"machine": platform.platform(), "python": platform.python_version(),
+                  "results": results, "skipped": skipped}
+        (output / "results.json").write_text(json.dumps(report, indent=2), encoding="utf-8")
+        write_csv(results, output / "results.csv")
+        if plot_scaling(results, output / "scaling.png"):
+            print(f"Courbes de mise à l'échelle: {output / 'scaling.png'}")
+        print(f"Résultats écrits dans {output}")
+
+    if args.update_baseline:
+        baseline = {"machine": platform.platform(), "results": results}
+        Path(args.baseline).write_text(json.dumps(baseline, indent=2) + "\n", encoding="utf-8")
+        print(f"Référence mise à jour: {args.baseline}")
+        return 0
+
+    if args.check:
+        try:
+            baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))["results"]
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Référence illisible ({args.baseline}): {e}")
+            return 2
+        regressions = find_regressions(results, baseline, args.tolerance)
+        for stage, size, reference, seconds in regressions:
+            print(f"RÉGRESSION {stage} [{size}]: {reference * 1000:.1f} ms -> {seconds * 1000:.1f} ms")
+        if regressions:
+            return 1
+        print("Aucune régression par rapport à la référence")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
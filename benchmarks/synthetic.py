@@ -0,0 +1,226 @@
+"""Générateur de documents synthétiques pour les benchmarks.
+
+Produit, pour N pages, un texte numéroté en sections puis sa variante modifiée
+à un taux d'édition contrôlé, sous forme de PDF (couche texte), DOCX et scans
+(images PNG, éventuellement inclinées et bruitées). Le générateur est
+déterministe : même graine, mêmes documents.
+
+    python benchmarks/synthetic.py --pages 20 --edit-rate 0.02 --output /tmp/corpus
+"""
+import argparse
+import random
+from pathlib import Path
+
+# Mots ASCII uniquement : le rendu des scans (OpenCV) ne gère pas les accents
+VOCABULARY = (
+    "contrat article partie client fournisseur prestation montant delai livraison "
+    "facture paiement resiliation garantie responsabilite document annexe clause "
+    "condition obligation service periode duree tarif date signature accord "
+    "modification donnees securite confidentialite preavis penalite volume site "
+    "transport marchandise assurance dommage reclamation litige juridiction droit"
+).split()
+
+LINES_PER_PAGE = 48
+WORDS_PER_LINE = 11
+LINES_PER_SECTION = 16
+
+# Géométrie des PDF générés (A4 en points)
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842
+MARGIN = 56
+BODY_SIZE, HEADING_SIZE = 10, 14
+LINE_HEIGHT = 15
+
+
+def synthetic_pages(page_count, seed=0):
+    """Pages de texte : listes de lignes (type, texte), avec un titre de section régulier"""
+    rng = random.Random(seed)
+    pages = []
+    section = 0
+    for _ in range(page_count):
+        lines = []
+        for line_index in range(LINES_PER_PAGE):
+            if line_index % LINES_PER_SECTION == 0:
+                section += 1
+                title = " ".join(rng.choice(VOCABULARY) for _ in range(3)).capitalize()
+                lines.append(("heading", f"{section}. {title}"))
+            else:
+                words = [rng.choice(VOCABULARY) for _ in range(WORDS_PER_LINE)]
+                lines.append(("body", " ".join(words)))
+        pages.append(lines)
+    return pages
+
+
+def apply_edits(pages, edit_rate, seed=1):
+    """Variante des pages où chaque mot du corps est modifié avec la probabilité `edit_rate`.
+
+    Une modification est une substitution, une suppression ou une insertion ;
+    les titres ne changent pas, pour que les sections restent comparables.
+    """
+    rng = random.Random(seed)
+    edited = []
+    for lines in pages:
+        new_lines = []
+        for kind, text in lines:
+            if kind == "heading":
+                new_lines.append((kind, text))
+                continue
+            words = []
+            for word in text.split():
+                if rng.random() >= edit_rate:
+                    words.append(word)
+                    continue
+                action = rng.choice(["substitute", "delete", "insert"])
+                if action == "substitute":
+                    words.append(rng.choice(VOCABULARY))
+                elif action == "insert":
+                    words.extend([word, rng.choice(VOCABULARY)])
+            new_lines.append((kind, " ".join(words)))
+        edited.append(new_lines)
+    return edited
+
+
+def pages_to_text(pages):
+    """Texte brut des pages (une ligne par ligne, pages séparées par un saut de ligne)"""
+    return "".join("\n".join(text for _, text in lines) + "\n" for lines in pages)
+
+
+def _pdf_escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(pages, path):
+    """Écrit un PDF minimal (police Helvetica, titres en plus gros) sans dépendance externe"""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # arbre des pages, complété une fois les pages connues
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    ]
+    page_ids = []
+    for lines in pages:
+        commands = ["BT"]
+        y = PAGE_HEIGHT - MARGIN
+        for kind, text in lines:
+            size = HEADING_SIZE if kind == "heading" else BODY_SIZE
+            commands.append(f"/F1 {size} Tf 1 0 0 1 {MARGIN} {y} Tm ({_pdf_escape(text)}) Tj")
+            y -= LINE_HEIGHT
+        commands.append("ET")
+        stream = "\n".join(commands).encode("cp1252")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Resources << /Font << /F1 3 0 R >> >> "
+            b"/Contents %d 0 R >>" % (PAGE_WIDTH, PAGE_HEIGHT, content_id)
+        )
+        page_ids.append(len(objects))
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids).encode()
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    output += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    output += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    Path(path).write_bytes(bytes(output))
+
+
+def write_docx(pages, path):
+    """Écrit un DOCX (titres en style « Heading 1 », un saut de page par page)"""
+    from docx import Document
+
+    document = Document()
+    for page_index, lines in enumerate(pages):
+        for kind, text in lines:
+            if kind == "heading":
+                # docx_to_text renumérote les titres : ne garder que l'intitulé
+                document.add_heading(text.split(" ", 1)[1], level=1)
+            else:
+                document.add_paragraph(text)
+        if page_index < len(pages) - 1:
+            document.add_page_break()
+    document.save(str(path))
+
+
+def render_scan(lines, skew=0.0, noise=0.0, seed=0):
+    """Rend une page en image niveaux de gris A4 à 300 dpi, façon scan"""
+    import cv2
+    import numpy as np
+
+    height, width = 3508, 2480
+    image = np.full((height, width), 255, dtype=np.uint8)
+    y = 240
+    for kind, text in lines:
+        scale = 1.6 if kind == "heading" else 1.2
+        cv2.putText(image, text, (230, y), cv2.FONT_HERSHEY_SIMPLEX, scale, 0, 3 if kind == "heading" else 2,
+                    cv2.LINE_AA)
+        y += 64
+    if skew:
+        matrix = cv2.getRotationMatrix2D((width / 2, height / 2), skew, 1.0)
+        image = cv2.warpAffine(image, matrix, (width, height), borderValue=255)
+    if noise:
+        rng = np.random.default_rng(seed)
+        image = np.clip(image + rng.normal(0, noise, image.shape), 0, 255).astype(np.uint8)
+    return image
+
+
+def write_scans(pages, directory, prefix="scan", skew=0.0, noise=0.0):
+    """Écrit une image PNG par page ; retourne les chemins"""
+    import cv2
+
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for page_num, lines in enumerate(pages, start=1):
+        path = directory / f"{prefix}_{page_num:04d}.png"
+        cv2.imwrite(str(path), render_scan(lines, skew, noise, seed=page_num))
+        paths.append(str(path))
+    return paths
+
+
+def generate_corpus(directory, page_count, edit_rate=0.02, seed=0, scans=True, skew=0.0, noise=0.0):
+    """Génère un document de `page_count` pages et sa variante dans tous les formats.
+
+    Retourne un dictionnaire des chemins et des textes de référence.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    base = synthetic_pages(page_count, seed)
+    edited = apply_edits(base, edit_rate, seed + 1)
+
+    corpus = {
+        "pages": page_count,
+        "edit_rate": edit_rate,
+        "text1": pages_to_text(base),
+        "text2": pages_to_text(edited),
+        "pdf1": str(directory / "base.pdf"),
+        "pdf2": str(directory / "edited.pdf"),
+        "docx1": str(directory / "base.docx"),
+        "docx2": str(directory / "edited.docx"),
+        "scans1": [],
+    }
+    write_pdf(base, corpus["pdf1"])
+    write_pdf(edited, corpus["pdf2"])
+    write_docx(base, corpus["docx1"])
+    write_docx(edited, corpus["docx2"])
+    if scans:
+        corpus["scans1"] = write_scans(base, directory / "scans", skew=skew, noise=noise)
+    return corpus
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Génère un corpus synthétique (PDF, DOCX, scans)")
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--edit-rate", type=float, default=0.02)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skew", type=float, default=0.0, help="Inclinaison des scans (degrés)")
+    parser.add_argument("--noise", type=float, default=0.0, help="Écart-type du bruit des scans")
+    parser.add_argument("--no-scans", action="store_true")
+    parser.add_argument("--output", default="benchmarks/corpus")
+    args = parser.parse_args()
+
+    corpus = generate_corpus(args.output, args.pages, args.edit_rate, args.seed, not args.no_scans,
+                             args.skew, args.noise)
+    print(f"Corpus de {args.pages} pages écrit dans {args.output}")
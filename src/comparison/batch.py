@@ -0,0 +1,167 @@
+import csv
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+
+from src.comparison.similarity import compare_texts
+from src.comparison.sketch import DocumentSketch
+from src.tracing import configure_logging
+
+SUPPORTED_TYPES = ['.pdf', '.docx', '.jpg', '.jpeg', '.png']
+
+# Colonnes des résultats, dans l'ordre de sortie CSV
+RESULT_FIELDS = [
+    "reference", "candidate", "similarity", "distance", "word_similarity", "word_distance",
+    "estimated_similarity", "verdict", "exact", "pages1", "pages2", "length1", "length2", "error",
+]
+
+
+def collect_documents(path):
+    """Liste les documents pris en charge d'un dossier (ou retourne le fichier lui-même)"""
+    path = Path(path)
+    if path.is_dir():
+        return sorted(str(p) for p in path.iterdir() if p.suffix.lower() in SUPPORTED_TYPES)
+    return [str(path)]
+
+
+def reference_pairs(reference, candidates):
+    """Paires (référence, candidat) pour comparer une référence à plusieurs candidats"""
+    return [(reference, candidate) for candidate in candidates if candidate != reference]
+
+
+def cross_pairs(references, candidates):
+    """Toutes les paires N×M entre deux ensembles de documents"""
+    return [(reference, candidate) for reference in references for candidate in candidates]
+
+
+def _init_worker():
+    # Les messages des bibliothèques vont sur stderr pour ne pas les mélanger aux
+    # résultats écrits sur la sortie standard
+    sys.stdout = sys.stderr
+    configure_logging()
+
+
+def extract_for_comparison(file_path):
+    """Extraction d'un document dans un processus du pool (cache d'extraction partagé sur disque)"""
+    from src.preprocessing.document_utils import extract_document
+    from src.preprocessing.extraction_cache import get_extraction_cache
+
+    file_type = Path(file_path).suffix.lower()
+    # Le parallélisme est déjà assuré par le pool : pas de pool OCR imbriqué ;
+    # les sections ne figurent pas dans les résultats en lot
+    extraction = extract_document(file_path, file_type, cache=get_extraction_cache(), ocr_workers=1,
+                                  sections=False)
+    if not extraction["text"]:
+        raise ValueError(f"Le document n'a pas pu être lu (type: {file_type})")
+    return {
+        "text": extraction["text"],
+        "page_count": extraction["page_count"],
+        "sketch": DocumentSketch.from_text(extraction["text"]).to_bytes(),
+    }
+
+
+def compare_extracted(reference, candidate, document1, document2):
+    """Comparaison d'une paire de documents extraits dans un processus du pool"""
+    comparison = compare_texts(
+        document1["text"],
+        document2["text"],
+        DocumentSketch.from_bytes(document1["sketch"]),
+        DocumentSketch.from_bytes(document2["sketch"]),
+    )
+    return {
+        "reference": reference,
+        "candidate": candidate,
+        "similarity": comparison["similarity"],
+        "distance": comparison["distance"],
+        "word_similarity": comparison["word_similarity"],
+        "word_distance": comparison["word_distance"],
+        "estimated_similarity": comparison["estimated_similarity"],
+        "verdict": comparison["verdict"],
+        "exact": comparison["exact"],
+        "pages1": document1["page_count"],
+        "pages2": document2["page_count"],
+        "length1": len(document1["text"]),
+        "length2": len(document2["text"]),
+        "error": None,
+    }
+
+
+def _error_record(reference, candidate, error):
+    record = dict.fromkeys(RESULT_FIELDS)
+    record.update(reference=reference, candidate=candidate, error=error)
+    return record
+
+
+def iter_batch_comparisons(pairs, max_workers=None):
+    """Compare des paires de documents sur un pool de processus et produit les résultats au fil de l'eau.
+
+    Chaque document distinct n'est extrait qu'une fois, quel que soit le nombre de
+    paires dans lesquelles il apparaît. Une paire est comparée dès que ses deux
+    documents sont extraits ; les résultats sont produits dans l'ordre où ils se
+    terminent, pas dans l'ordre des paires.
+    """
+    pairs = list(pairs)
+    paths = list(dict.fromkeys(path for pair in pairs for path in pair))
+    waiting = {path: [] for path in paths}
+    for pair in pairs:
+        for path in set(pair):
+            waiting[path].append(pair)
+
+    documents = {}
+    errors = {}
+
+    with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count(), initializer=_init_worker) as executor:
+        pending = {executor.submit(extract_for_comparison, path): ("extract", path) for path in paths}
+
+        while pending:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                kind, payload = pending.pop(future)
+
+                if kind == "compare":
+                    reference, candidate = payload
+                    try:
+                        yield future.result()
+                    except Exception as e:
+                        yield _error_record(reference, candidate, str(e))
+                    continue
+
+                path = payload
+                try:
+                    documents[path] = future.result()
+                except Exception as e:
+                    errors[path] = str(e)
+
+                # Lancer les paires dont les deux documents sont désormais prêts
+                for reference, candidate in waiting.pop(path):
+                    other = candidate if reference == path else reference
+                    if path in errors:
+                        # Une paire dont l'autre document a déjà échoué a déjà été signalée
+                        if other == path or other not in errors:
+                            yield _error_record(reference, candidate, errors[path])
+                        continue
+                    if other in errors:
+                        continue
+                    if reference in documents and candidate in documents:
+                        compare_future = executor.submit(
+                            compare_extracted, reference, candidate, documents[reference], documents[candidate]
+                        )
+                        pending[compare_future] = ("compare", (reference, candidate))
+
+
+def write_jsonl(records, stream):
+    """Écrit les résultats au format JSON Lines, un résultat par ligne dès qu'il arrive"""
+    for record in records:
+        stream.write(json.dumps(record, ensure_ascii=False) + "\n")
+        stream.flush()
+
+
+def write_csv(records, stream):
+    """Écrit les résultats au format CSV, une ligne dès qu'un résultat arrive"""
+    writer = csv.DictWriter(stream, fieldnames=RESULT_FIELDS)
+    writer.writeheader()
+    for record in records:
+        writer.writerow(record)
+        stream.flush()
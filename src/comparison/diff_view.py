@@ -0,0 +1,184 @@
+import html
+import math
+from difflib import SequenceMatcher
+
+from src.comparison.token_diff import TokenEditScript
+
+# Lignes (ou mots) de contexte autour de chaque bloc de différences et blocs affichés par page
+DEFAULT_CONTEXT_LINES = 3
+DEFAULT_CONTEXT_WORDS = 8
+DEFAULT_HUNKS_PER_PAGE = 10
+
+DIFF_STYLE = """
+<style>
+table.diff-view {font-family: monospace; font-size: 0.8em; border-collapse: collapse; width: 100%;}
+table.diff-view td {vertical-align: top; padding: 0 4px; white-space: pre-wrap; word-break: break-word;}
+table.diff-view td.diff-lineno {color: #888; text-align: right; width: 3em;}
+table.diff-view tr.diff-hunk td {background: #eef; color: #555;}
+table.diff-view .diff-add {background: #aaffaa;}
+table.diff-view .diff-sub {background: #ffaaaa;}
+table.diff-view .diff-chg {background: #ffff77;}
+table.diff-view del {text-decoration: line-through;}
+table.diff-view ins {text-decoration: none;}
+</style>
+"""
+
+
+class _PagedHunks:
+    """Pagination des blocs de différences (hunks) d'un script d'édition"""
+
+    def page_count(self, hunks_per_page=DEFAULT_HUNKS_PER_PAGE):
+        return max(1, math.ceil(len(self.hunks) / hunks_per_page))
+
+    def page_hunks(self, page, hunks_per_page=DEFAULT_HUNKS_PER_PAGE):
+        """Blocs de différences d'une page (numérotée à partir de 1)"""
+        start = (page - 1) * hunks_per_page
+        return self.hunks[start:start + hunks_per_page]
+
+    def render_page(self, page, hunks_per_page=DEFAULT_HUNKS_PER_PAGE):
+        """Rendu HTML des blocs de différences d'une page seulement"""
+        return self.render_hunks(self.page_hunks(page, hunks_per_page))
+
+
+class DiffScript(_PagedHunks):
+    """Script d'édition ligne à ligne entre deux textes, calculé une seule fois.
+
+    Le script ne conserve que les blocs de différences (hunks) avec leur contexte,
+    sous forme d'opcodes ; le rendu HTML se fait à la demande, bloc par bloc, si
+    bien que le coût d'affichage dépend du nombre de changements et non de la
+    longueur des documents.
+    """
+
+    def __init__(self, text1, text2, context=DEFAULT_CONTEXT_LINES):
+        self.lines1 = text1.splitlines()
+        self.lines2 = text2.splitlines()
+        matcher = SequenceMatcher(None, self.lines1, self.lines2)
+        self.hunks = [list(group) for group in matcher.get_grouped_opcodes(context)]
+
+    @property
+    def identical(self):
+        return self.lines1 == self.lines2
+
+    def render_hunks(self, hunks):
+        return render_hunks_html(self, hunks)
+
+
+class WordDiffScript(_PagedHunks):
+    """Script d'édition mot à mot, rendu en texte suivi (mots supprimés barrés, ajoutés surlignés).
+
+    Repose sur `TokenEditScript` ; un script déjà calculé (par exemple par
+    `compare_texts`) peut être fourni pour ne pas refaire le diff.
+    """
+
+    def __init__(self, text1, text2, context=DEFAULT_CONTEXT_WORDS, script=None):
+        self.script = script or TokenEditScript(text1, text2)
+        self.hunks = self.script.grouped_opcodes(context)
+
+    @property
+    def identical(self):
+        return not self.hunks
+
+    def render_hunks(self, hunks):
+        return render_word_hunks_html(self.script, hunks)
+
+
+def _highlight_pair(line1, line2):
+    """Surligne les caractères modifiés entre deux lignes appariées"""
+    matcher = SequenceMatcher(None, line1, line2)
+    out1, out2 = [], []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        part1 = html.escape(line1[i1:i2])
+        part2 = html.escape(line2[j1:j2])
+        if tag == "equal":
+            out1.append(part1)
+            out2.append(part2)
+            continue
+        if part1:
+            out1.append(f'<span class="diff-chg">{part1}</span>')
+        if part2:
+            out2.append(f'<span class="diff-chg">{part2}</span>')
+    return "".join(out1), "".join(out2)
+
+
+def _row(lineno1, cell1, lineno2, cell2, class1="", class2=""):
+    return (
+        f'<tr><td class="diff-lineno">{lineno1}</td><td class="{class1}">{cell1}</td>'
+        f'<td class="diff-lineno">{lineno2}</td><td class="{class2}">{cell2}</td></tr>'
+    )
+
+
+def render_hunks_html(script, hunks):
+    """Rendu HTML côte à côte d'une liste de blocs de différences"""
+    rows = []
+    for hunk in hunks:
+        first, last = hunk[0], hunk[-1]
+        rows.append(
+            f'<tr class="diff-hunk"><td colspan="4">Document 1 : lignes {first[1] + 1}-{last[2]} '
+            f'· Document 2 : lignes {first[3] + 1}-{last[4]}</td></tr>'
+        )
+        for tag, i1, i2, j1, j2 in hunk:
+            if tag == "equal":
+                for offset in range(i2 - i1):
+                    line = html.escape(script.lines1[i1 + offset])
+                    rows.append(_row(i1 + offset + 1, line, j1 + offset + 1, line))
+            elif tag == "replace":
+                # Les lignes appariées sont surlignées au caractère près, le reste en ajout/suppression
+                for offset in range(max(i2 - i1, j2 - j1)):
+                    i, j = i1 + offset, j1 + offset
+                    if i < i2 and j < j2:
+                        cell1, cell2 = _highlight_pair(script.lines1[i], script.lines2[j])
+                        rows.append(_row(i + 1, cell1, j + 1, cell2))
+                    elif i < i2:
+                        rows.append(_row(i + 1, html.escape(script.lines1[i]), "", "", "diff-sub"))
+                    else:
+                        rows.append(_row("", "", j + 1, html.escape(script.lines2[j]), "", "diff-add"))
+            elif tag == "delete":
+                for i in range(i1, i2):
+                    rows.append(_row(i + 1, html.escape(script.lines1[i]), "", "", "diff-sub"))
+            elif tag == "insert":
+                for j in range(j1, j2):
+                    rows.append(_row("", "", j + 1, html.escape(script.lines2[j]), "", "diff-add"))
+
+    return (
+        DIFF_STYLE
+        + '<table class="diff-view"><thead><tr><th></th><th>Document 1</th><th></th><th>Document 2</th></tr></thead>'
+        + "<tbody>" + "".join(rows) + "</tbody></table>"
+    )
+
+
+def _line_range(text, start, end):
+    first = text.count("\n", 0, start) + 1
+    return first, first + text.count("\n", start, max(start, end - 1))
+
+
+def render_word_hunks_html(script, hunks):
+    """Rendu HTML en texte suivi d'une liste de blocs de différences mot à mot"""
+    rows = []
+    for hunk in hunks:
+        (start1, _), (start2, _) = script.segments(hunk[0])
+        (_, end1), (_, end2) = script.segments(hunk[-1])
+        first1, last1 = _line_range(script.text1, start1, end1)
+        first2, last2 = _line_range(script.text2, start2, end2)
+        rows.append(
+            f'<tr class="diff-hunk"><td>Document 1 : lignes {first1}-{last1} '
+            f'· Document 2 : lignes {first2}-{last2}</td></tr>'
+        )
+        parts = []
+        for opcode in hunk:
+            (s1, e1), (s2, e2) = script.segments(opcode)
+            removed = html.escape(script.text1[s1:e1])
+            added = html.escape(script.text2[s2:e2])
+            if opcode[0] == "equal":
+                parts.append(removed)
+                continue
+            if removed:
+                parts.append(f'<del class="diff-sub">{removed}</del>')
+            if added:
+                parts.append(f'<ins class="diff-add">{added}</ins>')
+        rows.append(f'<tr><td>{"".join(parts)}</td></tr>')
+
+    return (
+        DIFF_STYLE
+        + '<table class="diff-view"><thead><tr><th>Document 1 → Document 2</th></tr></thead>'
+        + "<tbody>" + "".join(rows) + "</tbody></table>"
+    )
@@ -0,0 +1,182 @@
+import logging
+import os
+from pathlib import Path
+
+from src.tracing import flush_metrics, get_tracer
+
+# Version du format de résultat de `compare_files` : incrémentée à chaque changement
+# incompatible (champ renommé ou retiré), pas lors de l'ajout d'un champ
+SCHEMA_VERSION = 1
+
+
+def analyze_documents(doc1_path, doc2_path, reporter=None, ocr_workers=None):
+    """Extraction et comparaison complètes d'une paire de documents.
+
+    Retourne les textes, nombres de pages, sections, métriques de similarité,
+    script d'édition mot à mot (`word_script`, voir `TokenEditScript`) et
+    comparaisons de sections (format interne, utilisé par l'interface), ainsi
+    que la durée de chaque étape (`timings`, voir `src.tracing`).
+    `reporter` (voir `src.jobs.JobReporter`) reçoit l'avancement par étape et
+    par page OCR, et interrompt le calcul si le travail est annulé.
+    """
+    tracer = get_tracer()
+    try:
+        with tracer.span("comparison", level=logging.INFO) as root:
+            analysis = _analyze_documents(tracer, doc1_path, doc2_path, reporter, ocr_workers)
+        analysis["timings"] = {name: round(seconds, 4) for name, seconds in tracer.stage_timings(root.trace_id).items()}
+        return analysis
+    finally:
+        flush_metrics()
+
+
+def _analyze_documents(tracer, doc1_path, doc2_path, reporter, ocr_workers):
+    from src.preprocessing.document_utils import extract_document
+    from src.preprocessing.extraction_cache import get_extraction_cache
+    from src.comparison.similarity import compare_texts
+    from src.comparison.sections import get_section_comparator
+
+    cache = get_extraction_cache()
+    extractions = []
+    for index, path in enumerate([doc1_path, doc2_path], start=1):
+        stage = f"extraction_{index}"
+        progress_callback = None
+        if reporter is not None:
+            reporter.stage(stage)
+            progress_callback = reporter.page_callback(stage)
+        file_type = os.path.splitext(str(path))[1].lower()
+        with tracer.span(stage, file_type=file_type):
+            extraction = extract_document(str(path), file_type, cache=cache, ocr_workers=ocr_workers,
+                                          progress_callback=progress_callback)
+        if not extraction["text"]:
+            raise ValueError(f"Le document {index} n'a pas pu être lu (type: {file_type})")
+        extractions.append(extraction)
+
+    extraction1, extraction2 = extractions
+    text1, text2 = extraction1["text"], extraction2["text"]
+
+    # Point de contrôle de l'annulation dans les boucles de calcul
+    check = reporter.cancel_check() if reporter is not None else None
+    if reporter is not None:
+        reporter.stage("comparison")
+    # L'estimation MinHash évite le calcul exact pour les documents sans rapport ;
+    # le diff mot à mot borne ensuite le calcul de Levenshtein
+    with tracer.span("similarity", chars=len(text1) + len(text2)) as current:
+        comparison = compare_texts(text1, text2, check=check)
+        if comparison["word_script"] is not None:
+            current.set(tokens=comparison["word_script"].length1 + comparison["word_script"].length2)
+
+    if reporter is not None:
+        reporter.stage("sections")
+    topics1 = extraction1["sections"]
+    topics2 = extraction2["sections"]
+    with tracer.span("section_comparison", sections=len(topics1) + len(topics2)):
+        # Sections communes : identiques écartées par empreinte, déjà comparées servies par le mémo
+        sections = get_section_comparator().compare(topics1, topics2, check=check, max_workers=ocr_workers)
+
+    return {
+        'text1': text1,
+        'text2': text2,
+        'distance': comparison['distance'],
+        'similarity': comparison['similarity'],
+        'word_distance': comparison['word_distance'],
+        'word_similarity': comparison['word_similarity'],
+        'word_script': comparison['word_script'],
+        'estimated_similarity': comparison['estimated_similarity'],
+        'verdict': comparison['verdict'],
+        'exact': comparison['exact'],
+        'text1_length': len(text1),
+        'text2_length': len(text2),
+        'pages1': extraction1["page_count"],
+        'pages2': extraction2["page_count"],
+        'topics1': topics1,
+        'topics2': topics2,
+        'sections': sections,
+    }
+
+
+def serialize_edit_script(script):
+    """Blocs de différences d'un DiffScript sous forme sérialisable (JSON).
+
+    Chaque bloc est une liste d'opérations {"op", "lines1", "lines2"} où
+    `lines1`/`lines2` sont des intervalles [début, fin) de numéros de ligne (à
+    partir de 0) ; les opérations autres que "equal" portent aussi les lignes
+    retirées (`removed`) et ajoutées (`added`).
+    """
+    hunks = []
+    for hunk in script.hunks:
+        operations = []
+        for tag, i1, i2, j1, j2 in hunk:
+            operation = {"op": tag, "lines1": [i1, i2], "lines2": [j1, j2]}
+            if tag != "equal":
+                operation["removed"] = script.lines1[i1:i2]
+                operation["added"] = script.lines2[j1:j2]
+            operations.append(operation)
+        hunks.append(operations)
+    return hunks
+
+
+def build_result(analysis, doc1_path, doc2_path, include_text=False, include_edit_script=True):
+    """Met le résultat de `analyze_documents` au format stable (version SCHEMA_VERSION).
+
+    Champs : `schema_version`, `documents` (chemin, type, pages, longueur et
+    sections de chaque document), `distance`, `similarity` (au caractère),
+    `word_distance`, `word_similarity` (au mot), `estimated_similarity`, `verdict`,
+    `exact` (faux pour des documents sans rapport, dont les distances et
+    similarités sont estimées sans calcul), `sections` (sections communes avec
+    `topic`, `distance`, `similarity`, `identical`), `sections_only_in_1`,
+    `sections_only_in_2` et `edit_script` (voir `serialize_edit_script` ; None
+    pour des documents sans rapport ou si `include_edit_script` est faux) et
+    `timings` (durée en secondes de chaque étape de l'analyse).
+    `include_text` ajoute le texte extrait de chaque document.
+    """
+    from src.comparison.diff_view import DiffScript
+    from src.comparison.sections import section_sort_key
+
+    topics1, topics2 = analysis["topics1"], analysis["topics2"]
+    documents = []
+    for index, path in enumerate([doc1_path, doc2_path], start=1):
+        topics = analysis[f"topics{index}"]
+        document = {
+            "path": str(path),
+            "file_type": Path(path).suffix.lower(),
+            "page_count": analysis[f"pages{index}"],
+            "length": analysis[f"text{index}_length"],
+            "sections": sorted(topics, key=section_sort_key),
+        }
+        if include_text:
+            document["text"] = analysis[f"text{index}"]
+        documents.append(document)
+
+    edit_script = None
+    if include_edit_script and analysis["verdict"] != "unrelated":
+        with get_tracer().span("edit_script"):
+            edit_script = serialize_edit_script(DiffScript(analysis["text1"], analysis["text2"]))
+
+    return {
+        "schema_version": SCHEMA_VERSION,
+        "documents": documents,
+        "distance": analysis["distance"],
+        "similarity": analysis["similarity"],
+        "word_distance": analysis.get("word_distance"),
+        "word_similarity": analysis.get("word_similarity"),
+        "estimated_similarity": analysis["estimated_similarity"],
+        "verdict": analysis["verdict"],
+        "exact": analysis.get("exact", True),
+        "sections": analysis["sections"],
+        "sections_only_in_1": sorted(set(topics1) - set(topics2), key=section_sort_key),
+        "sections_only_in_2": sorted(set(topics2) - set(topics1), key=section_sort_key),
+        "edit_script": edit_script,
+        "timings": analysis.get("timings", {}),
+    }
+
+
+def compare_files(doc1_path, doc2_path, reporter=None, ocr_workers=None, include_text=False,
+                  include_edit_script=True):
+    """Compare deux documents (PDF, DOCX ou images) ; retourne le résultat au format stable.
+
+    Point d'entrée de la bibliothèque : voir `build_result` pour la description
+    des champs. Les extractions passent par le cache partagé.
+    """
+    analysis = analyze_documents(doc1_path, doc2_path, reporter=reporter, ocr_workers=ocr_workers)
+    return build_result(analysis, doc1_path, doc2_path, include_text=include_text,
+                        include_edit_script=include_edit_script)
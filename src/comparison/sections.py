@@ -0,0 +1,160 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from Levenshtein import distance
+
+from src.comparison.similarity import similarity_from_distance
+
+# Nombre de paires de sections mémorisées
+DEFAULT_MEMO_ENTRIES = 4096
+
+# En dessous de ce volume de texte à comparer, le calcul reste dans le processus courant
+PARALLEL_MIN_CHARS = 200_000
+
+# Intervalle (en secondes) entre deux vérifications d'annulation pendant l'attente du pool
+CHECK_POLL_SECONDS = 0.2
+
+
+def section_fingerprint(text):
+    """Empreinte du contenu d'une section"""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def section_sort_key(topic):
+    """Clé de tri des numéros de section ('1.', '2.1.', '10.2')"""
+    return [int(part) for part in topic.strip('.').split('.') if part.isdigit()]
+
+
+def _section_distance(texts):
+    text1, text2 = texts
+    return distance(text1, text2)
+
+
+class SectionComparator:
+    """Compare les sections communes de deux documents en ne recalculant que le nécessaire.
+
+    Chaque section est identifiée par l'empreinte de son contenu : les sections
+    identiques sont écartées sans calcul, les paires déjà comparées sont servies
+    par un mémo LRU (ré-affichage, nouvel envoi d'un seul des deux documents) et
+    seules les sections réellement modifiées sont calculées, en parallèle quand
+    le volume le justifie.
+    """
+
+    def __init__(self, max_workers=None, max_entries=DEFAULT_MEMO_ENTRIES, parallel_min_chars=PARALLEL_MIN_CHARS):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_entries = max_entries
+        self.parallel_min_chars = parallel_min_chars
+        self._memo = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _memo_get(self, key):
+        with self._lock:
+            if key in self._memo:
+                self._memo.move_to_end(key)
+                return self._memo[key]
+        return None
+
+    def _memo_put(self, key, value):
+        with self._lock:
+            self._memo[key] = value
+            self._memo.move_to_end(key)
+            while len(self._memo) > self.max_entries:
+                self._memo.popitem(last=False)
+
+    def _distances(self, pairs, check=None, max_workers=None):
+        check = check or (lambda: None)
+        workers = min(max_workers or self.max_workers, self.max_workers)
+        total_chars = sum(len(text1) + len(text2) for text1, text2 in pairs)
+        if workers == 1 or len(pairs) < 2 or total_chars < self.parallel_min_chars:
+            distances = []
+            for pair in pairs:
+                check()
+                distances.append(_section_distance(pair))
+            return distances
+
+        # Pool créé à la première utilisation puis réutilisé d'un appel à l'autre
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        # Au plus `workers` sections soumises à la fois : le budget de l'appelant
+        # borne l'occupation du pool partagé
+        distances = [None] * len(pairs)
+        next_index = 0
+        running = {}
+        try:
+            while next_index < len(pairs) or running:
+                while next_index < len(pairs) and len(running) < workers:
+                    running[self._executor.submit(_section_distance, pairs[next_index])] = next_index
+                    next_index += 1
+                done, _ = wait(running, timeout=CHECK_POLL_SECONDS, return_when=FIRST_COMPLETED)
+                for future in done:
+                    distances[running.pop(future)] = future.result()
+                check()
+            return distances
+        except BaseException:
+            # Annulation : les sections encore en file ne sont pas calculées
+            for future in running:
+                future.cancel()
+            raise
+
+    def compare(self, topics1, topics2, check=None, max_workers=None):
+        """Compare les sections communes ; retourne une liste triée par numéro de section.
+
+        Chaque élément contient `topic`, `distance`, `similarity` et `identical`.
+        `check()` est appelée avant chaque section et pendant l'attente du pool
+        pour permettre l'annulation ; une section en cours de calcul n'est pas
+        interrompue. `max_workers` est le budget de processus de l'appelant (par
+        exemple celui d'une tâche du JobManager) ; à 1 le calcul reste séquentiel.
+        """
+        common_topics = sorted(set(topics1) & set(topics2), key=section_sort_key)
+        distances = {}
+        to_compute = {}
+
+        for topic in common_topics:
+            key = (section_fingerprint(topics1[topic]), section_fingerprint(topics2[topic]))
+            if key[0] == key[1]:
+                distances[topic] = 0
+                continue
+            memoized = self._memo_get(key)
+            if memoized is not None:
+                distances[topic] = memoized
+                continue
+            to_compute.setdefault(key, []).append(topic)
+
+        keys = list(to_compute)
+        pairs = [(topics1[to_compute[key][0]], topics2[to_compute[key][0]]) for key in keys]
+        for key, lev_distance in zip(keys, self._distances(pairs, check, max_workers)):
+            self._memo_put(key, lev_distance)
+            for topic in to_compute[key]:
+                distances[topic] = lev_distance
+
+        results = []
+        for topic in common_topics:
+            text1, text2 = topics1[topic], topics2[topic]
+            results.append({
+                "topic": topic,
+                "distance": distances[topic],
+                "similarity": similarity_from_distance(distances[topic], len(text1), len(text2)),
+                "identical": text1 == text2,
+            })
+        return results
+
+    def close(self):
+        """Arrête le pool de processus s'il a été créé"""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+_default_comparator = None
+
+
+def get_section_comparator():
+    """Retourne le comparateur de sections partagé (mémo conservé entre les appels)"""
+    global _default_comparator
+    if _default_comparator is None:
+        _default_comparator = SectionComparator()
+    return _default_comparator
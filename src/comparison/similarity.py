@@ -0,0 +1,167 @@
+import math
+from collections import Counter
+
+from Levenshtein import distance
+
+from src.comparison.sketch import DocumentSketch, SHINGLE_SIZE, estimate_similarity, triage
+from src.comparison.token_diff import TokenEditScript
+
+# Seuil de similarité qui borne le calcul exact des paires estimées quasi identiques
+NEAR_IDENTICAL_THRESHOLD = 0.9
+
+
+def similarity_from_distance(lev_distance, len1, len2):
+    """Similarité normalisée (entre 0 et 1) à partir d'une distance de Levenshtein"""
+    max_len = max(len1, len2)
+    return 1 - (lev_distance / max_len) if max_len > 0 else 0
+
+
+def max_distance_for_threshold(threshold, len1, len2):
+    """Distance maximale compatible avec une similarité au moins égale au seuil"""
+    if not 0 <= threshold <= 1:
+        raise ValueError(f"Le seuil de similarité doit être compris entre 0 et 1: {threshold}")
+    max_len = max(len1, len2)
+    # Tolérance pour les erreurs d'arrondi flottant (ex: (1 - 0.98) * 100)
+    return math.floor((1 - threshold) * max_len + 1e-9)
+
+
+def distance_lower_bound(text1, text2):
+    """Minorant de la distance de Levenshtein calculé en temps linéaire.
+
+    Chaque caractère excédentaire d'un texte par rapport à l'autre (comptés par
+    histogramme) coûte au moins une opération ; ce minorant inclut la différence
+    de longueur.
+    """
+    counts1 = Counter(text1)
+    counts2 = Counter(text2)
+    surplus1 = sum((counts1 - counts2).values())
+    surplus2 = sum((counts2 - counts1).values())
+    return max(surplus1, surplus2)
+
+
+def estimated_distance(len1, len2, estimate):
+    """Distance estimée à partir d'une similarité estimée, jamais sous la différence de longueur"""
+    return max(abs(len1 - len2), round((1 - estimate) * max(len1, len2)))
+
+
+def _estimated_words(sketch):
+    # Un bardeau par position de mot (à quelques répétitions près)
+    return sketch.shingle_count + SHINGLE_SIZE - 1 if sketch.shingle_count else 0
+
+
+def bounded_similarity(text1, text2, threshold=None, max_distance=None):
+    """Compare deux textes en s'arrêtant dès que la borne est dépassée.
+
+    La borne est donnée soit par un seuil de similarité (`threshold`, ex: 0.98),
+    soit directement par une distance maximale (`max_distance`). Les documents
+    très différents sont écartés par des minorants linéaires (longueurs,
+    histogrammes de caractères), puis par un calcul de Levenshtein en bande avec
+    `score_cutoff` qui s'interrompt dès que la distance dépasse la borne.
+
+    Retourne un dictionnaire avec `within_bound`, `max_distance` et, seulement si
+    la borne est respectée, la `distance` et la `similarity` exactes (None sinon).
+    """
+    if (threshold is None) == (max_distance is None):
+        raise ValueError("Indiquer soit un seuil de similarité, soit une distance maximale")
+
+    len1, len2 = len(text1), len(text2)
+    if max_distance is None:
+        max_distance = max_distance_for_threshold(threshold, len1, len2)
+
+    result = {
+        "within_bound": False,
+        "max_distance": max_distance,
+        "distance": None,
+        "similarity": None,
+    }
+
+    if text1 == text2:
+        lev_distance = 0
+    elif abs(len1 - len2) > max_distance or distance_lower_bound(text1, text2) > max_distance:
+        return result
+    else:
+        # Au-delà de score_cutoff, Levenshtein renvoie score_cutoff + 1
+        lev_distance = distance(text1, text2, score_cutoff=max_distance)
+        if lev_distance > max_distance:
+            return result
+
+    result.update(
+        within_bound=True,
+        distance=lev_distance,
+        similarity=similarity_from_distance(lev_distance, len1, len2),
+    )
+    return result
+
+
+def compare_texts(text1, text2, sketch1=None, sketch2=None, word_script=None, check=None):
+    """Compare deux textes en s'appuyant d'abord sur leurs empreintes MinHash.
+
+    Les paires estimées sans rapport ne sont pas comparées : `distance`,
+    `similarity`, `word_distance` et `word_similarity` sont estimées en temps
+    constant à partir des longueurs et de l'estimation MinHash (voir
+    `estimated_distance`), et `exact` vaut False. Les autres paires passent par
+    le diff mot à mot (`TokenEditScript`, réutilisé s'il est fourni par
+    `word_script`) qui donne les métriques au mot près et majore la distance de
+    Levenshtein : celle-ci est ensuite calculée en bande plutôt qu'en entier. Les
+    paires estimées quasi identiques sont d'abord bornées par
+    NEAR_IDENTICAL_THRESHOLD. Le script est retourné sous `word_script`.
+    `check()` est appelée entre les calculs et dans le diff mot à mot pour
+    permettre l'annulation ; un calcul de Levenshtein n'est pas interrompu.
+    """
+    sketch1 = sketch1 or DocumentSketch.from_text(text1)
+    sketch2 = sketch2 or DocumentSketch.from_text(text2)
+    verdict = triage(sketch1, sketch2)
+    result = {
+        "estimated_similarity": estimate_similarity(sketch1, sketch2),
+        "verdict": verdict,
+        "distance": None,
+        "similarity": None,
+        "word_distance": None,
+        "word_similarity": None,
+        "word_script": None,
+        "exact": True,
+    }
+    if verdict == "unrelated" and text1 != text2:
+        # Aucune passe sur les textes : longueurs et empreintes suffisent
+        estimate = result["estimated_similarity"]
+        len1, len2 = len(text1), len(text2)
+        words1, words2 = _estimated_words(sketch1), _estimated_words(sketch2)
+        lev_distance = estimated_distance(len1, len2, estimate)
+        words_distance = estimated_distance(words1, words2, estimate)
+        result.update(
+            distance=lev_distance,
+            similarity=similarity_from_distance(lev_distance, len1, len2),
+            word_distance=words_distance,
+            word_similarity=similarity_from_distance(words_distance, words1, words2),
+            exact=False,
+        )
+        return result
+
+    if check is not None:
+        check()
+    script = word_script or TokenEditScript(text1, text2, check=check)
+    if check is not None:
+        check()
+    if text1 == text2:
+        lev_distance = 0
+    else:
+        lev_distance = None
+        if verdict == "identical":
+            bounded = bounded_similarity(text1, text2, threshold=NEAR_IDENTICAL_THRESHOLD)
+            lev_distance = bounded["distance"]
+        if lev_distance is None:
+            # Au-delà de score_cutoff, Levenshtein renvoie score_cutoff + 1 : ne peut
+            # arriver qu'avec un script incohérent, auquel cas le calcul est refait en entier
+            bound = script.char_distance_bound()
+            lev_distance = distance(text1, text2, score_cutoff=bound)
+            if lev_distance > bound:
+                lev_distance = distance(text1, text2)
+
+    result.update(
+        distance=lev_distance,
+        similarity=similarity_from_distance(lev_distance, len(text1), len(text2)),
+        word_distance=script.distance,
+        word_similarity=similarity_from_distance(script.distance, script.length1, script.length2),
+        word_script=script,
+    )
+    return result
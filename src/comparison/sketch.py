@@ -0,0 +1,125 @@
+import hashlib
+import heapq
+import re
+import struct
+from collections import Counter
+
+# Nombre de mots par bardeau (shingle) et nombre de valeurs MinHash conservées
+SHINGLE_SIZE = 4
+SKETCH_SIZE = 64
+
+# Seuils par défaut du tri rapide entre documents identiques et sans rapport
+IDENTICAL_THRESHOLD = 0.95
+UNRELATED_THRESHOLD = 0.2
+
+_SKETCH_FORMAT_VERSION = 1
+_HEADER = struct.Struct("<BHIQ")
+_WORD_PATTERN = re.compile(r"\w+")
+
+
+def _hash32(value):
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=4).digest(), "little")
+
+
+def _hash64(value):
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def tokenize(text):
+    """Découpe un texte en mots normalisés (minuscules, sans ponctuation)"""
+    return _WORD_PATTERN.findall(text.lower())
+
+
+def _simhash(words):
+    weights = [0] * 64
+    for word, count in Counter(words).items():
+        h = _hash64(word)
+        for bit in range(64):
+            if h >> bit & 1:
+                weights[bit] += count
+            else:
+                weights[bit] -= count
+    return sum(1 << bit for bit in range(64) if weights[bit] > 0)
+
+
+class DocumentSketch:
+    """Empreinte compacte d'un texte pour estimer une similarité en quelques microsecondes.
+
+    Combine un MinHash « bottom-k » sur les bardeaux de mots (estimation de
+    l'indice de Jaccard) et un SimHash 64 bits sur les mots. Sérialisée, une
+    empreinte occupe moins de 300 octets, quelle que soit la taille du document.
+    """
+
+    def __init__(self, minhash, simhash, shingle_count):
+        self.minhash = tuple(minhash)
+        self.simhash = simhash
+        self.shingle_count = shingle_count
+
+    @classmethod
+    def from_text(cls, text, shingle_size=SHINGLE_SIZE, sketch_size=SKETCH_SIZE):
+        """Calcule l'empreinte d'un texte"""
+        words = tokenize(text)
+        if len(words) < shingle_size:
+            shingles = {" ".join(words)} if words else set()
+        else:
+            shingles = {" ".join(words[i:i + shingle_size]) for i in range(len(words) - shingle_size + 1)}
+        hashes = {_hash32(shingle) for shingle in shingles}
+        return cls(sorted(heapq.nsmallest(sketch_size, hashes)), _simhash(words), len(shingles))
+
+    def to_bytes(self):
+        """Sérialise l'empreinte (format binaire compact, persistable)"""
+        header = _HEADER.pack(_SKETCH_FORMAT_VERSION, len(self.minhash), self.shingle_count, self.simhash)
+        return header + struct.pack(f"<{len(self.minhash)}I", *self.minhash)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Reconstruit une empreinte sérialisée par `to_bytes`"""
+        version, size, shingle_count, simhash = _HEADER.unpack_from(data)
+        if version != _SKETCH_FORMAT_VERSION:
+            raise ValueError(f"Version d'empreinte non supportée: {version}")
+        minhash = struct.unpack_from(f"<{size}I", data, _HEADER.size)
+        return cls(minhash, simhash, shingle_count)
+
+    def __eq__(self, other):
+        return (isinstance(other, DocumentSketch) and self.minhash == other.minhash
+                and self.simhash == other.simhash and self.shingle_count == other.shingle_count)
+
+
+def estimate_similarity(sketch1, sketch2):
+    """Estime l'indice de Jaccard des bardeaux de deux documents à partir de leurs empreintes"""
+    if not sketch1.minhash and not sketch2.minhash:
+        return 1.0
+    if not sketch1.minhash or not sketch2.minhash:
+        return 0.0
+
+    # Estimateur bottom-k : parmi les k plus petites valeurs de l'union,
+    # proportion de celles présentes dans les deux empreintes
+    size = min(len(sketch1.minhash), len(sketch2.minhash))
+    set1, set2 = set(sketch1.minhash), set(sketch2.minhash)
+    union_bottom = heapq.nsmallest(size, set1 | set2)
+    shared = sum(1 for h in union_bottom if h in set1 and h in set2)
+    return shared / len(union_bottom)
+
+
+def simhash_similarity(sketch1, sketch2):
+    """Similarité des SimHash : 1 moins la proportion de bits différents"""
+    return 1 - bin(sketch1.simhash ^ sketch2.simhash).count("1") / 64
+
+
+def triage(sketch1, sketch2, identical_threshold=IDENTICAL_THRESHOLD, unrelated_threshold=UNRELATED_THRESHOLD):
+    """Classe une paire de documents : "identical", "unrelated" ou "uncertain".
+
+    Seuls les cas "uncertain" justifient une comparaison exacte complète ; les
+    autres peuvent être tranchés (ou bornés) sans Levenshtein ni HtmlDiff.
+    """
+    estimate = estimate_similarity(sketch1, sketch2)
+    if estimate >= identical_threshold:
+        return "identical"
+    if estimate <= unrelated_threshold:
+        return "unrelated"
+    return "uncertain"
+
+
+def sketch_sections(sections):
+    """Calcule l'empreinte de chaque section d'un document ({nom: texte})"""
+    return {name: DocumentSketch.from_text(text) for name, text in sections.items()}
@@ -0,0 +1,287 @@
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from src.comparison.pipeline import analyze_documents
+from src.tracing import configure_logging
+
+# Nombre de comparaisons exécutées simultanément et de travaux terminés conservés
+DEFAULT_MAX_JOBS = 2
+DEFAULT_MAX_FINISHED_JOBS = 100
+
+# États d'un travail
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = {DONE, FAILED, CANCELLED}
+
+# Étapes d'une comparaison, dans l'ordre d'exécution
+STAGES = ["extraction_1", "extraction_2", "comparison", "sections"]
+
+# Intervalle minimal (en secondes) entre deux lectures de l'annulation dans les
+# boucles de calcul (chaque lecture passe par le courtier multiprocessing)
+CANCEL_CHECK_INTERVAL = 0.1
+
+
+class JobCancelled(Exception):
+    """Levée dans le processus de travail lorsque l'annulation a été demandée"""
+
+
+class JobReporter:
+    """Transmet l'avancement d'un travail et vérifie s'il a été annulé"""
+
+    def __init__(self, job_id, events, cancel_event):
+        self.job_id = job_id
+        self.events = events
+        self.cancel_event = cancel_event
+
+    def check_cancelled(self):
+        if self.cancel_event.is_set():
+            raise JobCancelled(self.job_id)
+
+    def stage(self, stage, done=0, total=None):
+        self.check_cancelled()
+        self.events.put((self.job_id, stage, done, total))
+
+    def cancel_check(self, interval=CANCEL_CHECK_INTERVAL):
+        """Fonction de contrôle à appeler dans les boucles de calcul (diff, sections).
+
+        Elle lève JobCancelled si le travail est annulé, en ne lisant l'état
+        qu'une fois par `interval` secondes.
+        """
+        next_check = 0.0
+
+        def check():
+            nonlocal next_check
+            now = time.monotonic()
+            if now >= next_check:
+                next_check = now + interval
+                self.check_cancelled()
+        return check
+
+    def page_callback(self, stage):
+        """Fonction de progression par page à passer à l'extraction (OCR)"""
+        def callback(pages_done, total_pages, page_num):
+            self.stage(stage, pages_done, total_pages)
+        return callback
+
+
+def _run_job(task, job_id, doc1_path, doc2_path, ocr_workers, events, cancel_event):
+    reporter = JobReporter(job_id, events, cancel_event)
+    reporter.check_cancelled()
+    return task(doc1_path, doc2_path, reporter=reporter, ocr_workers=ocr_workers)
+
+
+class Job:
+    """État d'un travail de comparaison, tel que vu par le gestionnaire"""
+
+    def __init__(self, job_id, doc1_path, doc2_path, key=None):
+        self.id = job_id
+        self.doc1_path = str(doc1_path)
+        self.doc2_path = str(doc2_path)
+        self.key = key
+        self.status = PENDING
+        self.stage = None
+        self.done = 0
+        self.total = None
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        self.future = None
+        self.cancel_event = None
+
+    def to_dict(self):
+        """Vue sérialisable du travail (sans le résultat)"""
+        return {
+            "id": self.id,
+            "status": self.status,
+            "stage": self.stage,
+            "stage_index": STAGES.index(self.stage) if self.stage in STAGES else None,
+            "done": self.done,
+            "total": self.total,
+            "error": self.error,
+            "created": self.created,
+            "finished": self.finished,
+        }
+
+
+class JobManager:
+    """File de travaux de comparaison exécutés en arrière-plan.
+
+    `backend="process"` exécute chaque comparaison dans un processus du pool ;
+    l'avancement et les demandes d'annulation transitent par un gestionnaire
+    `multiprocessing` (courtier local). `backend="thread"` exécute les travaux
+    dans le processus courant, sur des threads. Les résultats des travaux
+    terminés restent disponibles par identifiant (les plus anciens sont oubliés
+    au-delà de `max_finished`), et un travail soumis avec une `key` déjà connue
+    (mêmes fichiers, mêmes réglages) réutilise le travail existant.
+    """
+
+    def __init__(self, max_workers=DEFAULT_MAX_JOBS, backend="process", ocr_workers=None,
+                 max_finished=DEFAULT_MAX_FINISHED_JOBS):
+        if backend not in ("process", "thread"):
+            raise ValueError(f"Backend de travaux inconnu: {backend}")
+        self.backend = backend
+        self.max_workers = max_workers
+        # Les processus OCR de chaque travail se partagent les cœurs
+        self.ocr_workers = ocr_workers or max(1, (os.cpu_count() or 1) // max_workers)
+        self.max_finished = max_finished
+        self._jobs = OrderedDict()
+        self._keys = {}
+        self._lock = threading.RLock()
+        self._manager = None
+
+        if backend == "process":
+            import multiprocessing
+            self._manager = multiprocessing.Manager()
+            self._events = self._manager.Queue()
+            self._executor = ProcessPoolExecutor(max_workers=max_workers, initializer=configure_logging)
+        else:
+            self._events = queue.Queue()
+            self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+
+    def _new_cancel_event(self):
+        if self._manager is not None:
+            return self._manager.Event()
+        return threading.Event()
+
+    def submit(self, doc1_path, doc2_path, key=None, task=analyze_documents):
+        """Soumet une comparaison ; retourne l'identifiant du travail.
+
+        `task(doc1_path, doc2_path, reporter=..., ocr_workers=...)` produit le
+        résultat : `analyze_documents` par défaut, ou toute fonction de niveau
+        module (éventuellement via functools.partial) pour le backend processus.
+        """
+        with self._lock:
+            if key is not None and key in self._keys:
+                existing = self._jobs.get(self._keys[key])
+                if existing is not None and existing.status not in (FAILED, CANCELLED):
+                    return existing.id
+
+            job = Job(uuid.uuid4().hex, doc1_path, doc2_path, key)
+            job.cancel_event = self._new_cancel_event()
+            self._jobs[job.id] = job
+            if key is not None:
+                self._keys[key] = job.id
+
+            job.future = self._executor.submit(
+                _run_job, task, job.id, job.doc1_path, job.doc2_path, self.ocr_workers, self._events, job.cancel_event
+            )
+            job.future.add_done_callback(lambda future, job_id=job.id: self._finish(job_id, future))
+            return job.id
+
+    def _finish(self, job_id, future):
+        self._drain()
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            if future.cancelled():
+                job.status = CANCELLED
+            else:
+                error = future.exception()
+                if error is None:
+                    job.status = DONE
+                    job.result = future.result()
+                elif isinstance(error, JobCancelled):
+                    job.status = CANCELLED
+                else:
+                    job.status = FAILED
+                    job.error = str(error)
+            job.finished = time.time()
+            self._evict()
+
+    def _evict(self):
+        finished = [job for job in self._jobs.values() if job.status in FINISHED_STATES]
+        for job in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job.id]
+            if job.key is not None and self._keys.get(job.key) == job.id:
+                del self._keys[job.key]
+
+    def _drain(self):
+        """Applique les messages d'avancement reçus des travaux"""
+        while True:
+            try:
+                job_id, stage, done, total = self._events.get_nowait()
+            except (queue.Empty, EOFError, OSError):
+                return
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is None or job.status in FINISHED_STATES:
+                    continue
+                job.status = RUNNING
+                job.stage, job.done, job.total = stage, done, total
+
+    def _get(self, job_id):
+        job = self._jobs.get(job_id)
+        if job is None:
+            raise KeyError(f"Travail inconnu: {job_id}")
+        return job
+
+    def status(self, job_id):
+        """État courant d'un travail (voir `Job.to_dict`)"""
+        self._drain()
+        with self._lock:
+            return self._get(job_id).to_dict()
+
+    def result(self, job_id, timeout=None):
+        """Résultat d'un travail, en attendant sa fin au plus `timeout` secondes"""
+        with self._lock:
+            job = self._get(job_id)
+        if job.status not in FINISHED_STATES:
+            finished, _ = wait([job.future], timeout=timeout)
+            if not finished:
+                raise TimeoutError(f"Travail non terminé: {job_id}")
+            # Le rappel de fin peut ne pas avoir encore été exécuté
+            self._finish(job_id, job.future)
+        if job.status == FAILED:
+            raise RuntimeError(job.error)
+        if job.status == CANCELLED:
+            raise JobCancelled(job_id)
+        return job.result
+
+    def cancel(self, job_id):
+        """Demande l'annulation d'un travail ; retourne False s'il était déjà terminé.
+
+        Un travail en file est retiré immédiatement. Un travail en cours s'arrête
+        au prochain point de contrôle : page OCR terminée, changement d'étape,
+        sous-problème du diff mot à mot ou section suivante (voir
+        `JobReporter.cancel_check`). Ne sont pas interrompus : l'OCR ou le rendu
+        d'une page, la lecture de la couche texte d'un PDF, la détection des
+        sections, les passes linéaires sur le texte entier (empreintes MinHash,
+        découpage en mots) et chaque calcul de Levenshtein (texte entier en bande,
+        ou une section) : le délai est au plus la durée de l'une de ces opérations,
+        de l'ordre de la seconde pour un texte de plusieurs mégaoctets.
+        """
+        with self._lock:
+            job = self._get(job_id)
+            if job.status in FINISHED_STATES:
+                return False
+            job.cancel_event.set()
+            # Un travail pas encore démarré est retiré de la file immédiatement
+            job.future.cancel()
+            return True
+
+    def jobs(self):
+        """État de tous les travaux connus, du plus ancien au plus récent"""
+        self._drain()
+        with self._lock:
+            return [job.to_dict() for job in self._jobs.values()]
+
+    def shutdown(self, cancel=True):
+        """Arrête le pool, en annulant les travaux en cours si `cancel`"""
+        if cancel:
+            with self._lock:
+                for job in self._jobs.values():
+                    if job.status not in FINISHED_STATES:
+                        job.cancel_event.set()
+        self._executor.shutdown(wait=True, cancel_futures=cancel)
+        if self._manager is not None:
+            self._manager.shutdown()
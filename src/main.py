@@ -0,0 +1,81 @@
+import argparse
+import sys
+from pathlib import Path
+
+# Permet l'exécution directe (python src/main.py) comme en module (python -m src.main)
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.comparison.batch import (
+    collect_documents,
+    cross_pairs,
+    iter_batch_comparisons,
+    reference_pairs,
+    write_csv,
+    write_jsonl,
+)
+from src.tracing import configure_logging
+
+
+def compare_documents(doc1_path, doc2_path, include_text=False, include_edit_script=True):
+    """Compare deux documents (PDF, DOCX ou images) et retourne les métriques de comparaison.
+
+    Le résultat suit le format stable de `src.comparison.pipeline.build_result`.
+    """
+    from src.comparison.pipeline import compare_files
+
+    return compare_files(str(doc1_path), str(doc2_path), include_text=include_text,
+                         include_edit_script=include_edit_script)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m src.main",
+        description="Compare des documents (PDF, DOCX, images) sans passer par l'interface Streamlit.",
+    )
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Nombre de processus (par défaut : nombre de cœurs)")
+    parser.add_argument("--format", choices=["jsonl", "csv"], default="jsonl",
+                        help="Format de sortie des résultats")
+    parser.add_argument("--output", default="-",
+                        help="Fichier de sortie (par défaut : sortie standard)")
+
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    reference = subparsers.add_parser("reference", help="Compare une référence à plusieurs candidats")
+    reference.add_argument("reference", help="Document de référence")
+    reference.add_argument("candidates", nargs="+", help="Documents ou dossiers candidats")
+
+    matrix = subparsers.add_parser("matrix", help="Compare toutes les paires N×M de deux dossiers")
+    matrix.add_argument("references", help="Dossier (ou document) des références")
+    matrix.add_argument("candidates", help="Dossier (ou document) des candidats")
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    configure_logging()
+
+    if args.command == "reference":
+        candidates = [doc for path in args.candidates for doc in collect_documents(path)]
+        pairs = reference_pairs(args.reference, candidates)
+    else:
+        pairs = cross_pairs(collect_documents(args.references), collect_documents(args.candidates))
+
+    if not pairs:
+        print("Aucune paire de documents à comparer.", file=sys.stderr)
+        return 1
+
+    writer = write_csv if args.format == "csv" else write_jsonl
+    records = iter_batch_comparisons(pairs, max_workers=args.workers)
+
+    if args.output == "-":
+        writer(records, sys.stdout)
+    else:
+        with open(args.output, "w", encoding="utf-8", newline="") as stream:
+            writer(records, stream)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
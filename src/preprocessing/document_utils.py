@@ -1,24 +1,27 @@
 import os
 import base64
 from pathlib import Path
-import streamlit as st
-import pypandoc
-import PyPDF2
-from docx import Document
-from docx2pdf import convert
-import pdfplumber
 import re
+from functools import lru_cache
+from importlib import metadata
 
-from src.preprocessing.text_extract import docx_to_text, pdf_to_text
-from src.preprocessing.scan_text_extract import image_to_text
-from src.preprocessing.pdf_to_image import pdf_to_images
+# Les dépendances lourdes (Streamlit, pdfplumber, PyPDF2, python-docx, OpenCV,
+# Tesseract...) ne sont importées qu'à leur première utilisation : les processus
+# de traitement en lot et la ligne de commande démarrent sans les charger.
+from src.preprocessing.scan_text_extract import TESSERACT_CONFIG, tesseract_version
+from src.preprocessing.pdf_to_image import DEFAULT_DPI, DEFAULT_WIDTH
+from src.preprocessing.parsed_document import ParsedDocument, MIN_PAGE_TEXT_CHARS, OCR_FILE_TYPES
+from src.preprocessing.preprocess_config import DEFAULT_PREPROCESS_CONFIG
+from src.preprocessing.ocr_pipeline import ocr_backend
+from src.tracing import incr, logger, span
 
 from difflib import HtmlDiff
 
 def generate_diff_html(text1: str, text2: str) -> str:
     lines1 = text1.splitlines()
     lines2 = text2.splitlines()
-    diff = HtmlDiff().make_table(lines1, lines2, fromdesc="Document 1", todesc="Document 2")
+    with span("diff_html", chars=len(text1) + len(text2)):
+        diff = HtmlDiff().make_table(lines1, lines2, fromdesc="Document 1", todesc="Document 2")
     return diff
 
 
@@ -29,63 +32,151 @@ def rotate_image_to_portrait(image):
         return image.rotate(270, expand=True)
     return image
 
-def extract_text_from_file(file_path, file_type):
+@lru_cache(maxsize=None)
+def tool_versions(file_type):
+    """Versions des outils qui influencent le résultat de l'extraction pour ce type de fichier"""
+    if file_type == '.pdf':
+        packages = ["PyPDF2", "pdfplumber", "pdf2image", "pytesseract", "tesserocr", "opencv-python", "opencv-python-headless"]
+    elif file_type == '.docx':
+        packages = ["python-docx"]
+    else:
+        packages = ["pytesseract", "tesserocr", "opencv-python", "opencv-python-headless", "Pillow"]
+
+    versions = {}
+    for package in packages:
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            continue
+
+    if file_type in OCR_FILE_TYPES:
+        try:
+            versions["tesseract"] = tesseract_version()
+        except Exception:
+            versions["tesseract"] = "inconnue"
+    return versions
+
+
+def extraction_settings(file_type):
+    """Paramètres d'extraction servant à construire la clé du cache.
+
+    Les réglages OCR ne figurent que pour les types de fichiers qui peuvent passer
+    par l'OCR : les changer n'invalide pas les DOCX déjà extraits.
+    """
+    from src.preprocessing.docx_stream import DOCX_READER_VERSION
+
+    settings = {
+        "file_type": file_type,
+        "versions": tool_versions(file_type),
+    }
+    if file_type in OCR_FILE_TYPES:
+        settings.update({
+            "ocr_backend": ocr_backend(),
+            "ocr_config": TESSERACT_CONFIG,
+            "preprocess": DEFAULT_PREPROCESS_CONFIG,
+        })
+    if file_type == '.pdf':
+        settings.update({
+            "dpi": DEFAULT_DPI,
+            "width": DEFAULT_WIDTH,
+            "min_page_text_chars": MIN_PAGE_TEXT_CHARS,
+        })
+    if file_type == '.docx':
+        # Le texte extrait dépend du lecteur DOCX (tableaux, en-têtes et pieds de page)
+        settings["docx_reader"] = DOCX_READER_VERSION
+    return settings
+
+
+def extract_document(file_path, file_type, cache=None, ocr_workers=None, progress_callback=None, document=None,
+                     sections=True):
+    """Extrait le texte, les positions de pages, le nombre de pages et les sections d'un fichier.
+
+    Si un cache est fourni, un document déjà traité avec les mêmes paramètres est
+    servi directement depuis le cache, sans relancer PyPDF2, pdf2image ni Tesseract.
+    Pour les PDF scannés, `ocr_workers` fixe la taille du pool OCR et
+    `progress_callback(pages_done, total_pages, page_num)` suit l'avancement par page.
+    Un `ParsedDocument` déjà construit peut être fourni pour éviter une nouvelle analyse.
+    Avec `sections=False` (traitement en lot), les sections ne sont pas détectées
+    et peuvent manquer au résultat ; une entrée du cache qui n'en a pas les reçoit
+    au premier appel qui les demande, sans nouvelle extraction du texte.
+    """
+    key = None
+    if cache is not None:
+        key = cache.make_key(file_path, extraction_settings(file_type))
+        cached = cache.get(key)
+        if cached is not None:
+            incr("extraction_cache_hits", file_type=file_type)
+            logger.debug(f"Extraction servie depuis le cache: {file_path}")
+            if not sections or "sections" in cached:
+                return cached
+            return _add_sections(cache, key, cached, document or ParsedDocument(file_path, file_type))
+        incr("extraction_cache_misses", file_type=file_type)
+
+    if document is None:
+        document = ParsedDocument(file_path, file_type, ocr_workers=ocr_workers,
+                                  progress_callback=progress_callback)
+    try:
+        with span("extract_document", file_type=file_type) as current:
+            result = {
+                "text": document.text,
+                "page_offsets": document.page_offsets,
+                "page_count": document.page_count,
+            }
+            if sections:
+                with span("sections"):
+                    result["sections"] = document.sections
+            current.set(bytes=os.path.getsize(file_path), pages=result["page_count"],
+                        chars=len(result["text"]))
+    finally:
+        document.close()
+
+    # Ne pas mémoriser un échec d'extraction
+    if cache is not None and result["text"]:
+        cache.put(key, result)
+    return result
+
+
+def _add_sections(cache, key, cached, document):
+    """Complète une extraction mise en cache sans ses sections"""
+    # Le texte vient du cache : seules les sections sont calculées (mise en page pour
+    # les PDF, numérotation du texte sinon), sans relancer l'OCR
+    document.text = cached["text"]
+    try:
+        with span("sections"):
+            result = {**cached, "sections": document.sections}
+    finally:
+        document.close()
+    cache.put(key, result)
+    return result
+
+
+def extract_text_from_file(file_path, file_type, cache=None, ocr_workers=None, progress_callback=None):
     """Extrait le texte d'un fichier selon son type"""
     try:
-        print(f"Tentative d'extraction du texte de: {file_path}")
-
-        if file_type in ['.jpg', '.jpeg', '.png']:
-            text = image_to_text(file_path)
-            print(f"Texte extrait de l'image (longueur: {len(text)}): {text[:100]}...")
-            return text
-
-        elif file_type == '.pdf':
-            text = pdf_to_text(file_path)
-            print(f"Texte extrait du PDF (longueur: {len(text)}): {text[:100]}...")
-
-            if not text.strip() or len(text.strip()) < 50:
-                print("PDF probablement scanné, conversion en images...")
-                image_paths = pdf_to_images(file_path)
-                if not image_paths:
-                    raise ValueError("Impossible de convertir le PDF en images")
-
-                all_text = []
-                for img_path in image_paths:
-                    print(f"Traitement de l'image: {img_path}")
-                    page_text = image_to_text(img_path)
-                    print(f"Texte extrait de la page (longueur: {len(page_text)}): {page_text[:100]}...")
-                    if page_text:
-                        all_text.append(page_text)
-
-                for img_path in image_paths:
-                    if os.path.exists(img_path):
-                        os.remove(img_path)
-
-                final_text = "\n".join(all_text)
-                print(f"Texte final du PDF scanné (longueur: {len(final_text)}): {final_text[:100]}...")
-                return final_text
-            return text
-
-        elif file_type == '.docx':
-            text = docx_to_text(file_path)
-            print(f"Texte extrait du DOCX (longueur: {len(text)}): {text[:100]}...")
-            return text
-
-        else:
-            raise ValueError(f"Type de fichier non supporté: {file_type}")
+        if cache is not None:
+            return extract_document(file_path, file_type, cache=cache, ocr_workers=ocr_workers,
+                                    progress_callback=progress_callback, sections=False)["text"]
+
+        with ParsedDocument(file_path, file_type, ocr_workers=ocr_workers,
+                            progress_callback=progress_callback) as document:
+            return document.text
 
     except Exception as e:
-        print(f"Erreur lors de l'extraction du texte: {str(e)}")
+        logger.warning(f"Erreur lors de l'extraction du texte de {file_path}: {str(e)}")
         return ""
 
 def display_pdf(file_path):
     """Affiche un fichier PDF dans Streamlit via une iframe"""
+    import streamlit as st
+
     with open(file_path, "rb") as f:
         base64_pdf = base64.b64encode(f.read()).decode("utf-8")
     pdf_display = f'<iframe src="data:application/pdf;base64,{base64_pdf}" width="100%" height="600px" type="application/pdf"></iframe>'
     st.markdown(pdf_display, unsafe_allow_html=True)
 
 def convert_docx_to_pdf(docx_path, output_dir="temp"):
+    from docx2pdf import convert
+
     output_path = Path(output_dir)
     output_path.mkdir(exist_ok=True)
     try:
@@ -93,26 +184,16 @@ def convert_docx_to_pdf(docx_path, output_dir="temp"):
         pdf_path = output_path / (Path(docx_path).stem + ".pdf")
         return str(pdf_path)
     except Exception as e:
-        print(f"Erreur lors de la conversion DOCX → PDF avec docx2pdf: {e}")
+        logger.warning(f"Erreur lors de la conversion DOCX → PDF avec docx2pdf: {e}")
         return None
 
 def count_pages(file_path, file_type):
-    """Compte le nombre de pages d'un document"""
+    """Compte le nombre de pages d'un document (d'après ses métadonnées)"""
     try:
-        if file_type in ['.jpg', '.jpeg', '.png']:
-            return 1
-        elif file_type == '.pdf':
-            with open(file_path, "rb") as file:
-                reader = PyPDF2.PdfReader(file)
-                return len(reader.pages)
-        elif file_type == '.docx':
-            doc = Document(file_path)
-            # Estimation basée sur le nombre de ruptures de section
-            return len(doc.sections)
-        else:
-            raise ValueError(f"Type de fichier non supporté: {file_type}")
+        with ParsedDocument(file_path, file_type) as document:
+            return document.page_count
     except Exception as e:
-        print(f"Erreur lors de la comptage des pages: {str(e)}")
+        logger.warning(f"Erreur lors du comptage des pages: {str(e)}")
         return 0
 
 def segment_text_by_topics(text):
@@ -133,7 +214,6 @@ def segment_text_by_topics(text):
     current_content = []
     
     for line in lines:
-        print(f"[LIGNE] {line}")  # pour vérifier chaque ligne
         match = re.match(topic_pattern, line)
         if match:
             # Si nous avons une section actuel, la sauvegarder
@@ -158,37 +238,46 @@ def detect_section_headings_by_layout(pdf_path, min_font_size=12):
     """ Ouvre un PDF avec pdfplumber. 
         Pour chaque page, lit chaque caractère.
         Si c'est un chiffre isolé avec une grande taille, on le considère comme candidat section.
-        Retourne une liste triée par taille décroissante (les chiffres les plus gros d’abord)"""
+        Retourne une liste triée par taille décroissante (les chiffres les plus gros d’abord)
+        `pdf_path` peut aussi être un ParsedDocument, dont les caractères déjà lus sont réutilisés."""
     
+    if isinstance(pdf_path, ParsedDocument):
+        return _detect_section_headings(pdf_path.chars, min_font_size)
+
+    import pdfplumber
+
+    with pdfplumber.open(pdf_path) as pdf:
+        return _detect_section_headings((page.chars for page in pdf.pages), min_font_size)
+
+
+def _detect_section_headings(pages_chars, min_font_size):
     section_candidates = []
     section_pattern = re.compile(r'^(Article\s+)?\d+(\.\d+)*\.?\s')
 
-    with pdfplumber.open(pdf_path) as pdf:
-        for page_num, page in enumerate(pdf.pages):
-            lines = {}
-            for char in page.chars:
-                line_key = round(char["top"])  # Regrouper les caractères par ligne
-                lines.setdefault(line_key, []).append(char)
-
-            for top, chars in lines.items():
-                # Trier les caractères de la ligne par position horizontale
-                sorted_chars = sorted(chars, key=lambda c: c["x0"])
-                full_text = "".join(c["text"] for c in sorted_chars).strip()
-
-                # Vérifie si la ligne commence par un motif de section (ex: "1.2 Introduction")
-                if section_pattern.match(full_text):
-                    # Vérifie la taille de police des premiers caractères numériques uniquement
-                    first_numeric_chars = [c for c in sorted_chars if c["text"].isdigit() or c["text"] == '.']
-                    if first_numeric_chars:
-                        avg_size = sum(c["size"] for c in first_numeric_chars) / len(first_numeric_chars)
-                        if avg_size >= min_font_size:
-                            section_candidates.append({
-                                "page": page_num + 1,
-                                "text": full_text,
-                                "font_size": round(avg_size, 2),
-                                "top": top,
-                                "left": sorted_chars[0]["x0"]
-                            })
+    for page_num, page_chars in enumerate(pages_chars):
+        lines = {}
+        for char in page_chars:
+            line_key = round(char["top"])  # Regrouper les caractères par ligne
+            lines.setdefault(line_key, []).append(char)
 
-    return sorted(section_candidates, key=lambda x: (x["page"], x["top"]))
+        for top, chars in lines.items():
+            # Trier les caractères de la ligne par position horizontale
+            sorted_chars = sorted(chars, key=lambda c: c["x0"])
+            full_text = "".join(c["text"] for c in sorted_chars).strip()
+
+            # Vérifie si la ligne commence par un motif de section (ex: "1.2 Introduction")
+            if section_pattern.match(full_text):
+                # Vérifie la taille de police des premiers caractères numériques uniquement
+                first_numeric_chars = [c for c in sorted_chars if c["text"].isdigit() or c["text"] == '.']
+                if first_numeric_chars:
+                    avg_size = sum(c["size"] for c in first_numeric_chars) / len(first_numeric_chars)
+                    if avg_size >= min_font_size:
+                        section_candidates.append({
+                            "page": page_num + 1,
+                            "text": full_text,
+                            "font_size": round(avg_size, 2),
+                            "top": top,
+                            "left": sorted_chars[0]["x0"]
+                        })
 
+    return sorted(section_candidates, key=lambda x: (x["page"], x["top"]))
@@ -0,0 +1,211 @@
+import html
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+
+# Lecture en flux des DOCX : word/document.xml est parcouru par iterparse et
+# chaque paragraphe (ou ligne de tableau) est libéré dès qu'il a été produit, si
+# bien que la mémoire ne dépend pas de la longueur du document.
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+# Version du lecteur : fait partie de la clé du cache d'extraction
+DOCX_READER_VERSION = 1
+
+# Séparateur des cellules d'une ligne de tableau
+CELL_SEPARATOR = " | "
+
+HEADING_STYLE_PATTERN = re.compile(r"(?:heading|titre)\s*(\d)")
+
+# Conteneurs dont les enfants directs sont des blocs (paragraphes, tableaux)
+_BLOCK_CONTAINERS = {W + "body", W + "hdr", W + "ftr", W + "sdtContent"}
+# Contenus non repris dans le texte du paragraphe (zones de texte, dessins, révisions supprimées)
+_SKIPPED = {W + "drawing", W + "pict", W + "object", W + "del", W + "txbxContent",
+            "{http://schemas.openxmlformats.org/markup-compatibility/2006}AlternateContent"}
+_HEADER_FOOTER_PART = re.compile(r"^word/(header|footer)(\d*)\.xml$")
+
+
+def heading_level_from_style_name(name):
+    """Niveau de titre (1 à 6) d'un style d'après son nom, None pour un style de corps de texte"""
+    name = (name or "").lower()
+    if "heading" not in name and "titre" not in name:
+        return None
+    match = HEADING_STYLE_PATTERN.search(name)
+    level = int(match.group(1)) if match else 1
+    return level if 1 <= level <= 6 else 1
+
+
+class HeadingNumbering:
+    """Numérotation hiérarchique artificielle des titres (1., 1.1., 2. ...)"""
+
+    def __init__(self):
+        self.counters = {}
+
+    def number(self, level, text):
+        # Mise à jour du compteur et réinitialisation des sous-niveaux
+        self.counters[level] = self.counters.get(level, 0) + 1
+        for sublevel in range(level + 1, 7):
+            self.counters[sublevel] = 0
+        prefix = ".".join(str(self.counters[i]) for i in range(1, level + 1) if self.counters.get(i, 0) > 0)
+        return f"{prefix}. {text}"
+
+
+def _styles_by_pattern(data):
+    """Nom de chaque style de paragraphe, relevé par expressions régulières sur le XML brut.
+
+    styles.xml compte des milliers d'éléments (styles latents) pour une
+    centaine de styles utiles : un balayage du texte évite de tous les
+    construire. Retourne None si le préfixe de l'espace de noms est introuvable.
+    """
+    match = re.search(rb'xmlns:(\w+)="%s"' % W[1:-1].encode(), data)
+    if match is None:
+        return None
+    prefix = re.escape(match.group(1))
+    style_pattern = re.compile(rb"<%s:style\b([^>]*?)(?:/>|>(.*?)</%s:style>)" % (prefix, prefix), re.S)
+    attribute_pattern = re.compile(rb'%s:(\w+)="([^"]*)"' % prefix)
+    name_pattern = re.compile(rb'<%s:name\b[^>]*?%s:val="([^"]*)"' % (prefix, prefix))
+
+    names = {}
+    for style in style_pattern.finditer(data):
+        attributes = dict(attribute_pattern.findall(style.group(1)))
+        name = name_pattern.search(style.group(2) or b"")
+        if attributes.get(b"type") == b"paragraph" and name is not None:
+            names[html.unescape(attributes.get(b"styleId", b"").decode("utf-8"))] = \
+                html.unescape(name.group(1).decode("utf-8"))
+    return names
+
+
+def _styles_by_parsing(data):
+    names = {}
+    for style in ET.fromstring(data).iterfind(W + "style"):
+        name = style.find(W + "name")
+        if style.get(W + "type") == "paragraph" and name is not None:
+            names[style.get(W + "styleId")] = name.get(W + "val")
+    return names
+
+
+def heading_style_levels(archive):
+    """Table identifiant de style -> niveau de titre, lue une fois dans word/styles.xml"""
+    try:
+        data = archive.read("word/styles.xml")
+    except KeyError:
+        return {}
+    names = _styles_by_pattern(data)
+    if names is None:
+        names = _styles_by_parsing(data)
+    levels = {}
+    for style_id, name in names.items():
+        level = heading_level_from_style_name(name)
+        if level is not None:
+            levels[style_id] = level
+    return levels
+
+
+def _append_text(element, parts):
+    for child in element:
+        tag = child.tag
+        if tag in _SKIPPED:
+            continue
+        if tag == W + "t":
+            parts.append(child.text or "")
+        elif tag in (W + "tab", W + "ptab"):
+            parts.append("\t")
+        elif tag in (W + "br", W + "cr"):
+            parts.append("\n")
+        elif tag == W + "noBreakHyphen":
+            parts.append("-")
+        elif tag != W + "pPr":
+            _append_text(child, parts)
+
+
+def paragraph_text(paragraph):
+    """Texte d'un paragraphe w:p (runs, liens, champs ; sans zones de texte ni suppressions)"""
+    parts = []
+    _append_text(paragraph, parts)
+    return "".join(parts)
+
+
+def _paragraph_style(paragraph):
+    style = paragraph.find(f"{W}pPr/{W}pStyle")
+    return style.get(W + "val") if style is not None else None
+
+
+def _row_text(row):
+    cells = []
+    for cell in row.iterfind(W + "tc"):
+        # Les tableaux imbriqués sont aplatis dans le texte de leur cellule
+        texts = (paragraph_text(p).strip() for p in cell.iter(W + "p"))
+        cells.append(" ".join(text for text in texts if text))
+    return CELL_SEPARATOR.join(cells)
+
+
+def iter_part_blocks(stream, style_levels):
+    """Parcourt une partie XML (corps, en-tête, pied de page) bloc par bloc.
+
+    Produit des tuples (niveau de titre ou None, texte) : un par paragraphe et un
+    par ligne de tableau (cellules séparées par CELL_SEPARATOR). Chaque bloc est
+    retiré de l'arbre dès qu'il a été produit.
+    """
+    stack = []
+    paragraph_depth = 0
+    table_depth = 0
+    for event, element in ET.iterparse(stream, events=("start", "end")):
+        tag = element.tag
+        if event == "start":
+            stack.append(element)
+            if tag == W + "p":
+                paragraph_depth += 1
+            elif tag == W + "tbl":
+                table_depth += 1
+            continue
+
+        stack.pop()
+        parent = stack[-1] if stack else None
+        if tag == W + "p":
+            paragraph_depth -= 1
+            if paragraph_depth == 0 and table_depth == 0:
+                text = paragraph_text(element).strip()
+                if text:
+                    yield style_levels.get(_paragraph_style(element)), text
+        elif tag == W + "tbl":
+            table_depth -= 1
+        elif tag == W + "tr" and table_depth == 1 and paragraph_depth == 0:
+            text = _row_text(element)
+            if text.strip(CELL_SEPARATOR + " "):
+                yield None, text
+            parent.remove(element)
+            continue
+
+        if parent is not None and parent.tag in _BLOCK_CONTAINERS:
+            parent.remove(element)
+
+
+def iter_docx_lines(docx_path):
+    """Lignes de texte d'un DOCX lues en flux, titres numérotés artificiellement.
+
+    Les en-têtes et pieds de page (chacun une seule fois) précèdent le corps du
+    document : ils ne sont rattachés à aucune section.
+    """
+    numbering = HeadingNumbering()
+    with zipfile.ZipFile(docx_path) as archive:
+        style_levels = heading_style_levels(archive)
+
+        # En-têtes puis pieds de page, dans l'ordre de leur numéro
+        parts = [(match.group(1) != "header", int(match.group(2) or 0), match.string)
+                 for match in map(_HEADER_FOOTER_PART.match, archive.namelist()) if match]
+        seen = set()
+        for _, _, name in sorted(parts):
+            with archive.open(name) as part:
+                for _, text in iter_part_blocks(part, {}):
+                    if text not in seen:
+                        seen.add(text)
+                        yield text
+
+        with archive.open("word/document.xml") as part:
+            for level, text in iter_part_blocks(part, style_levels):
+                yield numbering.number(level, text) if level else text
+
+
+def stream_docx_to_text(docx_path):
+    """Texte structuré d'un DOCX (titres numérotés, tableaux, en-têtes et pieds de page)"""
+    return "\n".join(iter_docx_lines(docx_path))
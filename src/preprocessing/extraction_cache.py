@@ -0,0 +1,172 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+# Taille maximale du cache sur disque (en octets) et nombre d'entrées gardées en mémoire
+DEFAULT_MAX_DISK_BYTES = 512 * 1024 * 1024
+DEFAULT_MAX_MEMORY_ENTRIES = 64
+
+# Version du format des entrées : l'incrémenter invalide tout le cache existant
+CACHE_FORMAT_VERSION = 2
+
+
+def default_cache_dir():
+    """Retourne le dossier du cache (variable COMPARATEUR_CACHE_DIR ou ~/.cache)"""
+    base = os.environ.get("COMPARATEUR_CACHE_DIR")
+    if base:
+        return Path(base)
+    return Path.home() / ".cache" / "comparateur-documents"
+
+
+def file_digest(file_path, chunk_size=1024 * 1024):
+    """Calcule l'empreinte SHA-256 du contenu d'un fichier"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ExtractionCache:
+    """Cache persistant des résultats d'extraction, adressé par le contenu des fichiers.
+
+    Les entrées sont stockées en JSON sur le disque local, avec une couche LRU en
+    mémoire par-dessus. Une clé combine l'empreinte du fichier et celle des
+    paramètres d'extraction (réglages OCR, versions des outils), de sorte qu'un
+    changement de configuration ne renvoie jamais un résultat périmé.
+    """
+
+    def __init__(self, cache_dir=None, max_disk_bytes=DEFAULT_MAX_DISK_BYTES,
+                 max_memory_entries=DEFAULT_MAX_MEMORY_ENTRIES):
+        self.cache_dir = Path(cache_dir) if cache_dir else default_cache_dir() / "extraction"
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_disk_bytes = max_disk_bytes
+        self.max_memory_entries = max_memory_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+    def make_key(self, file_path, settings=None):
+        """Construit la clé d'un fichier pour un jeu de paramètres donné"""
+        payload = json.dumps(
+            {"format": CACHE_FORMAT_VERSION, "settings": settings or {}},
+            sort_keys=True,
+            default=str,
+        )
+        settings_digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+        return f"{file_digest(file_path)}_{settings_digest}"
+
+    def _entry_path(self, key):
+        return self.cache_dir / f"{key}.json"
+
+    def get(self, key):
+        """Retourne le résultat associé à la clé, ou None s'il est absent"""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+
+        path = self._entry_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                result = json.load(f)
+            # Rafraîchir la date d'accès pour l'éviction LRU sur disque
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+
+        self._remember(key, result)
+        return result
+
+    def put(self, key, result):
+        """Enregistre un résultat sur disque et en mémoire"""
+        path = self._entry_path(key)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(result, f, ensure_ascii=False)
+            # Remplacement atomique pour ne jamais exposer une entrée à moitié écrite
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        self._remember(key, result)
+        self._evict_disk()
+
+    def invalidate(self, key):
+        """Supprime une entrée du cache"""
+        with self._lock:
+            self._memory.pop(key, None)
+        try:
+            self._entry_path(key).unlink()
+        except FileNotFoundError:
+            pass
+
+    def invalidate_file(self, file_path):
+        """Supprime toutes les entrées d'un fichier, quels que soient les paramètres"""
+        prefix = file_digest(file_path) + "_"
+        with self._lock:
+            for key in [k for k in self._memory if k.startswith(prefix)]:
+                del self._memory[key]
+        for path in self.cache_dir.glob(f"{prefix}*.json"):
+            path.unlink(missing_ok=True)
+
+    def clear(self):
+        """Vide entièrement le cache"""
+        with self._lock:
+            self._memory.clear()
+        for path in self.cache_dir.glob("*.json"):
+            path.unlink(missing_ok=True)
+
+    def _remember(self, key, result):
+        with self._lock:
+            self._memory[key] = result
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_entries:
+                self._memory.popitem(last=False)
+
+    def _evict_disk(self):
+        """Supprime les entrées les moins récemment utilisées au-delà de la taille maximale"""
+        entries = []
+        total = 0
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if not entry.name.endswith(".json"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+        if total <= self.max_disk_bytes:
+            return
+
+        for _, size, path in sorted(entries):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            total -= size
+            key = Path(path).stem
+            with self._lock:
+                self._memory.pop(key, None)
+            if total <= self.max_disk_bytes:
+                break
+
+
+_default_cache = None
+
+
+def get_extraction_cache():
+    """Retourne l'instance partagée du cache d'extraction"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ExtractionCache()
+    return _default_cache
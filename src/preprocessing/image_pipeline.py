@@ -0,0 +1,172 @@
+import math
+import time
+
+import cv2
+import numpy as np
+
+# Réglages définis dans un module sans dépendance : les clés de cache se calculent sans OpenCV
+from src.preprocessing.preprocess_config import DEFAULT_PREPROCESS_CONFIG
+
+# Largeur des images réduites utilisées pour les estimations rapides (encre, inclinaison)
+ANALYSIS_WIDTH = 800
+# Proportion minimale de pixels d'encre pour qu'une ligne ou colonne ne soit pas considérée blanche
+INK_RATIO = 0.002
+
+
+def _downscale(gray, width=ANALYSIS_WIDTH):
+    """Réduit l'image pour les estimations ; retourne l'image et le facteur d'échelle"""
+    height, current_width = gray.shape
+    if current_width <= width:
+        return gray, 1.0
+    scale = width / current_width
+    return cv2.resize(gray, (width, max(1, round(height * scale))), interpolation=cv2.INTER_AREA), scale
+
+
+def _ink_mask(gray):
+    """Masque booléen des pixels d'encre (sombres) selon Otsu"""
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    return binary > 0
+
+
+def estimate_noise(gray, sample_size=512):
+    """Estime l'écart-type du bruit (méthode d'Immerkær) sur un échantillon central en pleine résolution"""
+    height, width = gray.shape
+    top = max(0, (height - sample_size) // 2)
+    left = max(0, (width - sample_size) // 2)
+    sample = gray[top:top + sample_size, left:left + sample_size].astype(np.float32)
+    if sample.shape[0] < 3 or sample.shape[1] < 3:
+        return 0.0
+    kernel = np.array([[1, -2, 1], [-2, 4, -2], [1, -2, 1]], dtype=np.float32)
+    response = cv2.filter2D(sample, -1, kernel)[1:-1, 1:-1]
+    h, w = response.shape
+    return float(np.abs(response).sum() * math.sqrt(math.pi / 2) / (6 * w * h))
+
+
+def crop_margins(gray, padding=20):
+    """Recadre l'image sur la zone contenant de l'encre, avec une marge de sécurité"""
+    small, scale = _downscale(gray)
+    ink = _ink_mask(small)
+    rows = np.flatnonzero(ink.sum(axis=1) > ink.shape[1] * INK_RATIO)
+    cols = np.flatnonzero(ink.sum(axis=0) > ink.shape[0] * INK_RATIO)
+    if rows.size == 0 or cols.size == 0:
+        return gray
+
+    height, width = gray.shape
+    top = max(0, int(rows[0] / scale) - padding)
+    bottom = min(height, int(math.ceil((rows[-1] + 1) / scale)) + padding)
+    left = max(0, int(cols[0] / scale) - padding)
+    right = min(width, int(math.ceil((cols[-1] + 1) / scale)) + padding)
+    return gray[top:bottom, left:right]
+
+
+def collapse_blank_bands(gray, max_band_height=40):
+    """Réduit chaque bande horizontale sans encre à `max_band_height` lignes au plus"""
+    ink = _ink_mask(gray)
+    blank_rows = ink.sum(axis=1) <= ink.shape[1] * INK_RATIO
+    keep = np.ones(len(blank_rows), dtype=bool)
+
+    # Longueur de la bande blanche en cours à chaque ligne
+    run = 0
+    for i, blank in enumerate(blank_rows):
+        run = run + 1 if blank else 0
+        if run > max_band_height:
+            keep[i] = False
+
+    if keep.all():
+        return gray
+    return gray[keep]
+
+
+def estimate_skew(gray, max_angle=5.0, step=0.5):
+    """Estime l'angle (en degrés) qui redresse le texte, par maximisation du profil de projection horizontal"""
+    small, _ = _downscale(gray)
+    ink = _ink_mask(small).astype(np.uint8)
+    height, width = ink.shape
+    center = (width / 2, height / 2)
+
+    best_angle, best_score = 0.0, -1.0
+    for angle in np.arange(-max_angle, max_angle + step / 2, step):
+        matrix = cv2.getRotationMatrix2D(center, float(angle), 1.0)
+        rotated = cv2.warpAffine(ink, matrix, (width, height), flags=cv2.INTER_NEAREST, borderValue=0)
+        # Des lignes de texte bien horizontales donnent un profil très contrasté
+        score = float(np.var(rotated.sum(axis=1, dtype=np.int64)))
+        if score > best_score:
+            best_angle, best_score = float(angle), score
+    return best_angle
+
+
+def rotate(gray, angle):
+    """Fait pivoter l'image autour de son centre, en complétant les bords en blanc.
+
+    La toile est agrandie au cadre de l'image tournée : sur une page recadrée au
+    plus près par `crop_margins`, les coins (et le texte qui s'y trouve) ne sont
+    pas coupés.
+    """
+    height, width = gray.shape
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    cos, sin = abs(matrix[0, 0]), abs(matrix[0, 1])
+    new_width = int(math.ceil(width * cos + height * sin))
+    new_height = int(math.ceil(width * sin + height * cos))
+    # Recentrer l'image tournée dans la toile agrandie
+    matrix[0, 2] += (new_width - width) / 2
+    matrix[1, 2] += (new_height - height) / 2
+    return cv2.warpAffine(gray, matrix, (new_width, new_height), flags=cv2.INTER_LINEAR, borderValue=255)
+
+
+def preprocess_pipeline(gray, config=None):
+    """Prétraitement OCR configurable et économe, étape par étape.
+
+    Le bruit est estimé à faible coût et le débruitage (coûteux) n'est lancé que
+    sur les scans bruités ; les marges et bandes blanches sont retirées avant les
+    filtres afin que Tesseract et les étapes suivantes traitent moins de pixels.
+    Retourne l'image binarisée et un rapport listant, pour chaque étape, sa durée
+    (`seconds`), si elle a été appliquée (`applied`) et ses mesures éventuelles.
+    """
+    config = {**DEFAULT_PREPROCESS_CONFIG, **(config or {})}
+    report = []
+
+    def timed(step, func, *args):
+        start = time.perf_counter()
+        output = func(*args)
+        report.append({"step": step, "seconds": time.perf_counter() - start})
+        return output
+
+    noise = timed("estimate_noise", estimate_noise, gray)
+    report[-1].update(applied=True, noise=round(noise, 2))
+
+    if config["crop_margins"]:
+        before = gray.shape
+        gray = timed("crop_margins", crop_margins, gray, config["margin_padding"])
+        report[-1].update(applied=gray.shape != before, shape=gray.shape)
+
+    if config["deskew"]:
+        angle = timed("deskew", estimate_skew, gray, config["max_skew_angle"], config["skew_step"])
+        applied = abs(angle) >= config["min_skew_angle"]
+        if applied:
+            start = time.perf_counter()
+            gray = rotate(gray, angle)
+            report[-1]["seconds"] += time.perf_counter() - start
+        report[-1].update(applied=applied, angle=angle)
+
+    if config["collapse_blank_bands"]:
+        before = gray.shape
+        gray = timed("collapse_blank_bands", collapse_blank_bands, gray, config["max_band_height"])
+        report[-1].update(applied=gray.shape != before, shape=gray.shape)
+
+    denoise = config["denoise"]
+    if denoise == "auto":
+        denoise = noise >= config["noise_threshold"]
+    if denoise:
+        gray = timed("denoise", cv2.fastNlMeansDenoising, gray, None, config["denoise_strength"], 7, 21)
+        report[-1]["applied"] = True
+    else:
+        report.append({"step": "denoise", "seconds": 0.0, "applied": False})
+
+    clahe = cv2.createCLAHE(clipLimit=config["clahe_clip_limit"], tileGridSize=(8, 8))
+    enhanced = timed("contrast", clahe.apply, gray)
+    report[-1]["applied"] = True
+
+    _, binary = timed("binarize", cv2.threshold, enhanced, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    report[-1]["applied"] = True
+
+    return binary, report
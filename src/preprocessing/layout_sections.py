@@ -0,0 +1,132 @@
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from src.preprocessing.extraction_cache import file_digest
+
+SECTION_PATTERN = re.compile(r'^(Article\s+)?\d+(\.\d+)*\.?\s')
+
+# Nombre de pages mémorisées
+DEFAULT_PAGE_CACHE_ENTRIES = 4096
+
+_page_cache = OrderedDict()
+_page_cache_lock = threading.Lock()
+
+
+def page_section_headings(page_chars, page_num, min_font_size=12):
+    """Détecte les titres de section d'une page à partir de ses caractères positionnés.
+
+    Équivalent vectorisé de la boucle de `detect_section_headings_by_layout` : la
+    géométrie des caractères (top, x0, taille) est chargée dans des tableaux
+    NumPy, les lignes sont regroupées par tri et les tailles de police moyennes
+    calculées par segments. Seules les lignes qui commencent par un chiffre ou
+    un « A » sont reconstituées puis testées par l'expression régulière.
+    """
+    n = len(page_chars)
+    if n == 0:
+        return []
+
+    tops = np.fromiter((c["top"] for c in page_chars), dtype=float, count=n)
+    lefts = np.fromiter((c["x0"] for c in page_chars), dtype=float, count=n)
+    sizes = np.fromiter((c["size"] for c in page_chars), dtype=float, count=n)
+    texts = np.array([c["text"] for c in page_chars], dtype=object)
+
+    # np.round arrondit au pair le plus proche, comme round() en Python
+    line_keys = np.round(tops)
+    # Tri stable : par ligne puis par position horizontale, l'ordre d'origine départage les égalités
+    order = np.lexsort((lefts, line_keys))
+    line_keys = line_keys[order]
+    lefts = lefts[order]
+    sizes = sizes[order]
+    texts = texts[order]
+
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(line_keys)) + 1))
+    ends = np.append(starts[1:], n)
+
+    # Premier caractère non blanc de chaque ligne
+    leads = np.array([t.lstrip()[:1] for t in texts], dtype=object)
+    positions = np.where(leads != "", np.arange(n), n)
+    first_visible = np.minimum.reduceat(positions, starts)
+    candidate_lines = np.flatnonzero(first_visible < ends)
+    candidate_lines = [
+        line for line in candidate_lines
+        if leads[first_visible[line]].isdigit() or leads[first_visible[line]] == "A"
+    ]
+    if not candidate_lines:
+        return []
+
+    # Taille moyenne des chiffres et points de chaque ligne, calculée par segments
+    numeric = np.array([t.isdigit() or t == '.' for t in texts], dtype=bool)
+    numeric_sizes = np.add.reduceat(np.where(numeric, sizes, 0.0), starts)
+    numeric_counts = np.add.reduceat(numeric.astype(int), starts)
+
+    headings = []
+    for line in candidate_lines:
+        full_text = "".join(texts[starts[line]:ends[line]]).strip()
+        if not SECTION_PATTERN.match(full_text) or numeric_counts[line] == 0:
+            continue
+        avg_size = float(numeric_sizes[line] / numeric_counts[line])
+        if avg_size >= min_font_size:
+            headings.append({
+                "page": page_num,
+                "text": full_text,
+                "font_size": round(avg_size, 2),
+                "top": int(line_keys[starts[line]]),
+                "left": float(lefts[starts[line]]),
+            })
+    return headings
+
+
+def _cache_get(key):
+    with _page_cache_lock:
+        if key in _page_cache:
+            _page_cache.move_to_end(key)
+            return _page_cache[key]
+    return None
+
+
+def _cache_put(key, headings):
+    with _page_cache_lock:
+        _page_cache[key] = headings
+        _page_cache.move_to_end(key)
+        while len(_page_cache) > DEFAULT_PAGE_CACHE_ENTRIES:
+            _page_cache.popitem(last=False)
+
+
+def clear_page_cache():
+    """Oublie les titres mémorisés de toutes les pages"""
+    with _page_cache_lock:
+        _page_cache.clear()
+
+
+def detect_section_headings_fast(document, min_font_size=12):
+    """Détecte les titres de section d'un PDF, même format que `detect_section_headings_by_layout`.
+
+    `document` est un ParsedDocument (ou un chemin, ouvert le temps de l'appel) :
+    le nombre de pages vient de ses métadonnées et les caractères positionnés de
+    sa lecture unique par pdfplumber, partagée avec les autres étapes. Le
+    résultat de chaque page est mémorisé (clé : contenu du fichier, numéro de
+    page, taille minimale) ; les caractères ne sont lus que si une page manque.
+    Les pages sont traitées dans le processus courant : la détection tourne déjà
+    dans les processus des travaux et du traitement en lot, sans pool imbriqué.
+    """
+    from src.preprocessing.parsed_document import ParsedDocument
+
+    if not isinstance(document, ParsedDocument):
+        with ParsedDocument(document, file_type=".pdf") as parsed:
+            return detect_section_headings_fast(parsed, min_font_size)
+
+    digest = file_digest(document.file_path)
+    headings = []
+    for page_num in range(1, document.page_count + 1):
+        key = (digest, page_num, min_font_size)
+        page_headings = _cache_get(key)
+        if page_headings is None:
+            chars = document.chars
+            page_chars = chars[page_num - 1] if page_num <= len(chars) else []
+            page_headings = page_section_headings(page_chars, page_num, min_font_size)
+            _cache_put(key, page_headings)
+        headings.extend(page_headings)
+    return sorted(headings, key=lambda x: (x["page"], x["top"]))
@@ -0,0 +1,203 @@
+import atexit
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from src.preprocessing.pdf_to_image import pdf_page_count, iter_pdf_pages, DEFAULT_PAGE_WINDOW
+from src.preprocessing.scan_text_extract import image_to_text, get_ocr_engine_pool
+from src.tracing import logger, record, span
+
+# Plafond par défaut du nombre de pages rendues présentes en mémoire simultanément
+DEFAULT_MAX_PAGES_IN_MEMORY = 8
+
+
+def default_ocr_workers():
+    """Nombre de processus OCR par défaut (variable OCR_WORKERS ou nombre de cœurs)"""
+    configured = os.environ.get("OCR_WORKERS")
+    if configured:
+        return max(1, int(configured))
+    return os.cpu_count() or 1
+
+
+def default_max_pages_in_memory(max_workers):
+    """Plafond de pages rendues en mémoire (variable OCR_MAX_PAGES_IN_MEMORY).
+
+    Par défaut, assez de pages pour occuper tous les processus OCR pendant le
+    rendu de la fenêtre suivante.
+    """
+    configured = os.environ.get("OCR_MAX_PAGES_IN_MEMORY")
+    if configured:
+        return max(2, int(configured))
+    return max(DEFAULT_MAX_PAGES_IN_MEMORY, max_workers + DEFAULT_PAGE_WINDOW)
+
+
+def ocr_backend():
+    """Moteur OCR choisi par la variable OCR_BACKEND : "local" (Tesseract, par défaut) ou "remote" """
+    return os.environ.get("OCR_BACKEND", "local").strip().lower()
+
+
+def ocr_image(image):
+    """Extrait le texte d'une image avec le moteur OCR configuré"""
+    if ocr_backend() == "remote":
+        from src.preprocessing.remote_ocr import remote_image_to_text
+        return remote_image_to_text(image)
+    return image_to_text(image)
+
+
+def _init_ocr_worker():
+    # Un processus Tesseract par cœur : désactiver le multithreading OpenMP interne
+    # pour éviter la sursouscription des cœurs
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+    # Charger les modèles une fois au démarrage du processus, pas à chaque page
+    try:
+        get_ocr_engine_pool().warm_up()
+    except Exception as e:
+        logger.warning(f"Préchargement du moteur OCR impossible: {str(e)}")
+
+
+_ocr_executors = {}
+_ocr_executors_pid = None
+_ocr_executors_lock = threading.Lock()
+
+
+def get_ocr_executor(max_workers):
+    """Retourne le pool de processus OCR de `max_workers` processus, créé au premier appel.
+
+    Le pool est conservé d'un document à l'autre : ses processus gardent les
+    moteurs préchargés par `_init_ocr_worker`. Il est arrêté à la sortie de
+    l'interpréteur, ou remplacé s'il a été interrompu (processus tué). Un
+    processus créé par fork ne réutilise pas le pool de son parent.
+    """
+    global _ocr_executors_pid
+    with _ocr_executors_lock:
+        if _ocr_executors_pid != os.getpid():
+            _ocr_executors.clear()
+            _ocr_executors_pid = os.getpid()
+        executor = _ocr_executors.get(max_workers)
+        if executor is None:
+            executor = _ocr_executors[max_workers] = ProcessPoolExecutor(
+                max_workers=max_workers, initializer=_init_ocr_worker
+            )
+        return executor
+
+
+def _discard_ocr_executor(executor):
+    with _ocr_executors_lock:
+        for max_workers, current in list(_ocr_executors.items()):
+            if current is executor:
+                del _ocr_executors[max_workers]
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_ocr_executors():
+    """Arrête les pools de processus OCR du processus courant"""
+    with _ocr_executors_lock:
+        executors = list(_ocr_executors.values()) if _ocr_executors_pid == os.getpid() else []
+        _ocr_executors.clear()
+    for executor in executors:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+atexit.register(shutdown_ocr_executors)
+
+
+def _ocr_page(page_num, image):
+    # La durée est mesurée dans le processus du pool et enregistrée par le processus principal
+    start = time.perf_counter()
+    text = image_to_text(image)
+    return page_num, text, time.perf_counter() - start
+
+
+def ocr_pdf_pages(pdf_path, max_workers=None, progress_callback=None, max_pages_in_memory=None, pages=None):
+    """OCR d'un PDF scanné, page par page, en pipeline sur un pool de processus.
+
+    Le processus principal rastérise les pages par fenêtres pendant que les
+    processus du pool reconnaissent les pages précédentes. Au plus
+    `max_pages_in_memory` pages rendues existent à la fois (fenêtre de rendu et
+    pages en attente d'OCR comprises), si bien que la mémoire ne croît pas avec le
+    nombre de pages. Les textes sont réassemblés dans l'ordre des pages.
+    `pages` restreint l'OCR à certains numéros de pages (à partir de 1) ; la liste
+    retournée suit alors l'ordre croissant de ces pages.
+    `progress_callback(pages_done, total_pages, page_num)` est appelé à chaque page
+    terminée, `total_pages` étant le nombre de pages à reconnaître.
+    Avec OCR_BACKEND=remote, les pages sont confiées au service OCR distant.
+    """
+    if ocr_backend() == "remote":
+        # Service distant : pages envoyées en parallèle par un client asynchrone
+        from src.preprocessing.remote_ocr import remote_ocr_pdf_pages
+        return remote_ocr_pdf_pages(pdf_path, pages=pages, progress_callback=progress_callback)
+
+    if pages is None:
+        pages = range(1, pdf_page_count(pdf_path) + 1)
+    pages = sorted(set(pages))
+    with span("ocr_pdf", pages=len(pages)) as current:
+        page_texts = _ocr_pdf_pages(pdf_path, pages, max_workers, progress_callback, max_pages_in_memory)
+        current.set(chars=sum(len(text) for text in page_texts))
+    return page_texts
+
+
+def _ocr_pdf_pages(pdf_path, pages, max_workers, progress_callback, max_pages_in_memory):
+    total_pages = len(pages)
+    positions = {page_num: i for i, page_num in enumerate(pages)}
+    max_workers = max_workers or default_ocr_workers()
+    max_pages = max(2, max_pages_in_memory or default_max_pages_in_memory(max_workers))
+
+    # La fenêtre de rendu et les pages en cours d'OCR se partagent le plafond
+    window = max(1, min(DEFAULT_PAGE_WINDOW, max_pages // 2))
+    max_in_flight = max(1, max_pages - window)
+    page_texts = [""] * total_pages
+
+    def page_done(done, page_num, text):
+        page_texts[positions[page_num]] = text
+        if progress_callback is not None:
+            progress_callback(done, total_pages, page_num)
+
+    # Un seul processus : pas de pool, l'OCR se fait dans le processus courant
+    if max_workers == 1:
+        for done, (page_num, image) in enumerate(iter_pdf_pages(pdf_path, window=window, pages=pages), start=1):
+            with span("ocr_page", page=page_num) as current:
+                text = image_to_text(image)
+                current.set(chars=len(text))
+            page_done(done, page_num, text)
+            del image
+        return page_texts
+
+    def page_finished(done, future):
+        page_num, text, seconds = future.result()
+        record("ocr_page", seconds, page=page_num, chars=len(text))
+        page_done(done, page_num, text)
+
+    done = 0
+    executor = get_ocr_executor(max_workers)
+    pending = set()
+    try:
+        for page_num, image in iter_pdf_pages(pdf_path, window=window, pages=pages):
+            pending.add(executor.submit(_ocr_page, page_num, image))
+            del image
+
+            # Attendre qu'une page se libère avant de rendre la suivante
+            while len(pending) >= max_in_flight:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    done += 1
+                    page_finished(done, future)
+
+        while pending:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                done += 1
+                page_finished(done, future)
+    except BrokenProcessPool:
+        # Un processus du pool a été tué : le pool est remplacé au prochain document
+        _discard_ocr_executor(executor)
+        raise
+    except BaseException:
+        # Interruption (annulation signalée par le rappel de progression, erreur) :
+        # ne pas attendre l'OCR des pages encore en file ; le pool reste disponible
+        for future in pending:
+            future.cancel()
+        raise
+
+    return page_texts
@@ -0,0 +1,392 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from src.preprocessing.extraction_cache import default_cache_dir
+from src.tracing import logger
+
+# Cache OCR page par page : une page déjà reconnue (même scan, ou nouveau scan de
+# la même page) n'est ni prétraitée ni repassée à Tesseract. L'empreinte est
+# calculée sur la page brute : l'encre est recadrée et ramenée à un format fixe,
+# résumée par un dHash de 64 bits, puis, pour les candidates, les deux pages sont
+# recalées l'une sur l'autre et comparées pixel par pixel avant de renvoyer le
+# texte mémorisé.
+
+# Distance de Hamming maximale entre les dHash de deux scans d'une même page
+# (variable OCR_PAGE_CACHE_TOLERANCE). Sur des scans décalés, tournés de 1°,
+# réduits de 5 %, flous, bruités ou recompressés en JPEG, l'écart mesuré atteint
+# 8 bits sur les pages de texte uniforme ; deux pages différentes en sont
+# souvent à peine plus loin, c'est le recalage qui les départage.
+DEFAULT_HASH_TOLERANCE = 12
+
+# Format du masque d'encre conservé pour la vérification (proportions A4) et marge
+# laissée autour de l'encre, en fraction de son étendue
+SIGNATURE_WIDTH = 1536
+SIGNATURE_HEIGHT = 2172
+CONTENT_MARGIN = 0.06
+# Bande au bord de la page et longueur relative au-delà desquelles une composante
+# d'encre est un artefact de numérisation (bord du scanner, trait de pliure) et non du texte
+EDGE_RATIO = 0.01
+RULE_RATIO = 0.15
+
+# Recalage : décalage global estimé par corrélation de phase à l'échelle
+# COARSE_SCALE, puis décalage de chaque tuile d'une grille ALIGNMENT_TILES ×
+# ALIGNMENT_TILES cherché à ±ALIGNMENT_SEARCH pixels ; une transformation affine
+# est ajustée sur ces décalages (RANSAC) puis affinée (ECC). Deux pages
+# différentes ne se recalent pas : le pic de corrélation reste sous MIN_PEAK
+# (au-dessus de 0,27 pour deux scans d'une même page, sous 0,12 sinon) et moins
+# de la moitié des tuiles s'accordent.
+COARSE_SCALE = 0.25
+MIN_PEAK = 0.2
+ALIGNMENT_TILES = 8
+ALIGNMENT_SEARCH = 24
+MIN_INLIER_RATIO = 0.5
+
+# Après recalage, l'encre sans équivalent à ALIGNMENT_TOLERANCE pixel près est
+# débarrassée des liserés d'un pixel (épaisseur des traits, binarisation) ; ce qui
+# reste vient d'un contenu différent. Deux scans d'une même page n'en laissent
+# aucun, un seul caractère modifié en laisse au moins 10 pixels dans une fenêtre.
+ALIGNMENT_TOLERANCE = 1
+MAX_UNMATCHED_RATIO = 0.002
+LOCAL_WINDOW = 32
+MAX_LOCAL_UNMATCHED = 4
+# Nombre de pages candidates vérifiées au plus pour une recherche
+MAX_CANDIDATES = 4
+
+# Nombre de pages conservées (environ 60 Ko de masque d'encre par page)
+DEFAULT_MAX_ENTRIES = 2000
+
+# Version du format des entrées : l'incrémenter invalide tout le cache existant
+PAGE_CACHE_VERSION = 2
+
+
+def _ink_mask(gray):
+    """Masque d'encre d'une page en niveaux de gris, à la largeur SIGNATURE_WIDTH, sans artefacts de bord"""
+    import cv2
+
+    height, width = gray.shape
+    small = cv2.resize(gray, (SIGNATURE_WIDTH, max(1, round(height * SIGNATURE_WIDTH / width))),
+                       interpolation=cv2.INTER_AREA)
+    _, ink = cv2.threshold(small, 0, 1, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    _, labels, stats, _ = cv2.connectedComponentsWithStats(ink, connectivity=8)
+    height, width = ink.shape
+    x, y, w, h = (stats[:, i] for i in range(4))
+    # Composantes collées au bord de l'image ou longs traits fins : ombres et bords du scan
+    edge = ((x <= EDGE_RATIO * width) | (y <= EDGE_RATIO * height)
+            | (x + w >= (1 - EDGE_RATIO) * width) | (y + h >= (1 - EDGE_RATIO) * height))
+    rule = ((w > RULE_RATIO * width) & (h * 10 < w)) | ((h > RULE_RATIO * height) & (w * 10 < h))
+    keep = ~(edge | rule)
+    keep[0] = False
+    return keep[labels] & (ink > 0)
+
+
+def _normalize(ink):
+    """Recadre le masque sur l'encre (avec une marge) et le ramène au format SIGNATURE_WIDTH × SIGNATURE_HEIGHT"""
+    import cv2
+    import numpy as np
+
+    ys, xs = np.nonzero(ink)
+    if len(xs) < 50:
+        return None
+    # Les percentiles écartent les quelques taches isolées loin du texte
+    left, right = np.percentile(xs, [0.1, 99.9])
+    top, bottom = np.percentile(ys, [0.1, 99.9])
+    margin_x = max(right - left, 1) * CONTENT_MARGIN
+    margin_y = max(bottom - top, 1) * CONTENT_MARGIN
+    left, right, top, bottom = left - margin_x, right + margin_x, top - margin_y, bottom + margin_y
+    scale_x = SIGNATURE_WIDTH / (right - left)
+    scale_y = SIGNATURE_HEIGHT / (bottom - top)
+    matrix = np.float32([[scale_x, 0, -left * scale_x], [0, scale_y, -top * scale_y]])
+    warped = cv2.warpAffine(ink.astype(np.float32), matrix, (SIGNATURE_WIDTH, SIGNATURE_HEIGHT),
+                            flags=cv2.INTER_LINEAR)
+    return warped > 0.5
+
+
+def _dhash(mask):
+    """Empreinte de 64 bits : sens du gradient horizontal de la densité d'encre (lissée) sur une grille 9×8"""
+    import cv2
+    import numpy as np
+
+    density = cv2.resize(mask.astype(np.float32), None, fx=0.125, fy=0.125, interpolation=cv2.INTER_AREA)
+    density = cv2.resize(cv2.GaussianBlur(density, (0, 0), 4), (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (density[:, 1:] > density[:, :-1]).flatten()
+    return int("".join("1" if bit else "0" for bit in bits), 2)
+
+
+def _register(reference, mask):
+    """Transformation affine qui superpose `mask` à `reference`, ou None si les deux pages ne se recalent pas"""
+    import cv2
+    import numpy as np
+
+    reference = reference.astype(np.float32)
+    mask = mask.astype(np.float32)
+
+    def reduce(image, scale):
+        return cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+    # Décalage global
+    (shift_x, shift_y), peak = cv2.phaseCorrelate(reduce(reference, COARSE_SCALE), reduce(mask, COARSE_SCALE))
+    if peak < MIN_PEAK:
+        return None
+    shift_x, shift_y = round(shift_x / COARSE_SCALE), round(shift_y / COARSE_SCALE)
+
+    # Décalage de chaque tuile contenant de l'encre, autour du décalage global
+    tile_height = SIGNATURE_HEIGHT // ALIGNMENT_TILES
+    tile_width = SIGNATURE_WIDTH // ALIGNMENT_TILES
+    padding = ALIGNMENT_SEARCH + max(abs(shift_x), abs(shift_y))
+    padded = np.pad(cv2.GaussianBlur(mask, (0, 0), 1.5), padding)
+    sources, targets = [], []
+    for row in range(ALIGNMENT_TILES):
+        for column in range(ALIGNMENT_TILES):
+            top, left = row * tile_height, column * tile_width
+            tile = reference[top:top + tile_height, left:left + tile_width]
+            if tile.sum() < 0.02 * tile.size:
+                continue
+            y = top + padding + shift_y - ALIGNMENT_SEARCH
+            x = left + padding + shift_x - ALIGNMENT_SEARCH
+            window = padded[y:y + tile_height + 2 * ALIGNMENT_SEARCH, x:x + tile_width + 2 * ALIGNMENT_SEARCH]
+            _, score, _, (dx, dy) = cv2.minMaxLoc(cv2.matchTemplate(window, tile, cv2.TM_CCOEFF_NORMED))
+            if score < 0.3:
+                continue
+            center_x, center_y = left + tile_width / 2, top + tile_height / 2
+            targets.append((center_x, center_y))
+            sources.append((center_x + shift_x - ALIGNMENT_SEARCH + dx, center_y + shift_y - ALIGNMENT_SEARCH + dy))
+    if len(sources) < 3:
+        return None
+    matrix, inliers = cv2.estimateAffine2D(np.float32(sources), np.float32(targets), ransacReprojThreshold=2.0)
+    if matrix is None or inliers.sum() < MIN_INLIER_RATIO * len(sources):
+        return None
+
+    # Affinage sub-pixel sur des images réduites ; en cas d'échec, l'ajustement RANSAC suffit
+    try:
+        scaled = cv2.invertAffineTransform(matrix).astype(np.float32)
+        scaled[:, 2] *= COARSE_SCALE
+        _, scaled = cv2.findTransformECC(
+            cv2.GaussianBlur(reduce(reference, COARSE_SCALE), (0, 0), 1),
+            cv2.GaussianBlur(reduce(mask, COARSE_SCALE), (0, 0), 1),
+            scaled, cv2.MOTION_AFFINE, (cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 50, 1e-5), None, 1,
+        )
+        scaled = cv2.invertAffineTransform(scaled)
+        scaled[:, 2] /= COARSE_SCALE
+        matrix = scaled
+    except cv2.error:
+        pass
+    return matrix
+
+
+class PageFingerprint:
+    """Empreinte d'une page : dHash pour la recherche, masque d'encre normalisé pour la vérification"""
+
+    def __init__(self, dhash, mask):
+        self.dhash = dhash
+        self.mask = mask
+
+    @classmethod
+    def from_image(cls, gray):
+        """Empreinte d'une page en niveaux de gris, avant prétraitement ; None pour une page blanche"""
+        mask = _normalize(_ink_mask(gray))
+        if mask is None:
+            return None
+        return cls(_dhash(mask), mask)
+
+    def signature(self):
+        """Masque d'encre compressé (bits empaquetés) pour le stockage"""
+        import numpy as np
+
+        return zlib.compress(np.packbits(self.mask).tobytes())
+
+    @staticmethod
+    def mask_from_signature(signature, height):
+        import numpy as np
+
+        bits = np.unpackbits(np.frombuffer(zlib.decompress(signature), dtype=np.uint8))
+        return bits[:height * SIGNATURE_WIDTH].reshape(height, SIGNATURE_WIDTH).astype(bool)
+
+    def matches(self, mask):
+        """Vrai si le masque est celui d'un autre scan de la même page.
+
+        Les pages sont recalées, puis la part d'encre sans équivalent (une fois
+        retirés les liserés d'un pixel) est comparée aux seuils, sur toute la page
+        et dans chaque fenêtre de LOCAL_WINDOW pixels.
+        """
+        import cv2
+        import numpy as np
+
+        if mask.shape != self.mask.shape:
+            return False
+        matrix = _register(self.mask, mask)
+        if matrix is None:
+            return False
+        reference = self.mask.astype(np.uint8)
+        other = (cv2.warpAffine(mask.astype(np.float32), matrix, (SIGNATURE_WIDTH, SIGNATURE_HEIGHT),
+                                flags=cv2.INTER_LINEAR) > 0.5).astype(np.uint8)
+        kernel = np.ones((2 * ALIGNMENT_TOLERANCE + 1, 2 * ALIGNMENT_TOLERANCE + 1), np.uint8)
+        unmatched = (reference & (1 - cv2.dilate(other, kernel))) | (other & (1 - cv2.dilate(reference, kernel)))
+        unmatched = cv2.morphologyEx(unmatched, cv2.MORPH_OPEN, np.ones((2, 2), np.uint8))
+        ink = max(1, (int(reference.sum()) + int(other.sum())) // 2)
+        if unmatched.sum() > MAX_UNMATCHED_RATIO * ink:
+            return False
+        local = cv2.boxFilter(unmatched.astype(np.float32), -1, (LOCAL_WINDOW, LOCAL_WINDOW), normalize=False)
+        return local.max() <= MAX_LOCAL_UNMATCHED
+
+
+def _hamming(hash1, hash2):
+    return bin(hash1 ^ hash2).count("1")
+
+
+def _signed(value):
+    # SQLite stocke des entiers signés sur 64 bits
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def ocr_settings_digest():
+    """Empreinte des réglages qui influencent le texte reconnu d'une page (OCR, prétraitement, versions)"""
+    from src.preprocessing.document_utils import tool_versions
+    from src.preprocessing.preprocess_config import DEFAULT_PREPROCESS_CONFIG
+    from src.preprocessing.scan_text_extract import TESSERACT_CONFIG
+
+    payload = json.dumps({
+        "format": PAGE_CACHE_VERSION,
+        "ocr_config": TESSERACT_CONFIG,
+        "preprocess": DEFAULT_PREPROCESS_CONFIG,
+        "versions": tool_versions(".png"),
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+class PageOCRCache:
+    """Textes OCR des pages déjà reconnues, stockés dans une base SQLite locale.
+
+    Chaque entrée associe le dHash et le masque d'encre d'une page au texte
+    reconnu. Une recherche retient les pages dont le dHash est à moins de
+    `tolerance` bits (les dHash, quelques kilo-octets pour tout le cache, sont
+    parcourus en entier), puis recale et compare les masques des plus proches :
+    un nouveau scan de la même page est reconnu, une page modifiée ne l'est pas.
+    La base est partagée entre les processus du pool OCR (une connexion par
+    thread, mode WAL) ; au-delà de `max_entries`, les pages les moins
+    récemment utilisées sont supprimées.
+    """
+
+    def __init__(self, path=None, tolerance=None, max_entries=DEFAULT_MAX_ENTRIES, settings=None):
+        self.path = str(path or default_cache_dir() / "page_ocr.sqlite3")
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        if tolerance is None:
+            tolerance = int(os.environ.get("OCR_PAGE_CACHE_TOLERANCE", DEFAULT_HASH_TOLERANCE))
+        self.tolerance = max(0, min(tolerance, 64))
+        self.max_entries = max_entries
+        self._settings = settings
+        self._local = threading.local()
+        self._create_schema()
+
+    @property
+    def settings(self):
+        if self._settings is None:
+            self._settings = ocr_settings_digest()
+        return self._settings
+
+    def _connection(self):
+        # Une connexion par thread et par processus : un processus du pool OCR créé
+        # par fork ne doit pas réutiliser la connexion héritée de son parent
+        pid, connection = getattr(self._local, "connection", (None, None))
+        if connection is None or pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = os.getpid(), connection
+        return connection
+
+    def _create_schema(self):
+        with self._connection() as connection:
+            # Entrées d'un format précédent : incomparables, la table est recréée
+            if connection.execute("PRAGMA user_version").fetchone()[0] != PAGE_CACHE_VERSION:
+                connection.execute("DROP TABLE IF EXISTS pages")
+                connection.execute(f"PRAGMA user_version = {PAGE_CACHE_VERSION}")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS pages (id INTEGER PRIMARY KEY, settings TEXT NOT NULL, "
+                "dhash INTEGER NOT NULL, height INTEGER NOT NULL, signature BLOB NOT NULL, "
+                "text TEXT NOT NULL, used REAL NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS pages_settings ON pages (settings)")
+            connection.execute("CREATE INDEX IF NOT EXISTS pages_used ON pages (used)")
+
+    def lookup(self, fingerprint):
+        """Texte mémorisé d'une page équivalente, ou None (y compris en cas d'erreur)"""
+        try:
+            return self._lookup(fingerprint)
+        # Base illisible, mais aussi erreur OpenCV ou NumPy lors du recalage des
+        # masques : la page est alors traitée comme absente du cache
+        except Exception as e:
+            logger.warning(f"Lecture du cache OCR par page impossible: {str(e)}")
+            return None
+
+    def _lookup(self, fingerprint):
+        connection = self._connection()
+        rows = connection.execute("SELECT id, dhash FROM pages WHERE settings = ?", (self.settings,)).fetchall()
+        candidates = []
+        for entry_id, dhash in rows:
+            distance = _hamming(fingerprint.dhash, dhash % (1 << 64))
+            if distance <= self.tolerance:
+                candidates.append((distance, entry_id))
+        candidates.sort()
+        for _, entry_id in candidates[:MAX_CANDIDATES]:
+            row = connection.execute("SELECT height, signature, text FROM pages WHERE id = ?", (entry_id,)).fetchone()
+            if row is None:
+                continue
+            height, signature, text = row
+            if fingerprint.matches(PageFingerprint.mask_from_signature(signature, height)):
+                with connection:
+                    connection.execute("UPDATE pages SET used = ? WHERE id = ?", (time.time(), entry_id))
+                return text
+        return None
+
+    def store(self, fingerprint, text):
+        """Mémorise le texte reconnu d'une page"""
+        try:
+            self._store(fingerprint, text)
+        except Exception as e:
+            logger.warning(f"Écriture dans le cache OCR par page impossible: {str(e)}")
+
+    def _store(self, fingerprint, text):
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT INTO pages (settings, dhash, height, signature, text, used) VALUES (?, ?, ?, ?, ?, ?)",
+                (self.settings, _signed(fingerprint.dhash), fingerprint.mask.shape[0],
+                 fingerprint.signature(), text, time.time()),
+            )
+            connection.execute(
+                "DELETE FROM pages WHERE id IN (SELECT id FROM pages ORDER BY used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def clear(self):
+        """Vide entièrement le cache"""
+        with self._connection() as connection:
+            connection.execute("DELETE FROM pages")
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def page_cache_enabled():
+    """Cache OCR par page actif sauf si la variable OCR_PAGE_CACHE vaut 0"""
+    return os.environ.get("OCR_PAGE_CACHE", "1").strip().lower() not in ("0", "false", "no", "off")
+
+
+def get_page_ocr_cache():
+    """Retourne le cache OCR par page du processus courant, ou None s'il est désactivé ou inutilisable"""
+    global _default_cache
+    if not page_cache_enabled():
+        return None
+    with _default_cache_lock:
+        if _default_cache is None:
+            try:
+                _default_cache = PageOCRCache()
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f"Cache OCR par page indisponible: {str(e)}")
+                _default_cache = False
+        return _default_cache or None
@@ -0,0 +1,179 @@
+import re
+import zipfile
+from functools import cached_property
+from pathlib import Path
+
+from src.preprocessing.text_extract import docx_to_text, reader_page_profiles
+from src.preprocessing.ocr_pipeline import ocr_pdf_pages, ocr_image
+from src.tracing import incr, logger
+
+# En dessous de ce nombre de caractères, une page est considérée comme scannée
+MIN_PAGE_TEXT_CHARS = 20
+
+IMAGE_TYPES = ['.jpg', '.jpeg', '.png']
+# Types de fichiers dont l'extraction peut passer par l'OCR (pages scannées, images)
+OCR_FILE_TYPES = IMAGE_TYPES + ['.pdf']
+
+
+def page_needs_ocr(profile):
+    """Indique si une page PDF doit être rastérisée et passée à l'OCR.
+
+    Une page sans police déclarée n'a pas de couche texte réelle ; une page avec
+    trop peu de caractères mais des images est probablement un scan (signature,
+    annexe). Une page vide de tout contenu n'est pas reconnue inutilement.
+    """
+    chars = len(profile["text"].strip())
+    if chars >= MIN_PAGE_TEXT_CHARS and profile["has_fonts"]:
+        return False
+    return profile["has_images"]
+
+
+def docx_page_count_from_metadata(docx_path):
+    """Lit le nombre de pages enregistré par le traitement de texte dans docProps/app.xml"""
+    try:
+        with zipfile.ZipFile(docx_path) as archive:
+            app_xml = archive.read("docProps/app.xml").decode("utf-8", errors="ignore")
+    except (KeyError, OSError, zipfile.BadZipFile):
+        return None
+    match = re.search(r"<(?:\w+:)?Pages>\s*(\d+)\s*</(?:\w+:)?Pages>", app_xml)
+    return int(match.group(1)) if match else None
+
+
+class ParsedDocument:
+    """Document analysé une seule fois et partagé par toutes les étapes.
+
+    Chaque vue (pages, texte, caractères positionnés, sections) est calculée à la
+    première demande puis mémorisée : le PDF n'est lu qu'une fois par PyPDF2 et
+    qu'une fois par pdfplumber, quel que soit le nombre d'étapes qui l'utilisent.
+    Le nombre de pages provient des métadonnées (/Count du PDF, docProps/app.xml
+    du DOCX) sans extraction du contenu.
+    """
+
+    def __init__(self, file_path, file_type=None, ocr_workers=None, progress_callback=None):
+        self.file_path = str(file_path)
+        self.file_type = (file_type or Path(file_path).suffix).lower()
+        self.ocr_workers = ocr_workers
+        self.progress_callback = progress_callback
+        if self.file_type not in IMAGE_TYPES + ['.pdf', '.docx']:
+            raise ValueError(f"Type de fichier non supporté: {self.file_type}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Ferme le document pdfplumber s'il a été ouvert"""
+        plumber = self.__dict__.pop("plumber", None)
+        if plumber is not None:
+            plumber.close()
+
+    @cached_property
+    def pdf_reader(self):
+        import PyPDF2
+
+        # PdfReader charge le fichier en mémoire : aucun descripteur ne reste ouvert
+        return PyPDF2.PdfReader(self.file_path)
+
+    @cached_property
+    def plumber(self):
+        import pdfplumber
+        return pdfplumber.open(self.file_path)
+
+    @cached_property
+    def docx(self):
+        from docx import Document
+        return Document(self.file_path)
+
+    @cached_property
+    def page_count(self):
+        if self.file_type in IMAGE_TYPES:
+            return 1
+        if self.file_type == '.pdf':
+            try:
+                # Entrée /Count de l'arbre des pages : pas besoin de parcourir les pages
+                return int(self.pdf_reader.trailer["/Root"]["/Pages"]["/Count"])
+            except Exception:
+                return len(self.pdf_reader.pages)
+        count = docx_page_count_from_metadata(self.file_path)
+        if count is not None:
+            return count
+        # Estimation basée sur le nombre de ruptures de section
+        return len(self.docx.sections)
+
+    @cached_property
+    def page_profiles(self):
+        """Profils (texte, polices, images) des pages d'un PDF"""
+        if self.file_type != '.pdf':
+            return []
+        try:
+            return reader_page_profiles(self.pdf_reader)
+        except Exception as e:
+            logger.warning(f"Erreur lors de l'extraction du texte du PDF {self.file_path}: {str(e)}")
+            return []
+
+    @cached_property
+    def pages(self):
+        """Texte de chaque page, couche texte ou OCR selon la page"""
+        if self.file_type in IMAGE_TYPES:
+            return [ocr_image(self.file_path)]
+        if self.file_type == '.docx':
+            # Lecture en flux du XML : le modèle objet python-docx n'est pas chargé
+            return [docx_to_text(self.file_path)]
+
+        profiles = self.page_profiles
+        if not profiles:
+            # PyPDF2 n'a pas pu lire le document : tenter l'OCR de toutes les pages
+            logger.info(f"PDF illisible par PyPDF2, OCR de toutes les pages: {self.file_path}")
+            incr("pdf_unreadable")
+            return ocr_pdf_pages(self.file_path, max_workers=self.ocr_workers,
+                                 progress_callback=self.progress_callback)
+
+        # Décision page par page : seules les pages sans texte exploitable passent à l'OCR
+        pages = [profile["text"] for profile in profiles]
+        ocr_pages = [i + 1 for i, profile in enumerate(profiles) if page_needs_ocr(profile)]
+        if ocr_pages:
+            logger.info(f"{len(ocr_pages)}/{len(pages)} pages probablement scannées, OCR de ces pages: {self.file_path}")
+            incr("pages_ocr", len(ocr_pages))
+            # Rendu et OCR en pipeline sur un pool de processus, pages gardées en mémoire
+            page_texts = ocr_pdf_pages(self.file_path, max_workers=self.ocr_workers,
+                                       progress_callback=self.progress_callback, pages=ocr_pages)
+            for page_num, page_text in zip(ocr_pages, page_texts):
+                pages[page_num - 1] = page_text
+        return pages
+
+    @cached_property
+    def text(self):
+        if self.file_type != '.pdf':
+            return self.pages[0]
+        return "".join(page_text + "\n" for page_text in self.pages)
+
+    @cached_property
+    def page_offsets(self):
+        """Position du début de chaque page dans `text`"""
+        if self.file_type != '.pdf':
+            return [0]
+        offsets = []
+        position = 0
+        for page_text in self.pages:
+            offsets.append(position)
+            position += len(page_text) + 1
+        return offsets
+
+    @cached_property
+    def chars(self):
+        """Caractères positionnés (pdfplumber) de chaque page d'un PDF"""
+        if self.file_type != '.pdf':
+            return []
+        return [page.chars for page in self.plumber.pages]
+
+    @cached_property
+    def sections(self):
+        """Sections détectées (mise en page pour les PDF, numérotation sinon)"""
+        from src.preprocessing.document_utils import segment_text_by_topics
+        from src.preprocessing.layout_sections import detect_section_headings_fast
+
+        if self.file_type == '.pdf':
+            return {f"{i+1}.": sec["text"] for i, sec in enumerate(detect_section_headings_fast(self))}
+        return segment_text_by_topics(self.text)
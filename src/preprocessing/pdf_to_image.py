@@ -1,8 +1,16 @@
-from pdf2image import convert_from_path
 import os
 import platform
 from pathlib import Path
 
+from src.tracing import logger, span
+
+# Paramètres de rastérisation utilisés pour l'OCR des PDF scannés
+DEFAULT_DPI = 400
+DEFAULT_WIDTH = 3000
+
+# Nombre de pages rendues par appel à Poppler en mode flux
+DEFAULT_PAGE_WINDOW = 4
+
 def get_poppler_path():
     """Retourne le chemin de Poppler selon le système d'exploitation"""
     system = platform.system()
@@ -29,50 +37,100 @@ def get_poppler_path():
     
     raise EnvironmentError("Poppler non trouvé. Veuillez l'installer et vérifier les chemins.")
 
+def pdf_page_count(pdf_path):
+    """Retourne le nombre de pages d'un PDF d'après ses métadonnées (pdfinfo)"""
+    from pdf2image import pdfinfo_from_path
+
+    info = pdfinfo_from_path(pdf_path, poppler_path=get_poppler_path())
+    return int(info["Pages"])
+
+def render_pdf_pages(pdf_path, first_page=None, last_page=None):
+    """Rend les pages d'un PDF en images PIL (niveaux de gris) sans rien écrire sur le disque.
+
+    Les pages passent de pdftoppm à pdf2image au format brut (PGM), par un tube :
+    ni encodage d'image ni fichier temporaire.
+    """
+    from pdf2image import convert_from_path
+
+    # Vérifier si le fichier existe
+    if not os.path.exists(pdf_path):
+        raise ValueError(f"Le fichier PDF n'existe pas: {pdf_path}")
+    
+    # Obtenir le chemin de Poppler
+    poppler_path = get_poppler_path()
+    
+    # pdftoppm sans dossier de sortie : pdf2image lit les pages brutes (PGM) sur la
+    # sortie standard de Poppler. pdftocairo imposerait le PNG et un dossier temporaire
+    with span("render_pages", first_page=first_page, last_page=last_page) as current:
+        images = convert_from_path(
+            pdf_path,
+            fmt="ppm",
+            poppler_path=poppler_path,
+            dpi=DEFAULT_DPI,  # Augmenter la résolution
+            grayscale=True,  # Convertir en niveaux de gris
+            size=(DEFAULT_WIDTH, None),  # Redimensionner pour une meilleure qualité
+            first_page=first_page,
+            last_page=last_page,
+            thread_count=4,  # Utiliser plusieurs threads pour la conversion
+            use_pdftocairo=False  # pdftoppm : pages brutes en mémoire, sans encodage PNG
+        )
+        current.set(pages=len(images))
+    return images
+
+def _page_windows(page_numbers, window):
+    """Découpe une liste de numéros de pages en plages contiguës d'au plus `window` pages"""
+    start = previous = None
+    for page_num in sorted(set(page_numbers)):
+        if start is not None and page_num == previous + 1 and page_num - start < window:
+            previous = page_num
+            continue
+        if start is not None:
+            yield start, previous
+        start = previous = page_num
+    if start is not None:
+        yield start, previous
+
+def iter_pdf_pages(pdf_path, window=DEFAULT_PAGE_WINDOW, pages=None):
+    """Rend un PDF par fenêtres de `window` pages et produit les pages une à une.
+
+    Chaque fenêtre est rendue avec first_page/last_page : au plus `window` pages
+    rendues sont détenues par le générateur à un instant donné, quelle que soit la
+    longueur du document. `pages` restreint le rendu à certains numéros de pages
+    (à partir de 1). Produit des tuples (numéro de page, image PIL).
+    """
+    window = max(1, window)
+    if pages is None:
+        pages = range(1, pdf_page_count(pdf_path) + 1)
+    for first_page, last_page in _page_windows(pages, window):
+        images = render_pdf_pages(pdf_path, first_page=first_page, last_page=last_page)
+        for offset in range(len(images)):
+            image = images[offset]
+            # Libérer la référence de la fenêtre dès que la page est transmise
+            images[offset] = None
+            yield first_page + offset, image
+            del image
+
 def pdf_to_images(pdf_path, output_dir=None):
     """Convertit un PDF en images et retourne la liste des chemins des images"""
     try:
-        print(f"Tentative de conversion du PDF en images: {pdf_path}")
-        
-        # Vérifier si le fichier existe
-        if not os.path.exists(pdf_path):
-            raise ValueError(f"Le fichier PDF n'existe pas: {pdf_path}")
-        
         # Si aucun dossier de sortie n'est spécifié, utiliser un dossier temporaire
         if output_dir is None:
             output_dir = Path("temp_pdf_images")
             output_dir.mkdir(exist_ok=True)
-            print(f"Dossier temporaire créé: {output_dir}")
-        
-        # Obtenir le chemin de Poppler
-        poppler_path = get_poppler_path()
-        print(f"Chemin Poppler utilisé: {poppler_path}")
-        
-        # Convertir le PDF en images avec des paramètres optimisés
-        print("Début de la conversion PDF en images...")
-        images = convert_from_path(
-            pdf_path,
-            fmt="jpeg",
-            poppler_path=poppler_path,
-            dpi=400,  # Augmenter la résolution
-            grayscale=True,  # Convertir en niveaux de gris
-            size=(3000, None),  # Redimensionner pour une meilleure qualité
-            thread_count=4,  # Utiliser plusieurs threads pour la conversion
-            use_pdftocairo=True  # Utiliser pdftocairo pour une meilleure qualité
-        )
-        print(f"Conversion terminée. {len(images)} pages converties")
+        output_dir = Path(output_dir)
         
-        # Sauvegarder les images et collecter les chemins
-        image_paths = []
-        for i, image in enumerate(images):
-            output_path = output_dir / f"page_{i + 1}.jpg"
-            print(f"Sauvegarde de la page {i+1} dans: {output_path}")
-            # Sauvegarder avec une meilleure qualité
-            image.save(str(output_path), "JPEG", quality=100)
-            image_paths.append(str(output_path))
+        # Convertir le PDF en images par fenêtres de pages pour borner la mémoire
+        with span("pdf_to_images") as current:
+            # Sauvegarder les images et collecter les chemins
+            image_paths = []
+            for page_num, image in iter_pdf_pages(pdf_path):
+                output_path = output_dir / f"page_{page_num}.jpg"
+                # Sauvegarder avec une meilleure qualité
+                image.save(str(output_path), "JPEG", quality=100)
+                image_paths.append(str(output_path))
+            current.set(pages=len(image_paths))
         
-        print(f"Conversion terminée avec succès. {len(image_paths)} images créées")
         return image_paths
     except Exception as e:
-        print(f"Erreur lors de la conversion du PDF en images: {str(e)}")
-        return []
\ No newline at end of file
+        logger.warning(f"Erreur lors de la conversion du PDF en images: {str(e)}")
+        return []
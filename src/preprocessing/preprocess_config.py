@@ -0,0 +1,20 @@
+# Paramètres par défaut du prétraitement OCR (une copie peut être modifiée et passée au pipeline)
+DEFAULT_PREPROCESS_CONFIG = {
+    # Recadrage des marges blanches, avec une marge de sécurité en pixels
+    "crop_margins": True,
+    "margin_padding": 20,
+    # Réduction des bandes horizontales blanches à une hauteur maximale
+    "collapse_blank_bands": True,
+    "max_band_height": 40,
+    # Redressement : angles testés (en degrés) et angle minimal corrigé
+    "deskew": True,
+    "max_skew_angle": 5.0,
+    "skew_step": 0.5,
+    "min_skew_angle": 0.3,
+    # Débruitage : "auto" (seulement au-delà du seuil de bruit estimé), True ou False
+    "denoise": "auto",
+    "noise_threshold": 8.0,
+    "denoise_strength": 10,
+    # Contraste (CLAHE) puis binarisation d'Otsu
+    "clahe_clip_limit": 2.0,
+}
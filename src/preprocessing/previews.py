@@ -0,0 +1,184 @@
+import io
+import os
+import threading
+from collections import OrderedDict
+
+from src.preprocessing.extraction_cache import default_cache_dir, file_digest
+from src.tracing import incr, logger, span
+
+# Résolution et largeur des miniatures d'aperçu (bien en dessous du rendu OCR)
+THUMBNAIL_DPI = 60
+THUMBNAIL_WIDTH = 600
+THUMBNAIL_QUALITY = 80
+
+# Nombre de pages affichées à la fois dans l'aperçu
+PAGES_PER_VIEW = 3
+
+# Taille des miniatures gardées en mémoire et sur disque (en octets)
+DEFAULT_MAX_MEMORY_BYTES = 64 * 1024 * 1024
+DEFAULT_MAX_DISK_BYTES = 256 * 1024 * 1024
+
+
+def _encode_jpeg(image):
+    buffer = io.BytesIO()
+    image.convert("RGB").save(buffer, "JPEG", quality=THUMBNAIL_QUALITY, optimize=True)
+    return buffer.getvalue()
+
+
+def render_pdf_thumbnail(pdf_path, page_num, width=THUMBNAIL_WIDTH):
+    """Rend une seule page d'un PDF en miniature JPEG, à basse résolution"""
+    from pdf2image import convert_from_path
+    from src.preprocessing.pdf_to_image import get_poppler_path
+
+    images = convert_from_path(
+        pdf_path,
+        dpi=THUMBNAIL_DPI,
+        size=(width, None),
+        first_page=page_num,
+        last_page=page_num,
+        fmt="ppm",
+        poppler_path=get_poppler_path(),
+        use_pdftocairo=True,
+    )
+    if not images:
+        raise ValueError(f"Page {page_num} introuvable dans {pdf_path}")
+    return _encode_jpeg(images[0])
+
+
+def render_image_thumbnail(source, width=THUMBNAIL_WIDTH):
+    """Réduit une image (chemin ou octets) en miniature JPEG, orientée en portrait.
+
+    Pour les JPEG, `draft` décode directement à une résolution réduite : l'image
+    en pleine résolution n'est jamais chargée en mémoire.
+    """
+    from PIL import Image
+
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    with Image.open(source) as image:
+        # Orientation portrait : la largeur utile est alors le petit côté
+        portrait = image.width <= image.height
+        target_width = width if portrait else width * image.width // max(1, image.height)
+        image.draft("RGB", (target_width, target_width * image.height // max(1, image.width)))
+        image = image.convert("RGB")
+        if not portrait:
+            image = image.rotate(270, expand=True)
+        image.thumbnail((width, width * 10))
+        return _encode_jpeg(image)
+
+
+class PreviewCache:
+    """Cache des miniatures (mémoire LRU bornée en octets, puis disque).
+
+    Une miniature est identifiée par l'empreinte du fichier, le numéro de page et
+    la largeur : elle n'est rendue qu'une fois, quel que soit le nombre de
+    sessions ou de relances qui l'affichent.
+    """
+
+    def __init__(self, cache_dir=None, max_memory_bytes=DEFAULT_MAX_MEMORY_BYTES,
+                 max_disk_bytes=DEFAULT_MAX_DISK_BYTES):
+        self.cache_dir = cache_dir or default_cache_dir() / "previews"
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        digest, page_num, width = key
+        return os.path.join(self.cache_dir, f"{digest}_{page_num}_{width}.jpg")
+
+    def get(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+        try:
+            with open(self._path(key), "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        self._remember(key, data)
+        return data
+
+    def put(self, key, data):
+        self._remember(key, data)
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Impossible d'écrire la miniature en cache: {str(e)}")
+            return
+        self._evict_disk()
+
+    def _remember(self, key, data):
+        with self._lock:
+            if key in self._memory:
+                self._memory_bytes -= len(self._memory.pop(key))
+            self._memory[key] = data
+            self._memory_bytes += len(data)
+            while self._memory_bytes > self.max_memory_bytes and len(self._memory) > 1:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted)
+
+    def _evict_disk(self):
+        try:
+            entries = [entry for entry in os.scandir(self.cache_dir) if entry.name.endswith(".jpg")]
+            stats = [(entry.stat().st_mtime, entry.stat().st_size, entry.path) for entry in entries]
+        except OSError:
+            return
+        total = sum(size for _, size, _ in stats)
+        for _, size, path in sorted(stats):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.unlink(path)
+                total -= size
+            except OSError:
+                continue
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_preview_cache():
+    """Retourne le cache de miniatures partagé"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = PreviewCache()
+        return _default_cache
+
+
+def page_thumbnail(file_path, page_num=1, width=THUMBNAIL_WIDTH, digest=None, cache=None):
+    """Miniature JPEG d'une page (PDF) ou d'une image, rendue à la demande puis mise en cache.
+
+    `digest` (empreinte SHA-256 du fichier) évite de relire le fichier pour
+    construire la clé lorsqu'elle est déjà connue.
+    """
+    cache = cache or get_preview_cache()
+    key = (digest or file_digest(file_path), page_num, width)
+    data = cache.get(key)
+    if data is not None:
+        incr("preview_cache_hits")
+        return data
+    incr("preview_cache_misses")
+    with span("thumbnail", page=page_num) as current:
+        if str(file_path).lower().endswith(".pdf"):
+            data = render_pdf_thumbnail(str(file_path), page_num, width)
+        else:
+            data = render_image_thumbnail(str(file_path), width)
+        current.set(bytes=len(data))
+    cache.put(key, data)
+    return data
+
+
+def visible_pages(page_count, first_page, pages_per_view=PAGES_PER_VIEW):
+    """Numéros des pages affichées à partir de `first_page` (bornés au document)"""
+    first_page = min(max(1, first_page), max(1, page_count))
+    return list(range(first_page, min(page_count, first_page + pages_per_view - 1) + 1))
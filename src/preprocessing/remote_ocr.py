@@ -0,0 +1,310 @@
+import asyncio
+import os
+import random
+import threading
+import time
+
+import cv2
+
+from src.preprocessing.scan_text_extract import image_to_text, load_image
+from src.tracing import incr, logger, span
+
+# Réglages par défaut du service OCR distant (surchargeables par variables d'environnement)
+DEFAULT_MAX_IN_FLIGHT = 8
+DEFAULT_RATE_PER_SECOND = 10.0
+DEFAULT_MAX_RETRIES = 4
+DEFAULT_BACKOFF_SECONDS = 0.5
+DEFAULT_TIMEOUT_SECONDS = 60
+
+# Chemin de l'API OCR (Azure Computer Vision v3.2), ajouté au point de terminaison
+OCR_API_PATH = "vision/v3.2/ocr"
+
+# Réponses pour lesquelles une nouvelle tentative a un sens
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+class RemoteOCRError(Exception):
+    """Échec définitif d'une requête au service OCR distant"""
+
+
+def parse_ocr_response(result):
+    """Reconstitue le texte (une ligne par ligne détectée) d'une réponse OCR au format Azure"""
+    lines = []
+    for region in result.get("regions", []):
+        for line in region.get("lines", []):
+            lines.append(" ".join(word["text"] for word in line.get("words", [])))
+    return "\n".join(lines)
+
+
+def encode_image(image):
+    """Encode une image (chemin, image PIL, tableau ou octets) en PNG niveaux de gris pour l'envoi"""
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return bytes(image)
+    ok, buffer = cv2.imencode(".png", load_image(image))
+    if not ok:
+        raise ValueError("Impossible d'encoder l'image pour l'OCR distant")
+    return buffer.tobytes()
+
+
+class RateLimiter:
+    """Limiteur de débit côté client (seau à jetons) partagé par les requêtes concurrentes.
+
+    Chaque requête réserve son jeton sous un verrou de thread puis attend son
+    tour hors du verrou : un même limiteur sert à tous les appels du processus
+    (boucles asyncio successives, threads des travaux), voir `get_rate_limiter`.
+    """
+
+    def __init__(self, rate_per_second, burst=None):
+        self.rate = rate_per_second
+        self.capacity = burst or max(1.0, rate_per_second)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self):
+        """Prend un jeton, éventuellement à crédit ; retourne le délai d'attente avant de l'utiliser"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return max(0.0, -self._tokens / self.rate)
+
+    async def acquire(self):
+        if not self.rate:
+            return
+        delay = self._reserve()
+        if delay:
+            await asyncio.sleep(delay)
+
+
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(url, rate_per_second):
+    """Retourne le limiteur de débit du point de terminaison `url`, partagé par tous les clients du processus"""
+    with _rate_limiters_lock:
+        limiter = _rate_limiters.get(url)
+        if limiter is None or limiter.rate != rate_per_second:
+            limiter = _rate_limiters[url] = RateLimiter(rate_per_second)
+        return limiter
+
+
+class RemoteOCRClient:
+    """Client asynchrone d'un service OCR distant (API Azure ou serveur compatible).
+
+    Les pages sont envoyées en parallèle sur une session HTTP unique dont les
+    connexions sont réutilisées. Au plus `max_in_flight` requêtes sont en cours,
+    le débit est plafonné à `rate_per_second` requêtes par seconde, et les
+    erreurs transitoires (429, 5xx, coupure réseau) sont retentées avec un
+    délai exponentiel, en respectant l'en-tête Retry-After s'il est fourni.
+    Le débit est partagé par tous les clients du même point de terminaison.
+    Une page que le service n'a pas pu reconnaître est confiée à l'OCR local
+    (`local_fallback`, variable OCR_REMOTE_LOCAL_FALLBACK), ou laissée vide.
+    """
+
+    def __init__(self, endpoint=None, api_key=None, max_in_flight=None, rate_per_second=None,
+                 max_retries=DEFAULT_MAX_RETRIES, backoff=DEFAULT_BACKOFF_SECONDS,
+                 timeout=DEFAULT_TIMEOUT_SECONDS, local_fallback=None):
+        endpoint = endpoint or os.environ.get("OCR_REMOTE_ENDPOINT")
+        if not endpoint:
+            raise EnvironmentError("Point de terminaison OCR non configuré (variable OCR_REMOTE_ENDPOINT).")
+        if not endpoint.endswith("/"):
+            endpoint += "/"
+        self.url = endpoint if endpoint.rstrip("/").endswith("/ocr") else endpoint + OCR_API_PATH
+        self.api_key = api_key or os.environ.get("OCR_REMOTE_KEY")
+        self.max_in_flight = max_in_flight or int(os.environ.get("OCR_REMOTE_MAX_IN_FLIGHT", DEFAULT_MAX_IN_FLIGHT))
+        if rate_per_second is None:
+            rate_per_second = float(os.environ.get("OCR_REMOTE_RATE", DEFAULT_RATE_PER_SECOND))
+        self.rate_per_second = rate_per_second
+        self.limiter = get_rate_limiter(self.url, rate_per_second)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        if local_fallback is None:
+            local_fallback = os.environ.get("OCR_REMOTE_LOCAL_FALLBACK", "1").strip().lower() not in (
+                "0", "false", "no", "off")
+        self.local_fallback = local_fallback
+
+    def _headers(self):
+        headers = {"Content-Type": "application/octet-stream"}
+        if self.api_key:
+            headers["Ocp-Apim-Subscription-Key"] = self.api_key
+        return headers
+
+    def _session(self):
+        try:
+            import aiohttp
+        except ImportError:
+            raise ImportError("L'OCR distant nécessite aiohttp (pip install aiohttp).")
+        connector = aiohttp.TCPConnector(limit=self.max_in_flight)
+        return aiohttp.ClientSession(
+            connector=connector,
+            headers=self._headers(),
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+        )
+
+    def _retry_delay(self, attempt, retry_after=None):
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        # Délai exponentiel avec gigue pour ne pas relancer toutes les pages en même temps
+        return self.backoff * (2 ** attempt) * (0.5 + random.random())
+
+    async def _post(self, session, data):
+        import aiohttp
+
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.acquire()
+            retry_after = None
+            try:
+                async with session.post(self.url, data=data) as response:
+                    if response.status == 200:
+                        payload = await response.json(content_type=None)
+                        try:
+                            return parse_ocr_response(payload)
+                        except (AttributeError, KeyError, TypeError) as e:
+                            raise ValueError(f"réponse OCR inattendue ({type(e).__name__}: {e})")
+                    body = await response.text()
+                    if response.status not in RETRY_STATUSES:
+                        raise RemoteOCRError(f"Erreur OCR distante {response.status}: {body[:200]}")
+                    retry_after = response.headers.get("Retry-After")
+                    error = f"statut {response.status}"
+            # Erreurs réseau ou HTTP (aiohttp), délai dépassé, réponse illisible
+            # (JSON invalide ou tronqué) : transitoires, la requête est retentée
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                error = f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+            if attempt < self.max_retries:
+                incr("remote_ocr_retries")
+                await asyncio.sleep(self._retry_delay(attempt, retry_after))
+        raise RemoteOCRError(f"Échec de l'OCR distant après {self.max_retries + 1} tentatives ({error})")
+
+    async def _recognize(self, session, data, page_num):
+        """Texte d'une page : service distant, puis OCR local si le service a échoué"""
+        try:
+            return await self._post(session, data)
+        except RemoteOCRError as e:
+            logger.warning(f"Erreur lors de l'OCR distant de la page {page_num}: {str(e)}")
+            incr("remote_ocr_failures")
+        if not self.local_fallback:
+            # Comme pour l'OCR local, une page en échec reste vide sans interrompre le document
+            return ""
+        incr("remote_ocr_local_fallbacks")
+        return await asyncio.get_running_loop().run_in_executor(None, image_to_text, data)
+
+    async def recognize_many(self, images, progress_callback=None):
+        """Reconnaît une liste d'images ; retourne les textes dans l'ordre des images.
+
+        `progress_callback(images_done, total_images, image_num)` suit
+        l'avancement, `image_num` partant de 1 comme les numéros de page.
+        """
+        images = list(images)
+        semaphore = asyncio.Semaphore(self.max_in_flight)
+        done = 0
+
+        async with self._session() as session:
+            async def recognize(image_num, image):
+                nonlocal done
+                async with semaphore:
+                    text = await self._recognize(session, encode_image(image), image_num)
+                done += 1
+                if progress_callback is not None:
+                    progress_callback(done, len(images), image_num)
+                return text
+
+            tasks = [asyncio.ensure_future(recognize(i, image)) for i, image in enumerate(images, start=1)]
+            try:
+                return list(await asyncio.gather(*tasks))
+            except BaseException:
+                # Première erreur (ou annulation levée par le rappel) : ne pas attendre les autres pages
+                await _cancel_tasks(tasks)
+                raise
+
+    async def recognize_pdf_pages(self, pdf_path, pages=None, progress_callback=None):
+        """OCR distant des pages d'un PDF, rendues au fil de l'eau.
+
+        Le rendu (bloquant) s'exécute dans un thread ; une page n'est rendue que
+        lorsqu'une place se libère parmi les `max_in_flight` requêtes, si bien
+        que la mémoire reste bornée quel que soit le nombre de pages.
+        `progress_callback(pages_done, total_pages, page_num)` suit l'avancement.
+        Une erreur dans le traitement d'une page, y compris une annulation levée
+        par le rappel de progression, arrête le rendu et annule les requêtes en cours.
+        """
+        from src.preprocessing.pdf_to_image import pdf_page_count, iter_pdf_pages
+
+        loop = asyncio.get_running_loop()
+        if pages is None:
+            pages = range(1, await loop.run_in_executor(None, pdf_page_count, pdf_path) + 1)
+        pages = sorted(set(pages))
+        positions = {page_num: i for i, page_num in enumerate(pages)}
+        page_texts = [""] * len(pages)
+        semaphore = asyncio.Semaphore(self.max_in_flight)
+        done = 0
+
+        async with self._session() as session:
+            async def recognize(page_num, data):
+                nonlocal done
+                try:
+                    with span("ocr_page", page=page_num, backend="remote", bytes=len(data)) as current:
+                        page_texts[positions[page_num]] = (await self._recognize(session, data, page_num)).strip()
+                        current.set(chars=len(page_texts[positions[page_num]]))
+                finally:
+                    semaphore.release()
+                done += 1
+                if progress_callback is not None:
+                    progress_callback(done, len(pages), page_num)
+
+            rendered = iter_pdf_pages(pdf_path, window=1, pages=pages)
+            pending = set()
+            try:
+                while True:
+                    await semaphore.acquire()
+                    # Relancer l'erreur d'une page terminée avant de rendre la suivante
+                    for task in [task for task in pending if task.done()]:
+                        pending.discard(task)
+                        task.result()
+                    page = await loop.run_in_executor(None, next, rendered, None)
+                    if page is None:
+                        semaphore.release()
+                        break
+                    page_num, image = page
+                    data = await loop.run_in_executor(None, encode_image, image)
+                    del image
+                    pending.add(asyncio.ensure_future(recognize(page_num, data)))
+                await asyncio.gather(*pending)
+            except BaseException:
+                await _cancel_tasks(pending)
+                raise
+
+        return page_texts
+
+
+async def _cancel_tasks(tasks):
+    """Annule les requêtes encore en cours et attend leur fin (la session est fermée ensuite)"""
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def remote_images_to_text(images, client=None, progress_callback=None):
+    """Version synchrone de `RemoteOCRClient.recognize_many`"""
+    client = client or RemoteOCRClient()
+    return asyncio.run(client.recognize_many(images, progress_callback))
+
+
+def remote_image_to_text(image, client=None):
+    """Extrait le texte d'une image avec le service OCR distant (même usage que `image_to_text`)"""
+    try:
+        return remote_images_to_text([image], client)[0].strip()
+    except Exception as e:
+        logger.warning(f"Erreur lors de l'OCR distant: {str(e)}")
+        return ""
+
+
+def remote_ocr_pdf_pages(pdf_path, pages=None, progress_callback=None, client=None):
+    """Version synchrone de `RemoteOCRClient.recognize_pdf_pages` (même usage que `ocr_pdf_pages`)"""
+    client = client or RemoteOCRClient()
+    return asyncio.run(client.recognize_pdf_pages(pdf_path, pages, progress_callback))
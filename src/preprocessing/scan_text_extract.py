@@ -1,12 +1,17 @@
-from PIL import Image
-import pytesseract
-import cv2
-import numpy as np
 import platform
 import os
+import queue
+import threading
+from contextlib import contextmanager
 
-def configure_tesseract_path():
-    """Configure le chemin de Tesseract en fonction du système d'exploitation"""
+from src.preprocessing.page_ocr_cache import PageFingerprint, get_page_ocr_cache
+from src.tracing import incr, logger, span
+
+# OpenCV, Pillow, NumPy et pytesseract sont importés à la première image traitée :
+# importer ce module (pour ses constantes) ne charge ni ne recherche Tesseract.
+
+def find_tesseract():
+    """Retourne le chemin de Tesseract en fonction du système d'exploitation"""
     system = platform.system()
     
     # Chemins possibles pour Windows
@@ -25,70 +30,301 @@ def configure_tesseract_path():
     if system == 'Windows':
         for path in windows_paths:
             if os.path.exists(path):
-                pytesseract.pytesseract.tesseract_cmd = path
-                return
+                return path
     else:  # Mac ou Linux
         for path in unix_paths:
             if os.path.exists(path):
-                pytesseract.pytesseract.tesseract_cmd = path
-                return
+                return path
     
     raise EnvironmentError("Tesseract non trouvé. Veuillez l'installer et vérifier les chemins.")
 
-# Configurer le chemin de Tesseract
-configure_tesseract_path()
+
+def configure_tesseract_path():
+    """Configure le chemin de Tesseract utilisé par pytesseract"""
+    import pytesseract
+
+    pytesseract.pytesseract.tesseract_cmd = find_tesseract()
+
+
+def tesseract_version():
+    """Version de Tesseract (`tesseract --version`), lue sans importer pytesseract"""
+    import subprocess
+
+    output = subprocess.run([find_tesseract(), "--version"], capture_output=True, text=True, check=True)
+    # Selon les versions, la sortie est sur stdout ou stderr : "tesseract 5.3.2 ..."
+    return (output.stdout or output.stderr).split()[1]
+
+
+_tesseract_configured = False
+
+
+def get_pytesseract():
+    """Retourne pytesseract, après avoir localisé Tesseract lors du premier appel"""
+    global _tesseract_configured
+    import pytesseract
+
+    if not _tesseract_configured:
+        configure_tesseract_path()
+        _tesseract_configured = True
+    return pytesseract
 
 # OCR: optical character recognition
 
+# Configuration Tesseract optimisée pour texte clair
+TESSERACT_LANG = 'fra+eng'
+TESSERACT_OEM = 3
+TESSERACT_PSM = 6
+TESSERACT_DPI = 300
+TESSERACT_CONFIG = f'--oem {TESSERACT_OEM} --psm {TESSERACT_PSM} -l {TESSERACT_LANG} --dpi {TESSERACT_DPI}'
+
+# Nombre de moteurs OCR gardés prêts dans chaque processus (variable OCR_ENGINES_PER_PROCESS)
+DEFAULT_ENGINES_PER_PROCESS = 1
+
+
+class PytesseractEngine:
+    """Moteur OCR de repli, utilisé quand tesserocr n'est pas installé.
+
+    Chaque page lance un processus `tesseract` (via pytesseract) qui recharge
+    les modèles : garder les processus du pool OCR ne fait alors économiser que
+    leur démarrage. `create_ocr_engine` signale ce repli dans le journal.
+    """
+
+    name = "pytesseract"
+
+    def __init__(self):
+        self._pytesseract = get_pytesseract()
+
+    def recognize(self, image):
+        from PIL import Image
+
+        return self._pytesseract.image_to_string(Image.fromarray(image), config=TESSERACT_CONFIG)
+
+    def close(self):
+        pass
+
+
+class TesserocrEngine:
+    """Moteur OCR en mémoire (API C de Tesseract via tesserocr).
+
+    Les modèles `fra+eng` sont chargés une seule fois à la création ; chaque
+    appel ne fait que transmettre l'image déjà en mémoire, sans fichier
+    temporaire ni lancement de processus. Un moteur n'est pas utilisable par
+    deux threads à la fois : il est prêté par `OCREnginePool`.
+    """
+
+    name = "tesserocr"
+
+    def __init__(self):
+        import tesserocr
+
+        self._api = tesserocr.PyTessBaseAPI(
+            lang=TESSERACT_LANG,
+            psm=tesserocr.PSM(TESSERACT_PSM),
+            oem=tesserocr.OEM(TESSERACT_OEM),
+        )
+        self._api.SetVariable("user_defined_dpi", str(TESSERACT_DPI))
+
+    def recognize(self, image):
+        from PIL import Image
+
+        self._api.SetImage(Image.fromarray(image))
+        return self._api.GetUTF8Text()
+
+    def close(self):
+        self._api.End()
+
 
-def preprocess_image(image_path):
-    """Prétraite l'image pour améliorer la reconnaissance de texte"""
+_fallback_logged = False
+
+
+def create_ocr_engine():
+    """Crée le meilleur moteur disponible : tesserocr s'il est installé, pytesseract sinon.
+
+    Le repli sur pytesseract (un processus `tesseract` par page) est signalé
+    une fois par processus.
+    """
+    global _fallback_logged
     try:
-        # Charger l'image
-        img = cv2.imread(image_path)
+        return TesserocrEngine()
+    except ImportError:
+        reason = "tesserocr n'est pas installé"
+    except Exception as e:
+        reason = f"initialisation de tesserocr impossible ({str(e)})"
+    if not _fallback_logged:
+        _fallback_logged = True
+        logger.warning(f"Moteur OCR pytesseract (un processus tesseract par page, plus lent) : {reason}")
+    return PytesseractEngine()
+
+
+class OCREnginePool:
+    """Réserve de moteurs OCR initialisés une fois et réutilisés de page en page.
+
+    Les moteurs sont créés à la demande, jusqu'à `size`, puis prêtés par
+    `acquire()` ; un thread qui n'en trouve pas de libre attend qu'un moteur
+    soit rendu. Chaque processus du pool OCR garde ainsi ses moteurs (et les
+    modèles chargés) pour toutes les pages et toutes les requêtes qu'il traite.
+    """
+
+    def __init__(self, size=None):
+        if size is None:
+            size = int(os.environ.get("OCR_ENGINES_PER_PROCESS", DEFAULT_ENGINES_PER_PROCESS))
+        self.size = max(1, size)
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def warm_up(self):
+        """Crée tous les moteurs à l'avance (au démarrage d'un processus du pool OCR)"""
+        engines = [self._take() for _ in range(self.size)]
+        for engine in engines:
+            self._idle.put(engine)
+
+    def _take(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            create = self._created < self.size
+            if create:
+                self._created += 1
+        if create:
+            try:
+                return create_ocr_engine()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        return self._idle.get()
+
+    @contextmanager
+    def acquire(self):
+        engine = self._take()
+        try:
+            yield engine
+        finally:
+            self._idle.put(engine)
+
+    def close(self):
+        """Libère les moteurs inactifs"""
+        while True:
+            try:
+                engine = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            engine.close()
+            with self._lock:
+                self._created -= 1
+
+
+_engine_pool = None
+_engine_pool_lock = threading.Lock()
+
+
+def get_ocr_engine_pool():
+    """Retourne la réserve de moteurs OCR du processus courant"""
+    global _engine_pool
+    with _engine_pool_lock:
+        if _engine_pool is None:
+            _engine_pool = OCREnginePool()
+        return _engine_pool
+
+
+def load_image(source):
+    """Charge une image en niveaux de gris (tableau NumPy) depuis un chemin, une image PIL, un tableau ou des octets"""
+    import cv2
+    import numpy as np
+    from PIL import Image
+
+    if isinstance(source, np.ndarray):
+        img = source
+        if img.ndim == 3:
+            # Convention OpenCV : les tableaux couleur sont en BGR
+            img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        return img
+
+    if isinstance(source, Image.Image):
+        if source.mode != "L":
+            source = source.convert("L")
+        return np.asarray(source)
+
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        img = cv2.imdecode(np.frombuffer(source, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
         if img is None:
-            raise ValueError(f"Impossible de charger l'image: {image_path}")
-        
-        # Convertir en niveaux de gris
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        
-        # Ajustement simple du contraste
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
-        enhanced = clahe.apply(gray)
+            raise ValueError("Impossible de décoder l'image en mémoire")
+        return img
+
+    img = cv2.imread(str(source))
+    if img is None:
+        raise ValueError(f"Impossible de charger l'image: {source}")
+    return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+
+def preprocess_image(image, config=None):
+    """Prétraite l'image pour améliorer la reconnaissance de texte.
+
+    `image` peut être un chemin de fichier ou une image déjà en mémoire
+    (image PIL, tableau NumPy ou octets encodés) : les pages rendues d'un PDF
+    passent ainsi directement au prétraitement, sans fichier intermédiaire.
+    `config` surcharge les réglages de DEFAULT_PREPROCESS_CONFIG (recadrage,
+    redressement, débruitage conditionnel, contraste).
+    """
+    from src.preprocessing.image_pipeline import preprocess_pipeline
+
+    with span("preprocess") as current:
+        # Charger l'image en niveaux de gris
+        gray = load_image(image)
         
-        # Binarisation simple
-        _, binary = cv2.threshold(enhanced, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        # Recadrage, redressement, débruitage si nécessaire, contraste puis binarisation
+        binary, report = preprocess_pipeline(gray, config)
+        current.set(shape=list(gray.shape), output_shape=list(binary.shape),
+                    **{f"{step['step']}_ms": round(step["seconds"] * 1000, 1) for step in report if step["applied"]})
         
         return binary
-    except Exception as e:
-        print(f"Erreur lors du prétraitement de l'image: {str(e)}")
-        raise
 
-def image_to_text(image_path):
-    """Extrait le texte d'une image avec prétraitement"""
+def image_to_text(image):
+    """Extrait le texte d'une image (chemin ou image en mémoire) avec prétraitement"""
     try:
-        print(f"Tentative d'extraction du texte de: {image_path}")
-        
-        # Vérifier si le fichier existe
-        if not os.path.exists(image_path):
-            raise ValueError(f"Le fichier n'existe pas: {image_path}")
+        if isinstance(image, (str, os.PathLike)):
+            # Vérifier si le fichier existe
+            if not os.path.exists(image):
+                raise ValueError(f"Le fichier n'existe pas: {image}")
         
+        gray = load_image(image)
+
+        # Page déjà reconnue (même scan ou nouveau scan de la même page) : ni
+        # prétraitement ni OCR, l'empreinte est calculée sur la page brute
+        page_cache = get_page_ocr_cache()
+        fingerprint = None
+        if page_cache is not None:
+            with span("page_cache_lookup") as current:
+                cached = None
+                try:
+                    fingerprint = PageFingerprint.from_image(gray)
+                    cached = page_cache.lookup(fingerprint) if fingerprint is not None else None
+                except Exception as e:
+                    # Le cache ne doit jamais coûter le texte d'une page : OCR normal
+                    logger.warning(f"Cache OCR par page ignoré pour cette page: {str(e)}")
+                    fingerprint = None
+                current.set(hit=cached is not None)
+            if cached is not None:
+                incr("page_ocr_cache_hits")
+                return cached
+            incr("page_ocr_cache_misses")
+
         # Prétraitement
-        processed_img = preprocess_image(image_path)
-        print("Image prétraitée avec succès")
+        processed_img = preprocess_image(gray)
         
-        # Configuration Tesseract optimisée pour texte clair
-        custom_config = '--oem 3 --psm 6 -l fra+eng --dpi 300'
-        
-        # OCR
-        text = pytesseract.image_to_string(
-            Image.fromarray(processed_img), 
-            config=custom_config
-        )
+        # OCR avec un moteur déjà initialisé de la réserve du processus
+        with get_ocr_engine_pool().acquire() as engine, span("recognize", engine=engine.name) as current:
+            text = engine.recognize(processed_img)
+            current.set(chars=len(text))
         
-        print(f"Texte extrait (longueur: {len(text)}): {text[:100]}...")
-        return text.strip()
+        text = text.strip()
+        if fingerprint is not None:
+            page_cache.store(fingerprint, text)
+        return text
     except Exception as e:
-        print(f"Erreur lors de l'extraction du texte: {str(e)}")
+        logger.warning(f"Erreur lors de l'extraction du texte: {str(e)}")
         return ""
 
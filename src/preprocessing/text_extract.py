@@ -1,81 +1,127 @@
-from docx import Document
-import PyPDF2
 import os
 
-def docx_to_text(docx_path):
-    """Extrait le texte structuré d'un DOCX avec titres numérotés artificiellement"""
+from src.preprocessing.docx_stream import HeadingNumbering, heading_level_from_style_name, stream_docx_to_text
+from src.tracing import logger, span
+
+
+def docx_to_text(docx_path, document=None):
+    """Extrait le texte structuré d'un DOCX avec titres numérotés artificiellement.
+
+    Le fichier est lu en flux (voir `docx_stream`) : titres, tableaux, en-têtes
+    et pieds de page. Un document python-docx déjà ouvert peut être fourni à la
+    place ; seuls ses paragraphes sont alors repris.
+    """
     try:
-        from docx import Document
-        print(f"Tentative d'extraction du texte du DOCX: {docx_path}")
-        doc = Document(docx_path)
-        lines = []
-        heading_counter = {}  # Pour construire une numérotation hiérarchique
-
-        for p in doc.paragraphs:
-            text = p.text.strip()
-            if not text:
-                continue
-
-            style = p.style.name.lower()
-            if "heading" in style or "titre" in style:
-                level = 1  # valeur par défaut
-                for i in range(1, 7):
-                    if f"heading {i}" in style or f"titre {i}" in style:
-                        level = i
-                        break
-
-                # Mise à jour du compteur
-                heading_counter[level] = heading_counter.get(level, 0) + 1
-                # Réinitialiser les sous-niveaux
-                for j in range(level + 1, 7):
-                    heading_counter[j] = 0
-
-                # Construire le numéro du titre
-                prefix = ".".join(str(heading_counter[i]) for i in range(1, level + 1) if heading_counter.get(i, 0) > 0)
-                lines.append(f"{prefix}. {text}")
+        with span("docx_to_text") as current:
+            if document is not None:
+                text = _docx_lines(document)
             else:
-                lines.append(text)
-        
-        print("TEXTE FINAL DOCX :\n" + text)
-
-        return "\n".join(lines)
+                text = stream_docx_to_text(docx_path)
+            current.set(chars=len(text))
+        return text
 
     except Exception as e:
-        print(f"Erreur lors de l'extraction du texte du DOCX: {e}")
+        logger.warning(f"Erreur lors de l'extraction du texte du DOCX {docx_path}: {e}")
         return ""
 
+
+def _docx_lines(doc):
+    """Lignes des paragraphes d'un document python-docx, titres préfixés de leur numéro hiérarchique"""
+    lines = []
+    numbering = HeadingNumbering()
+
+    for p in doc.paragraphs:
+        text = p.text.strip()
+        if not text:
+            continue
+
+        level = heading_level_from_style_name(p.style.name)
+        lines.append(numbering.number(level, text) if level else text)
+
+    return "\n".join(lines)
+
 # docx_text = docx_to_text("./docs/examples/doc/exemple1.docx")
 # print(docx_text)
 
 
-def pdf_to_text(pdf_path):
-    """Extrait le texte d'un fichier PDF"""
+def _page_resource_flags(resources, depth=0):
+    """Indique si des ressources de page déclarent des polices et des images"""
+    has_fonts = False
+    has_images = False
+    if resources is None:
+        return has_fonts, has_images
+    resources = resources.get_object()
+
+    if resources.get("/Font"):
+        has_fonts = True
+
+    xobjects = resources.get("/XObject")
+    if xobjects:
+        for xobject in xobjects.get_object().values():
+            xobject = xobject.get_object()
+            subtype = xobject.get("/Subtype")
+            if subtype == "/Image":
+                has_images = True
+            elif subtype == "/Form" and depth < 2:
+                # Les formulaires (XObject /Form) embarquent souvent le scan ou le texte
+                form_fonts, form_images = _page_resource_flags(xobject.get("/Resources"), depth + 1)
+                has_fonts = has_fonts or form_fonts
+                has_images = has_images or form_images
+    return has_fonts, has_images
+
+
+def pdf_page_profiles(pdf_path):
+    """Extrait le texte de chaque page d'un PDF avec des indices sur son contenu.
+
+    Retourne une liste de dictionnaires {"text", "has_fonts", "has_images"}, un
+    par page, qui permettent de décider page par page si l'OCR est nécessaire.
+    """
     try:
-        print(f"Tentative d'extraction du texte du PDF: {pdf_path}")
-        
         # Vérifier si le fichier existe
         if not os.path.exists(pdf_path):
             raise ValueError(f"Le fichier PDF n'existe pas: {pdf_path}")
         
+        import PyPDF2
+
         with open(pdf_path, "rb") as file:
-            reader = PyPDF2.PdfReader(file)
-            
-            # Vérifier si le PDF est vide
-            if len(reader.pages) == 0:
-                print("Le PDF est vide")
-                return ""
-            
-            text = ""
-            for i, page in enumerate(reader.pages):
-                page_text = page.extract_text()
-                print(f"Texte extrait de la page {i+1} (longueur: {len(page_text)}): {page_text[:100]}...")
-                text += page_text + "\n"
-            
-            print(f"Texte total extrait du PDF (longueur: {len(text)}): {text[:100]}...")
-            return text
+            return reader_page_profiles(PyPDF2.PdfReader(file))
     except Exception as e:
-        print(f"Erreur lors de l'extraction du texte du PDF: {str(e)}")
-        return ""
+        logger.warning(f"Erreur lors de l'extraction du texte du PDF {pdf_path}: {str(e)}")
+        return []
+
+
+def reader_page_profiles(reader):
+    """Profils de pages (texte, polices, images) à partir d'un PdfReader déjà ouvert"""
+    # Vérifier si le PDF est vide
+    if len(reader.pages) == 0:
+        logger.info("Le PDF est vide")
+        return []
+    
+    profiles = []
+    with span("pdf_text", pages=len(reader.pages)) as current:
+        for i, page in enumerate(reader.pages, start=1):
+            with span("pdf_text_page", page=i) as page_span:
+                page_text = page.extract_text()
+                try:
+                    has_fonts, has_images = _page_resource_flags(page.get("/Resources"))
+                except Exception:
+                    # Ressources illisibles : se fier uniquement au texte extrait
+                    has_fonts, has_images = bool(page_text.strip()), True
+                page_span.set(chars=len(page_text))
+            profiles.append({"text": page_text, "has_fonts": has_fonts, "has_images": has_images})
+        current.set(chars=sum(len(profile["text"]) for profile in profiles))
+    
+    return profiles
+
+
+def pdf_to_pages(pdf_path):
+    """Extrait le texte de chaque page d'un fichier PDF (une chaîne par page)"""
+    return [profile["text"] for profile in pdf_page_profiles(pdf_path)]
+
+
+def pdf_to_text(pdf_path):
+    """Extrait le texte d'un fichier PDF"""
+    return "".join(page_text + "\n" for page_text in pdf_to_pages(pdf_path))
 
 # pdf_text = pdf_to_text("./docs/examples/pdf/exemple1_diff.pdf")
 # print(pdf_text)
\ No newline at end of file
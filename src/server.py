@@ -0,0 +1,259 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import tempfile
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+# Permet l'exécution directe (python src/server.py) comme en module (python -m src.server)
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.comparison.batch import SUPPORTED_TYPES
+from src.comparison.pipeline import compare_files
+from src.jobs import JobManager, JobCancelled, FINISHED_STATES
+from src.tracing import configure_logging
+
+DEFAULT_PORT = 8700
+# Taille maximale d'un document envoyé et taille des blocs lus sur la connexion
+DEFAULT_MAX_UPLOAD_BYTES = 200 * 1024 * 1024
+CHUNK_SIZE = 1024 * 1024
+
+DOCUMENT_ID_PATTERN = re.compile(r"^[0-9a-f]{64}\.[a-z]+$")
+
+
+def default_storage_dir():
+    """Dossier des documents envoyés (variable COMPARATEUR_UPLOAD_DIR)"""
+    configured = os.environ.get("COMPARATEUR_UPLOAD_DIR")
+    if configured:
+        return Path(configured)
+    return Path(tempfile.gettempdir()) / "comparateur-documents-uploads"
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class ComparisonHandler(BaseHTTPRequestHandler):
+    """Routes de l'API HTTP.
+
+    PUT  /documents?filename=x.pdf   envoi d'un document (corps brut, lu par blocs)
+    DELETE /documents/<id>           suppression d'un document envoyé
+    POST /compare                    comparaison {"document1", "document2", "wait", ...}
+    GET  /jobs/<id>                  état d'un travail
+    GET  /jobs/<id>/result           résultat d'un travail terminé
+    DELETE /jobs/<id>                annulation d'un travail
+    GET  /health                     disponibilité du service
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        sys.stderr.write(f"{self.address_string()} - {format % args}\n")
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _content_length(self):
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            raise HTTPError(400, "En-tête Content-Length invalide")
+        return length
+
+    def _read_json(self):
+        length = self._content_length()
+        if length > CHUNK_SIZE:
+            raise HTTPError(413, "Requête trop volumineuse")
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            raise HTTPError(400, "Corps JSON invalide")
+        if not isinstance(request, dict):
+            raise HTTPError(400, "Corps JSON invalide")
+        return request
+
+    def _dispatch(self, method):
+        url = urlparse(self.path)
+        parts = [part for part in url.path.split("/") if part]
+        try:
+            route = (method, *parts[:1])
+            if route == ("GET", "health") and len(parts) == 1:
+                return self._send_json(200, {"status": "ok"})
+            if route == ("PUT", "documents") or (route == ("POST", "documents") and len(parts) == 1):
+                return self._upload(parse_qs(url.query))
+            if route == ("DELETE", "documents") and len(parts) == 2:
+                return self._delete_document(parts[1])
+            if route == ("POST", "compare") and len(parts) == 1:
+                return self._compare(self._read_json())
+            if parts[:1] == ["jobs"] and len(parts) >= 2:
+                return self._job(method, parts[1], parts[2:])
+            raise HTTPError(404, "Route inconnue")
+        except HTTPError as e:
+            # Le corps de la requête n'a peut-être pas été lu : ne pas réutiliser la connexion
+            self.close_connection = True
+            self._send_json(e.status, {"error": str(e)})
+        except Exception as e:
+            self.close_connection = True
+            self._send_json(500, {"error": str(e)})
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PUT(self):
+        self._dispatch("PUT")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    def _upload(self, query):
+        """Copie le corps de la requête sur disque par blocs, en calculant son empreinte au passage"""
+        filename = (query.get("filename") or [""])[0]
+        suffix = Path(filename).suffix.lower()
+        if suffix not in SUPPORTED_TYPES:
+            raise HTTPError(415, f"Type de fichier non supporté: {suffix or filename}")
+        if "Content-Length" not in self.headers:
+            raise HTTPError(411, "En-tête Content-Length requis")
+        remaining = self._content_length()
+        if remaining > self.server.max_upload_bytes:
+            raise HTTPError(413, "Document trop volumineux")
+
+        digest = hashlib.sha256()
+        storage = self.server.storage_dir
+        with tempfile.NamedTemporaryFile(dir=storage, suffix=suffix, delete=False) as tmp:
+            try:
+                while remaining > 0:
+                    chunk = self.rfile.read(min(CHUNK_SIZE, remaining))
+                    if not chunk:
+                        raise HTTPError(400, "Envoi interrompu")
+                    digest.update(chunk)
+                    tmp.write(chunk)
+                    remaining -= len(chunk)
+            except BaseException:
+                tmp.close()
+                os.unlink(tmp.name)
+                raise
+
+        # Stockage adressé par contenu : un même document n'est conservé qu'une fois
+        document_id = digest.hexdigest() + suffix
+        os.replace(tmp.name, storage / document_id)
+        self._send_json(201, {"document_id": document_id})
+
+    def _document_path(self, document_id):
+        if not isinstance(document_id, str) or not DOCUMENT_ID_PATTERN.match(document_id):
+            raise HTTPError(400, f"Identifiant de document invalide: {document_id}")
+        path = self.server.storage_dir / document_id
+        if not path.exists():
+            raise HTTPError(404, f"Document inconnu: {document_id}")
+        return path
+
+    def _delete_document(self, document_id):
+        self._document_path(document_id).unlink()
+        self._send_json(200, {"deleted": document_id})
+
+    def _compare(self, request):
+        path1 = self._document_path(request.get("document1"))
+        path2 = self._document_path(request.get("document2"))
+        include_text = bool(request.get("include_text", False))
+        include_edit_script = bool(request.get("include_edit_script", True))
+
+        task = partial(compare_files, include_text=include_text, include_edit_script=include_edit_script)
+        key = (path1.name, path2.name, include_text, include_edit_script)
+        job_id = self.server.manager.submit(str(path1), str(path2), key=key, task=task)
+
+        if not request.get("wait", True):
+            return self._send_json(202, self.server.manager.status(job_id))
+        return self._send_result(job_id)
+
+    def _send_result(self, job_id, timeout=None):
+        try:
+            result = self.server.manager.result(job_id, timeout=timeout)
+        except JobCancelled:
+            raise HTTPError(409, "Travail annulé")
+        except TimeoutError:
+            raise HTTPError(409, "Travail non terminé")
+        except RuntimeError as e:
+            raise HTTPError(422, str(e))
+        self._send_json(200, {"job_id": job_id, "result": result})
+
+    def _job(self, method, job_id, rest):
+        manager = self.server.manager
+        try:
+            status = manager.status(job_id)
+        except KeyError:
+            raise HTTPError(404, f"Travail inconnu: {job_id}")
+
+        if method == "GET" and not rest:
+            return self._send_json(200, status)
+        if method == "GET" and rest == ["result"]:
+            if status["status"] not in FINISHED_STATES:
+                raise HTTPError(409, "Travail non terminé")
+            return self._send_result(job_id, timeout=0)
+        if method == "DELETE" and not rest:
+            manager.cancel(job_id)
+            return self._send_json(200, manager.status(job_id))
+        raise HTTPError(404, "Route inconnue")
+
+
+class ComparisonServer(ThreadingHTTPServer):
+    """Service HTTP de comparaison : un thread par connexion, calculs sur un pool partagé"""
+
+    daemon_threads = True
+
+    def __init__(self, address, manager, storage_dir=None, max_upload_bytes=DEFAULT_MAX_UPLOAD_BYTES):
+        super().__init__(address, ComparisonHandler)
+        self.manager = manager
+        self.storage_dir = Path(storage_dir or default_storage_dir())
+        self.storage_dir.mkdir(parents=True, exist_ok=True)
+        self.max_upload_bytes = max_upload_bytes
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m src.server",
+        description="Service HTTP de comparaison de documents (PDF, DOCX, images).",
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Nombre de comparaisons exécutées en parallèle")
+    parser.add_argument("--backend", choices=["process", "thread"], default="process")
+    parser.add_argument("--storage", default=None, help="Dossier des documents envoyés")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    configure_logging()
+    # Un processus de comparaison par cœur : l'OCR de chaque travail reste séquentiel
+    manager = JobManager(max_workers=args.workers, backend=args.backend, ocr_workers=1)
+    server = ComparisonServer((args.host, args.port), manager, args.storage)
+    print(f"Service de comparaison sur http://{args.host}:{args.port}/ ({args.workers} processus)", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        manager.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,253 @@
+"""Mesures par étape et par page (spans), compteurs et journalisation.
+
+Chaque étape instrumentée ouvre un span (`with span("extraction", pages=3)`) :
+sa durée, ses attributs (octets, pages, caractères...) et son parent sont
+enregistrés à la sortie du bloc, puis journalisés au niveau DEBUG. Les
+compteurs (`incr("extraction_cache_hits")`) et les totaux par span sont
+exportables en lignes JSON ou au format texte de Prometheus.
+
+Variables d'environnement :
+    COMPARATEUR_LOG_LEVEL     niveau de journalisation (WARNING par défaut)
+    COMPARATEUR_TRACE_FILE    fichier JSONL où chaque span terminé est ajouté
+    COMPARATEUR_METRICS_FILE  fichier Prometheus réécrit après chaque comparaison
+                              (`{pid}` est remplacé par le numéro de processus)
+"""
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger("comparateur")
+
+# Nombre de spans terminés gardés en mémoire (les totaux, eux, ne sont jamais tronqués)
+DEFAULT_MAX_SPANS = 10000
+# Attributs numériques des spans cumulés dans des compteurs
+COUNTED_ATTRIBUTES = ("bytes", "pages", "chars")
+METRIC_PREFIX = "comparateur"
+
+_current_span = contextvars.ContextVar("comparateur_current_span", default=None)
+
+
+def configure_logging(level=None):
+    """Configure la journalisation des points d'entrée (variable COMPARATEUR_LOG_LEVEL)"""
+    level = level or os.environ.get("COMPARATEUR_LOG_LEVEL", "WARNING")
+    logger.setLevel(level.upper() if isinstance(level, str) else level)
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+        logger.addHandler(handler)
+        logger.propagate = False
+
+
+class Span:
+    """Étape mesurée : nom, identifiants de trace, durée et attributs"""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start", "duration", "status", "attributes")
+
+    def __init__(self, name, trace_id, span_id, parent_id, attributes):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.start = time.time()
+        self.duration = None
+        self.status = "ok"
+        self.attributes = attributes
+
+    def set(self, **attributes):
+        """Ajoute des attributs connus en cours d'étape (caractères extraits, pages OCR...)"""
+        self.attributes.update(attributes)
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start,
+            "duration": self.duration,
+            "status": self.status,
+            "pid": os.getpid(),
+            **self.attributes,
+        }
+
+
+def _new_id():
+    return os.urandom(8).hex()
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+               for value in labels.values())
+    return "{" + ",".join(f'{key}="{value}"' for key, value in zip(labels, escaped)) + "}"
+
+
+class Tracer:
+    """Enregistre les spans terminés et les compteurs d'un processus (thread-safe)"""
+
+    def __init__(self, max_spans=DEFAULT_MAX_SPANS, trace_file=None):
+        self.trace_file = trace_file
+        self._spans = deque(maxlen=max_spans)
+        self._durations = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name, level=logging.DEBUG, **attributes):
+        """Mesure le bloc ; le span ouvert devient le parent des spans ouverts à l'intérieur"""
+        parent = _current_span.get()
+        current = Span(name, parent.trace_id if parent else _new_id(), _new_id(),
+                       parent.span_id if parent else None, attributes)
+        token = _current_span.set(current)
+        start = time.perf_counter()
+        try:
+            yield current
+        except BaseException as e:
+            current.status = "error"
+            current.attributes.setdefault("error", f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            current.duration = time.perf_counter() - start
+            _current_span.reset(token)
+            self._finish(current, level)
+
+    def record(self, name, seconds, level=logging.DEBUG, **attributes):
+        """Enregistre un span mesuré ailleurs (par exemple dans un processus OCR du pool)"""
+        parent = _current_span.get()
+        current = Span(name, parent.trace_id if parent else _new_id(), _new_id(),
+                       parent.span_id if parent else None, attributes)
+        current.start -= seconds
+        current.duration = seconds
+        self._finish(current, level)
+        return current
+
+    def _finish(self, current, level):
+        with self._lock:
+            self._spans.append(current)
+            count, total = self._durations.get(current.name, (0, 0.0))
+            self._durations[current.name] = (count + 1, total + current.duration)
+            for attribute in COUNTED_ATTRIBUTES:
+                value = current.attributes.get(attribute)
+                if isinstance(value, (int, float)):
+                    self._add(f"span_{attribute}", value, {"span": current.name})
+        if logger.isEnabledFor(level):
+            details = " ".join(f"{key}={value}" for key, value in current.attributes.items())
+            logger.log(level, f"{current.name} {current.duration * 1000:.1f} ms {details}".rstrip())
+        if self.trace_file:
+            self._append_trace(current)
+
+    def _append_trace(self, current):
+        try:
+            line = json.dumps(current.to_dict(), ensure_ascii=False, default=str) + "\n"
+            with self._lock, open(self.trace_file, "a", encoding="utf-8") as f:
+                f.write(line)
+        except OSError as e:
+            logger.warning(f"Impossible d'écrire la trace: {str(e)}")
+
+    def _add(self, name, value, labels):
+        key = (name, tuple(sorted(labels.items())))
+        self._counters[key] = self._counters.get(key, 0) + value
+
+    def incr(self, name, value=1, **labels):
+        """Incrémente un compteur (succès du cache, pages OCR, nouvelles tentatives...)"""
+        with self._lock:
+            self._add(name, value, labels)
+
+    def spans(self, trace_id=None):
+        """Spans terminés (d'une seule trace si `trace_id` est fourni), du plus ancien au plus récent"""
+        with self._lock:
+            spans = list(self._spans)
+        return [s for s in spans if trace_id is None or s.trace_id == trace_id]
+
+    def counters(self):
+        with self._lock:
+            return {(name, labels): value for (name, labels), value in self._counters.items()}
+
+    def stage_timings(self, trace_id):
+        """Durée cumulée par nom de span au sein d'une trace (secondes)"""
+        timings = {}
+        for s in self.spans(trace_id):
+            timings[s.name] = timings.get(s.name, 0.0) + s.duration
+        return timings
+
+    def export_jsonl(self, stream, trace_id=None):
+        """Écrit les spans terminés en lignes JSON dans un flux texte"""
+        for s in self.spans(trace_id):
+            stream.write(json.dumps(s.to_dict(), ensure_ascii=False, default=str) + "\n")
+
+    def prometheus_text(self):
+        """Totaux des spans et compteurs au format texte de Prometheus"""
+        with self._lock:
+            durations = dict(self._durations)
+            counters = dict(self._counters)
+        lines = []
+        if durations:
+            metric = f"{METRIC_PREFIX}_span_seconds"
+            lines.append(f"# TYPE {metric} summary")
+            for name, (count, total) in sorted(durations.items()):
+                lines.append(f"{metric}_sum{_format_labels({'span': name})} {total:.6f}")
+                lines.append(f"{metric}_count{_format_labels({'span': name})} {count}")
+        for name in sorted({name for name, _ in counters}):
+            metric = f"{METRIC_PREFIX}_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            for (counter, labels), value in sorted(counters.items()):
+                if counter == name:
+                    lines.append(f"{metric}{_format_labels(dict(labels))} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """Écrit les métriques dans un fichier (remplacement atomique, pour un collecteur de fichiers texte)"""
+        path = str(path).replace("{pid}", str(os.getpid()))
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, path)
+
+    def reset(self):
+        with self._lock:
+            self._spans.clear()
+            self._durations.clear()
+            self._counters.clear()
+
+
+_default_tracer = None
+_default_tracer_lock = threading.Lock()
+
+
+def get_tracer():
+    """Retourne le traceur partagé du processus (variable COMPARATEUR_TRACE_FILE)"""
+    global _default_tracer
+    with _default_tracer_lock:
+        if _default_tracer is None:
+            _default_tracer = Tracer(trace_file=os.environ.get("COMPARATEUR_TRACE_FILE") or None)
+        return _default_tracer
+
+
+def span(name, level=logging.DEBUG, **attributes):
+    """Span du traceur partagé (voir `Tracer.span`)"""
+    return get_tracer().span(name, level, **attributes)
+
+
+def record(name, seconds, level=logging.DEBUG, **attributes):
+    return get_tracer().record(name, seconds, level, **attributes)
+
+
+def incr(name, value=1, **labels):
+    get_tracer().incr(name, value, **labels)
+
+
+def flush_metrics():
+    """Réécrit le fichier COMPARATEUR_METRICS_FILE s'il est configuré"""
+    path = os.environ.get("COMPARATEUR_METRICS_FILE")
+    if not path:
+        return
+    try:
+        get_tracer().write_prometheus(path)
+    except OSError as e:
+        logger.warning(f"Impossible d'écrire les métriques: {str(e)}")
@@ -0,0 +1,64 @@
+"""Vérifie que le redressement d'une page inclinée ne coupe pas le texte des coins.
+
+Une page synthétique porte un corps de texte et un carré noir dans deux coins
+opposés de la zone écrite ; elle est inclinée, puis passe par
+`preprocess_pipeline` (recadrage au plus près puis redressement). Les deux
+carrés doivent se retrouver entiers dans l'image binarisée.
+
+    python tests/deskew_check.py
+"""
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+import cv2
+import numpy as np
+
+# Côté des carrés de coin (pixels) et proportion minimale de leur surface à retrouver
+MARKER = 40
+MIN_MARKER_AREA = 0.9
+
+
+def synthetic_page(width=1600, height=2200, margin=150, inset=150):
+    """Page dont l'encre ne forme pas un rectangle : un carré en haut à gauche (titre),
+    un en bas à droite (numéro de page) et un corps de texte en retrait entre les deux"""
+    page = np.full((height, width), 255, np.uint8)
+    for y in range(margin + inset, height - margin - inset, 60):
+        cv2.putText(page, "Article 12.3 Les parties conviennent", (margin + inset, y),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1.1, 0, 2, cv2.LINE_AA)
+    for x, y in [(margin, margin), (width - margin - MARKER, height - margin - MARKER)]:
+        page[y:y + MARKER, x:x + MARKER] = 0
+    return page
+
+
+def skewed(page, angle):
+    height, width = page.shape
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    return cv2.warpAffine(page, matrix, (width, height), flags=cv2.INTER_LINEAR, borderValue=255)
+
+
+def corner_markers(binary):
+    """Nombre de carrés de coin retrouvés entiers (composantes presque carrées de la bonne surface)"""
+    count, _, stats, _ = cv2.connectedComponentsWithStats(255 - binary)
+    found = 0
+    for x, y, width, height, area in stats[1:]:
+        if area >= MIN_MARKER_AREA * MARKER * MARKER and 0.8 <= width / height <= 1.25 and width < 2 * MARKER:
+            found += 1
+    return found
+
+
+if __name__ == "__main__":
+    from src.preprocessing.image_pipeline import preprocess_pipeline
+
+    failures = 0
+    for angle in (-3.0, -1.5, 1.5, 3.0):
+        binary, report = preprocess_pipeline(skewed(synthetic_page(), angle))
+        deskew = next(step for step in report if step["step"] == "deskew")
+        found = corner_markers(binary)
+        status = "OK" if deskew["applied"] and found == 2 else "ÉCHEC"
+        failures += status != "OK"
+        print(f"{status:5} inclinaison {angle:+.1f}°  angle corrigé {deskew['angle']:+.1f}°  coins entiers {found}/2")
+
+    sys.exit(1 if failures else 0)
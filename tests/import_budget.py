@@ -0,0 +1,112 @@
+"""Vérifie le coût d'import des modules non graphiques.
+
+Chaque module est importé dans un interpréteur neuf : le script échoue si une
+dépendance lourde (Streamlit, OpenCV, Tesseract, pdfplumber...) est chargée à
+l'import, ou si l'import dépasse le budget de temps. Le même contrôle s'applique
+à un appel de `extract_document` servi par le cache d'extraction.
+
+    python tests/import_budget.py [--budget 0.3]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+# Modules importés par les processus de traitement en lot et la ligne de commande
+MODULES = [
+    "src.preprocessing.document_utils",
+    "src.preprocessing.parsed_document",
+    "src.preprocessing.scan_text_extract",
+    "src.preprocessing.ocr_pipeline",
+    "src.preprocessing.extraction_cache",
+    "src.comparison.batch",
+    "src.main",
+]
+
+# Dépendances qui ne doivent être chargées qu'à leur première utilisation
+HEAVY_MODULES = [
+    "streamlit", "pypandoc", "docx2pdf", "pdfplumber", "PyPDF2", "docx",
+    "cv2", "pytesseract", "tesserocr", "pdf2image", "numpy", "PIL", "aiohttp",
+]
+
+# Documents extraits une première fois, puis relus depuis le cache d'extraction
+CACHED_DOCUMENTS = [
+    "docs/examples/doc/exemple1.docx",
+    "docs/examples/pdf/exemple1.pdf",
+]
+
+# Durée maximale d'import d'un module (secondes), hors démarrage de l'interpréteur
+DEFAULT_BUDGET = 0.3
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+CACHED_PROBE = """
+import json, sys, time
+from pathlib import Path
+start = time.perf_counter()
+from src.preprocessing.document_utils import extract_document
+from src.preprocessing.extraction_cache import ExtractionCache
+cache = ExtractionCache()
+for path in {paths!r}:
+    result = extract_document(path, Path(path).suffix, cache=cache)
+    assert result["text"], path
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def run_probe(code, env=None):
+    output = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True, env=env,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def measure(module):
+    """Importe `module` dans un nouvel interpréteur ; retourne la durée et les dépendances lourdes chargées"""
+    return run_probe(PROBE.format(module=module, heavy=HEAVY_MODULES))
+
+
+def measure_cached(path, cache_dir):
+    """Extrait `path` une première fois, puis mesure un appel servi par le cache dans un nouvel interpréteur"""
+    env = {**os.environ, "COMPARATEUR_CACHE_DIR": cache_dir}
+    run_probe(CACHED_PROBE.format(paths=[path], heavy=[]), env)
+    return run_probe(CACHED_PROBE.format(paths=[path], heavy=HEAVY_MODULES), env)
+
+
+def report(label, result, budget):
+    problems = []
+    if result["loaded"]:
+        problems.append("charge " + ", ".join(result["loaded"]))
+    if result["seconds"] > budget:
+        problems.append(f"dépasse le budget de {budget:.2f}s")
+    status = "ÉCHEC" if problems else "OK"
+    print(f"{status:5} {label:40} {result['seconds'] * 1000:7.1f} ms  {'; '.join(problems)}")
+    return bool(problems)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Budget de temps d'import des modules")
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET)
+    args = parser.parse_args()
+
+    failures = 0
+    for module in MODULES:
+        failures += report(module, measure(module), args.budget)
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for path in CACHED_DOCUMENTS:
+            failures += report(f"cache: {Path(path).name}", measure_cached(path, cache_dir), args.budget)
+
+    sys.exit(1 if failures else 0)
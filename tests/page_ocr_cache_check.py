@@ -0,0 +1,144 @@
+"""Vérifie que le cache OCR par page reconnaît un nouveau scan d'une page et pas une page modifiée.
+
+La page d'exemple est « rescannée » (décalage, bruit, luminosité, mise à
+l'échelle, rotation, recompression JPEG) : chaque variante doit retrouver le
+texte mémorisé, y compris par `image_to_text`. Une page où un seul mot a été
+remplacé, et la version modifiée scannée de l'exemple, ne doivent pas le
+retrouver. Une erreur dans l'empreinte, la recherche ou l'écriture du cache ne
+doit pas coûter le texte de la page. Le cache est créé dans un dossier temporaire.
+
+    python tests/page_ocr_cache_check.py
+"""
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from unittest import mock
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+import cv2
+import numpy as np
+
+EXAMPLES = ROOT / "docs" / "examples" / "img"
+REFERENCE_TEXT = "texte de la page d'exemple"
+OCR_TEXT = "texte reconnu par l'OCR"
+
+
+def warp(image, angle=0.0, scale=1.0, shift=(0, 0)):
+    height, width = image.shape
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, scale)
+    matrix[:, 2] += shift
+    return cv2.warpAffine(image, matrix, (width, height), borderValue=255)
+
+
+def noisy(image, sigma, seed=0):
+    noise = np.random.default_rng(seed).normal(0, sigma, image.shape)
+    return np.clip(image + noise, 0, 255).astype(np.uint8)
+
+
+def brighter(image, offset):
+    return np.clip(image.astype(np.int16) + offset, 0, 255).astype(np.uint8)
+
+
+def jpeg(image, quality=75):
+    return cv2.imdecode(cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])[1], cv2.IMREAD_GRAYSCALE)
+
+
+class FixedEngine:
+    """Moteur OCR de test : la reconnaissance réelle n'est pas l'objet du contrôle"""
+
+    name = "test"
+
+    def recognize(self, image):
+        return OCR_TEXT
+
+
+class FixedEnginePool:
+    @contextmanager
+    def acquire(self):
+        yield FixedEngine()
+
+
+def broken(*args, **kwargs):
+    raise cv2.error("empreinte impossible")
+
+
+def replace_word(image, box, word):
+    """Efface la zone `box` (x, y, largeur, hauteur) et y écrit `word`"""
+    image = image.copy()
+    x, y, width, height = box
+    image[y:y + height, x:x + width] = 255
+    cv2.putText(image, word, (x, y + height - 8), cv2.FONT_HERSHEY_SIMPLEX, 1.2, 0, 2, cv2.LINE_AA)
+    return image
+
+
+if __name__ == "__main__":
+    os.environ["COMPARATEUR_CACHE_DIR"] = tempfile.mkdtemp(prefix="page_ocr_cache_")
+    os.environ.pop("OCR_PAGE_CACHE", None)
+
+    from src.preprocessing.page_ocr_cache import PageFingerprint, get_page_ocr_cache
+    from src.preprocessing.scan_text_extract import image_to_text
+
+    page = cv2.imread(str(EXAMPLES / "exemple1_scanned.jpg"), cv2.IMREAD_GRAYSCALE)
+    cache = get_page_ocr_cache()
+    cache.store(PageFingerprint.from_image(page), REFERENCE_TEXT)
+
+    rescans = {
+        "décalage de 5 px": warp(page, shift=(5, 5)),
+        "décalage de 25 px": warp(page, shift=(25, -20)),
+        "bruit σ=2": noisy(page, 2),
+        "luminosité +10": brighter(page, 10),
+        "échelle 98 %": warp(page, scale=0.98),
+        "échelle 95 %": warp(page, scale=0.95),
+        "rotation 0,4°": warp(page, angle=0.4),
+        "rotation 1°": warp(page, angle=1.0),
+        "décalage + bruit + JPEG": jpeg(noisy(warp(page, shift=(-4, 7)), 3)),
+        "échelle + bruit + JPEG 60": jpeg(brighter(warp(noisy(page, 2, 1), scale=0.99), -8), 60),
+    }
+    edits = {
+        "un mot remplacé": replace_word(page, (700, 900, 260, 50), "modifie"),
+        "exemple modifié (scan)": cv2.imread(str(EXAMPLES / "exemple1_diff_scanned.jpg"), cv2.IMREAD_GRAYSCALE),
+    }
+
+    failures = 0
+    for expected, cases in (("trouvé", rescans), ("absent", edits)):
+        for name, image in cases.items():
+            start = time.perf_counter()
+            fingerprint = PageFingerprint.from_image(image)
+            found = fingerprint is not None and cache.lookup(fingerprint) == REFERENCE_TEXT
+            status = "OK" if found == (expected == "trouvé") else "ÉCHEC"
+            failures += status != "OK"
+            print(f"{status:5} {name:28} attendu {expected:7} {(time.perf_counter() - start) * 1000:6.0f} ms")
+
+    # Chemin complet : une image JPEG en mémoire passe par image_to_text sans OCR
+    rescan = cv2.imencode(".jpg", noisy(warp(page, shift=(6, -3)), 2), [cv2.IMWRITE_JPEG_QUALITY, 80])[1].tobytes()
+    text = image_to_text(rescan)
+    status = "OK" if text == REFERENCE_TEXT else "ÉCHEC"
+    failures += status != "OK"
+    print(f"{status:5} {'image_to_text (JPEG décalé)':28} attendu trouvé")
+
+    # Cache en erreur : la page passe à l'OCR au lieu d'être perdue
+    from src.preprocessing import page_ocr_cache, scan_text_extract
+
+    other_page = cv2.imread(str(EXAMPLES / "exemple1_diff_scanned.jpg"), cv2.IMREAD_GRAYSCALE)
+    failing = {
+        "empreinte en erreur": mock.patch.object(page_ocr_cache.PageFingerprint, "from_image", broken),
+        "recherche en erreur": mock.patch.object(page_ocr_cache.PageFingerprint, "matches", broken),
+        "recalage en erreur": mock.patch.object(page_ocr_cache, "_register", broken),
+        "écriture en erreur": mock.patch.object(page_ocr_cache.PageFingerprint, "signature", broken),
+    }
+    with mock.patch.object(scan_text_extract, "get_ocr_engine_pool", FixedEnginePool):
+        for name, patch in failing.items():
+            with patch:
+                # La page d'exemple a des candidats dans le cache : le recalage est exercé
+                image = page if name != "écriture en erreur" else other_page
+                text = image_to_text(image)
+            status = "OK" if text == OCR_TEXT else "ÉCHEC"
+            failures += status != "OK"
+            print(f"{status:5} {name:28} attendu OCR")
+
+    sys.exit(1 if failures else 0)
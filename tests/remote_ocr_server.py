@@ -0,0 +1,120 @@
+"""Serveur local imitant l'API OCR Azure, pour tester le client OCR distant sans clé ni réseau.
+
+Lancement du serveur seul :
+    python tests/remote_ocr_server.py --port 8765 --latency 0.2 --fail-rate 0.2
+
+puis, dans un autre terminal :
+    OCR_BACKEND=remote OCR_REMOTE_ENDPOINT=http://127.0.0.1:8765/ streamlit run app/app.py
+
+Avec --demo, le serveur démarre en arrière-plan et le client lui envoie des images
+en parallèle (limite de requêtes, débit plafonné, reprises sur 429/503, sur une
+erreur 500 en HTML et sur une réponse 200 au JSON tronqué).
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+def make_handler(latency, fail_rate, stats):
+    class OCRHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            data = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            with stats["lock"]:
+                stats["requests"] += 1
+                stats["in_flight"] += 1
+                stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+            try:
+                time.sleep(latency)
+                if random.random() < fail_rate:
+                    # Erreur transitoire : quota dépassé côté Azure, page d'erreur d'un
+                    # proxy, ou réponse coupée en cours de route
+                    status, body = random.choice([
+                        (429, b'{"error": "transient"}'),
+                        (503, b'{"error": "transient"}'),
+                        (500, b"<html><body>Internal Server Error</body></html>"),
+                        (200, b'{"regions": [{"lines": '),
+                    ])
+                    self.send_response(status)
+                    self.send_header("Retry-After", "0.1")
+                    self.end_headers()
+                    self.wfile.write(body)
+                    with stats["lock"]:
+                        stats["failures"] += 1
+                    return
+
+                words = [{"text": "page"}, {"text": f"{len(data)}"}, {"text": "octets"}]
+                body = json.dumps({"regions": [{"lines": [{"words": words}]}]}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            finally:
+                with stats["lock"]:
+                    stats["in_flight"] -= 1
+
+        def log_message(self, *args):
+            pass
+
+    return OCRHandler
+
+
+def start_server(port=0, latency=0.2, fail_rate=0.0):
+    """Démarre le serveur dans un thread ; retourne le serveur et ses statistiques"""
+    stats = {"requests": 0, "failures": 0, "in_flight": 0, "max_in_flight": 0, "lock": threading.Lock()}
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(latency, fail_rate, stats))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, stats
+
+
+def demo(args):
+    from src.preprocessing.remote_ocr import RemoteOCRClient, remote_images_to_text
+
+    server, stats = start_server(0, args.latency, args.fail_rate)
+    endpoint = f"http://127.0.0.1:{server.server_address[1]}/"
+    client = RemoteOCRClient(endpoint, max_in_flight=args.max_in_flight, rate_per_second=args.rate, backoff=0.05)
+
+    images = [bytes(1000 + i) for i in range(args.images)]
+    progress = []
+    start = time.perf_counter()
+    texts = remote_images_to_text(images, client, lambda *event: progress.append(event))
+    elapsed = time.perf_counter() - start
+
+    assert texts == [f"page {1000 + i} octets" for i in range(args.images)], "textes dans le désordre"
+    assert sorted(image_num for _, _, image_num in progress) == list(range(1, args.images + 1)), "progression"
+    assert stats["max_in_flight"] <= args.max_in_flight, "limite de requêtes simultanées dépassée"
+    print(f"{args.images} images en {elapsed:.2f}s "
+          f"(séquentiel ≈ {args.images * args.latency:.2f}s hors reprises)")
+    print(f"Requêtes: {stats['requests']}, erreurs transitoires reprises: {stats['failures']}, "
+          f"simultanées max: {stats['max_in_flight']}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serveur OCR local au format Azure")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2, help="Durée de traitement simulée (s)")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Proportion de réponses 429/503")
+    parser.add_argument("--demo", action="store_true", help="Lancer le client contre le serveur")
+    parser.add_argument("--images", type=int, default=40)
+    parser.add_argument("--max-in-flight", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=50.0)
+    args = parser.parse_args()
+
+    if args.demo:
+        demo(args)
+    else:
+        server, _ = start_server(args.port, args.latency, args.fail_rate)
+        print(f"Serveur OCR local sur http://127.0.0.1:{args.port}/ (Ctrl+C pour arrêter)")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            server.shutdown()